@@ -0,0 +1,28 @@
+"""add scoring timestamps to anonymisations
+
+Revision ID: 3e7b0c94d1f6
+Revises: 8d2f41c7a9b3
+Create Date: 2026-10-17 10:41:07.552913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e7b0c94d1f6'
+down_revision = '8d2f41c7a9b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('anonymisations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('started_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('finished_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('anonymisations', schema=None) as batch_op:
+        batch_op.drop_column('finished_at')
+        batch_op.drop_column('started_at')
@@ -0,0 +1,30 @@
+"""add content hash and scoring config digest to anonymisations
+
+Revision ID: 5b19e6d0a4c2
+Revises: c52a9e1d7f08
+Create Date: 2026-10-17 14:22:08.513902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b19e6d0a4c2'
+down_revision = 'c52a9e1d7f08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('anonymisations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('config_digest', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_anonymisations_content_hash'), ['content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('anonymisations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_anonymisations_content_hash'))
+        batch_op.drop_column('config_digest')
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,26 @@
+"""add shuffle seed to anonymisations
+
+Revision ID: 8d2f41c7a9b3
+Revises: 472401030271
+Create Date: 2026-10-17 09:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2f41c7a9b3'
+down_revision = '472401030271'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('anonymisations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('shuffle_seed', sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('anonymisations', schema=None) as batch_op:
+        batch_op.drop_column('shuffle_seed')
@@ -0,0 +1,43 @@
+"""add submission_stage_metrics
+
+Revision ID: 9a4e61c3b7d2
+Revises: e7a3c5f20b91
+Create Date: 2026-10-17 18:12:37.514207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4e61c3b7d2'
+down_revision = 'e7a3c5f20b91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('submission_stage_metrics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('anonym_id', sa.Integer(), nullable=False),
+    sa.Column('stage', sa.String(length=32), nullable=False),
+    sa.Column('wall_seconds', sa.Float(), nullable=False),
+    sa.Column('cpu_seconds', sa.Float(), nullable=True),
+    sa.Column('peak_rss_mb', sa.Float(), nullable=True),
+    sa.Column('rows_processed', sa.Integer(), nullable=True),
+    sa.Column('bytes_read', sa.BigInteger(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['anonym_id'], ['anonymisations.id'], name='fk_stage_metric_anonym', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('submission_stage_metrics', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_submission_stage_metrics_anonym_id'), ['anonym_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_submission_stage_metrics_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('submission_stage_metrics', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_submission_stage_metrics_created_at'))
+        batch_op.drop_index(batch_op.f('ix_submission_stage_metrics_anonym_id'))
+
+    op.drop_table('submission_stage_metrics')
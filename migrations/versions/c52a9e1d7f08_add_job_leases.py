@@ -0,0 +1,32 @@
+"""add job lease and attempts to anonymisations
+
+Revision ID: c52a9e1d7f08
+Revises: 3e7b0c94d1f6
+Create Date: 2026-10-17 12:05:31.094471
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52a9e1d7f08'
+down_revision = '3e7b0c94d1f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('anonymisations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='3'))
+        batch_op.create_index(batch_op.f('ix_anonymisations_lease_expires_at'), ['lease_expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('anonymisations', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_anonymisations_lease_expires_at'))
+        batch_op.drop_column('max_attempts')
+        batch_op.drop_column('attempts')
+        batch_op.drop_column('lease_expires_at')
@@ -0,0 +1,40 @@
+"""add submission_metric_scores
+
+Revision ID: e7a3c5f20b91
+Revises: 5b19e6d0a4c2
+Create Date: 2026-10-17 15:40:52.207315
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a3c5f20b91'
+down_revision = '5b19e6d0a4c2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('submission_metric_scores',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('anonym_id', sa.Integer(), nullable=False),
+    sa.Column('metric', sa.String(length=32), nullable=False),
+    sa.Column('parameters_hash', sa.String(length=64), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('duration', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['anonym_id'], ['anonymisations.id'], name='fk_metric_score_anonym', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('anonym_id', 'metric', name='uq_submission_metric')
+    )
+    with op.batch_alter_table('submission_metric_scores', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_submission_metric_scores_anonym_id'), ['anonym_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('submission_metric_scores', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_submission_metric_scores_anonym_id'))
+
+    op.drop_table('submission_metric_scores')
@@ -13,6 +13,7 @@ from src.common.error_handlers import register_error_handlers, register_jwt_hand
 
 from src.modules.api import api_blp
 from src.extensions.admin_ui import init_admin
+from src.core.services.metric_registry import MetricRegistry
 import src.modules.auth.signals 
 
 
@@ -62,6 +63,19 @@ def create_app(config=None):
     register_jwt_handlers(jwt)
 
     api.register_blueprint(api_blp)
-    
+
+    refresh_metric_registry(app)
+
     return app
 
+
+def refresh_metric_registry(app):
+    """Republishes the metric snapshot if the database changed while the app was down."""
+    with app.app_context():
+        try:
+            MetricRegistry().refresh()
+        except Exception as e:  # Database not migrated yet, e.g. while running `flask db upgrade`
+            app.logger.warning(f"Metric registry not refreshed: {str(e)}")
+        finally:
+            db.session.remove()
+
@@ -1,8 +1,10 @@
 from flask import Flask
 from src.commands.create_admin import createadmin
 from src.commands.seed import seed
+from src.commands.rescore import rescore
 
 def register_commands(app: Flask):
     """Registers all Flask CLI commands."""
     app.cli.add_command(createadmin)
-    app.cli.add_command(seed)
\ No newline at end of file
+    app.cli.add_command(seed)
+    app.cli.add_command(rescore)
\ No newline at end of file
@@ -0,0 +1,54 @@
+import click
+from flask import current_app
+from src.modules.admin.models import RawFileModel
+from src.core.services.dataset_cache import DatasetCache
+from src.modules.anonymisation.rescore import BulkRescore, OriginalRescore
+
+@click.command("rescore")
+@click.option("--metric", "metrics", multiple=True, help="Re-evaluate this metric even if its parameters did not change.")
+@click.option("--workers", type=int, default=None, help="Worker processes (default: RESCORE_WORKERS).")
+@click.option("--original", is_flag=True, help="Re-score every submission against the active raw file instead.")
+@click.option("--yes", "confirmed", is_flag=True, help="Confirm re-scoring against the active raw file.")
+@click.option("--dry-run", is_flag=True, help="Only show what would be re-scored.")
+def rescore(metrics, workers, original, confirmed, dry_run):
+    """Re-scores existing submissions after metrics or the raw file changed."""
+    app = current_app._get_current_object()
+
+    with app.app_context():
+        def progress(done, total, anonym_id, error):
+            click.echo(f"[{done}/{total}] anonymization {anonym_id}: {error or 'ok'}")
+
+        if original:
+            raw_file = RawFileModel.query.filter_by(is_active=True).first()
+            if not raw_file:
+                click.echo("No active raw file.")
+                return
+            engine = OriginalRescore(app, DatasetCache.csv_path(raw_file), progress=progress)
+            if dry_run or not confirmed:
+                eligible, skipped = engine.plan()
+                for anonym_id, error in skipped.items():
+                    click.echo(f"anonymization {anonym_id}: kept as is ({error})")
+                click.echo(f"{len(eligible)} submissions would be re-scored against {raw_file.filename}.")
+                if not dry_run:
+                    click.echo("Their footprints and scores are replaced; run again with --yes to proceed.")
+                return
+
+            summary = engine.run()
+            click.echo(
+                f"Re-scored {summary['rescored']}/{summary['submissions']} submissions "
+                f"({len(summary['failed'])} failed, {len(summary['skipped'])} kept for their shape)."
+            )
+            return
+
+        engine = BulkRescore(app, workers=workers, metrics=metrics, progress=progress)
+        if dry_run:
+            for origin_file, jobs in engine.plan().items():
+                for anonym_id, _, scripts in jobs:
+                    click.echo(f"anonymization {anonym_id}: {', '.join(name for name, _ in scripts)}")
+            return
+
+        summary = engine.run()
+        click.echo(
+            f"Re-scored {summary['rescored']}/{summary['submissions']} submissions "
+            f"({len(summary['failed'])} failed), utility updated on {summary['utility_updated']}."
+        )
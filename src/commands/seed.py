@@ -1,6 +1,7 @@
 import click
 from flask import current_app
 from src.seed import run_seeding
+from src.core.services.metric_registry import MetricRegistry
 
 @click.command("seed")
 def seed():
@@ -12,6 +13,7 @@ def seed():
         logger.info("Starting database seeding...")
         try:
             run_seeding()
+            MetricRegistry().invalidate()  # Scoring jobs pin the seeded metrics from now on
             click.echo("Database seeding completed.")        
             logger.info("Seeding completed successfully.")
         except Exception as e:
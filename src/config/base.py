@@ -54,8 +54,45 @@ class BaseConfig(ABC):
     JWT_COOKIE_SECURE = False
     JWT_COOKIE_CSRF_PROTECT = False
 
+    # Anonymization pipeline: "thread" runs stages in threads, "process" in worker processes
+    PIPELINE_EXECUTOR = os.getenv("PIPELINE_EXECUTOR", "thread")
+    PIPELINE_PROCESS_WORKERS = int(os.getenv("PIPELINE_PROCESS_WORKERS", os.cpu_count() or 4))
+
+    # Resource caps of every pipeline stage, enforced in a forked child (0: no cap). Off by default:
+    # forking a multithreaded web or worker process can deadlock on locks held by its other threads,
+    # and the memory cap counts the heap the child inherits. Meant for PIPELINE_EXECUTOR="process"
+    # or Celery workers, whose processes hold little besides the stage.
+    STAGE_WALL_SECONDS = int(os.getenv("STAGE_WALL_SECONDS", 0))
+    STAGE_CPU_SECONDS = int(os.getenv("STAGE_CPU_SECONDS", 0))
+    STAGE_MEMORY_MB = int(os.getenv("STAGE_MEMORY_MB", 0))  # Heap and private mappings, not the mapped dataset
+    STAGE_LIMITS = {}  # {stage: {"wall_seconds", "cpu_seconds", "memory_mb"}} overrides
+
+    # Sampling profiler of slow stages; admins can also turn it on per submission
+    STAGE_PROFILING = os.getenv("STAGE_PROFILING", "true").lower() == "true"
+    PROFILE_THRESHOLD_SECONDS = int(os.getenv("PROFILE_THRESHOLD_SECONDS", 120))  # 0: only when enabled by an admin
+    PROFILE_INTERVAL_MS = int(os.getenv("PROFILE_INTERVAL_MS", 10))
+
     # Celery Worker
     CELERY_BROKER_URL = "redis://redis:6379/0"
     CELERY_RESULT_BACKEND = "redis://redis:6379/0"
+    CELERY_TASK_ALWAYS_EAGER = False
+
+    # Submission scoring: "thread" (in the web process) or "celery" (the "scoring" queue)
+    SCORING_BACKEND = os.getenv("SCORING_BACKEND", "thread")
+    SCORING_CONCURRENCY = int(os.getenv("SCORING_CONCURRENCY", 4))     # Jobs scored at once
+    SCORING_QUEUE_LIMIT = int(os.getenv("SCORING_QUEUE_LIMIT", 32))    # Backlog before uploads get a 429
+    SCORING_GROUP_IN_FLIGHT = int(os.getenv("SCORING_GROUP_IN_FLIGHT", 2))  # Jobs one group may run at once
+    SCORING_BATCH_SIZE = int(os.getenv("SCORING_BATCH_SIZE", 1))  # Queued jobs sharing an original scored together
+    SCORING_GROUP_WEIGHTS = {}  # {group_id: weight}; groups default to 1
+    SCORING_LEASE_SECONDS = int(os.getenv("SCORING_LEASE_SECONDS", 300))  # Renewed every third of it
+    # Lease of a Celery job whose stage tasks are queued or running; must cover the queue wait
+    SCORING_CHORD_LEASE_SECONDS = int(os.getenv("SCORING_CHORD_LEASE_SECONDS", 7200))
+    SCORING_SWEEP_SECONDS = int(os.getenv("SCORING_SWEEP_SECONDS", 60))
+    SCORING_MAX_ATTEMPTS = int(os.getenv("SCORING_MAX_ATTEMPTS", 3))
+    RESCORE_WORKERS = int(os.getenv("RESCORE_WORKERS", 2))  # Bulk re-score processes
+    RESCORE_NICE = int(os.getenv("RESCORE_NICE", 10))  # Their priority increment, to spare the API
+    STAGE_CHECKPOINTS = os.getenv("STAGE_CHECKPOINTS", "false").lower() == "true"  # Reuse stage outputs of identical inputs
+    CHECKPOINT_MAX_AGE_DAYS = int(os.getenv("CHECKPOINT_MAX_AGE_DAYS", 7))  # Unused checkpoints older than this go (0: keep)
+    CHECKPOINT_MAX_MB = int(os.getenv("CHECKPOINT_MAX_MB", 1024))  # Then the least recently used beyond this (0: no cap)
 
     FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:5173")
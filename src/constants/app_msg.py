@@ -68,6 +68,7 @@ UNAUTHORIZED_ACCESS = "You do not have permission to access this resource."
 NO_FILE_UPLOADED = "No file uploaded"
 FILE_UPLOADED_SUCESS = "File uploaded successfully"
 FILE_DELETED_SUCCESS = "File deleted successfully"
+SCORING_QUEUE_FULL = "The scoring queue is full. Please retry in {} seconds."
 
 # Group User Messages
 GROUP_DELETED_SUCCESS = "Group deleted successfully."
\ No newline at end of file
@@ -18,4 +18,8 @@ INVALID_DATE_FORMAT = "The date is nonexistent or incorrectly formatted\n Line {
 MALFORMED_ZIP_FILE = "The ZIP file is incorrectly formatted"
 ADMIN_ZIP_ERROR = "Administrator ZIP file error"
 UNKNOWN_ERROR = "{}"
+STAGE_CANCELLED = "Cancelled after another stage failed"
+STAGE_LIMIT_EXCEEDED = "Stage {} exceeded its {} limit ({})"
+STAGE_CRASHED = "Stage {} terminated unexpectedly ({})"
+JOB_ATTEMPTS_EXHAUSTED = "Scoring was interrupted {} times; giving up"
 ORIGIN_FILE_NOT_FOUND = "The original file not found"
\ No newline at end of file
@@ -1,7 +1,7 @@
-import csv
-import json
-from collections import defaultdict
-from src.constants.core_msg import SEPARATOR 
+import operator
+import numpy as np
+from src.core.services.evaluation_context import EvaluationContext
+from src.core.services.metric_plugin import MetricPlugin
 
 #/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\/\
 #                      METRIC NAME: CROSSINGS                        
@@ -13,7 +13,7 @@ from src.constants.core_msg import SEPARATOR
 ##############################
 # --- CELL SIZE CONFIGURATION --- #
 ##############################
-size = 2
+DEFAULT_SIZE = 2
 #  4 : cell at the meter level
 #  3 : cell at the street level
 #  2 : cell at the neighborhood level
@@ -24,55 +24,119 @@ size = 2
 #############################################################
 # --- PERCENTAGE OF MOST VISITED CELLS TO VERIFY --- #
 #############################################################
-pt = 0.1
+DEFAULT_PT = 0.1
 # 0.1: 10% of the most visited cells must be present in 10% of the cells 
 # in the anonymized file.
 
-def main(original_file, anonymized_file, parameters=None):
-    """Compute the crossing metric comparing original and anonymized data."""
-
-    # Define global variables
-    if parameters is None:
-        parameters = {"size": 2, "pt": 0.1}
-
-    global size
-    size = parameters.get("size", 3)
-    global pt
-    pt = parameters.get("pt", 0.2)
-
-    # Open original and anonymized files
-    fd_original = open(original_file, newline='')
-    fd_anonymized = open(anonymized_file, newline='')
-    original_reader = csv.reader(fd_original, delimiter=SEPARATOR)
-    anonymized_reader = csv.reader(fd_anonymized, delimiter=SEPARATOR)
-
-    original_cells = defaultdict(int)
-    anonymized_cells = defaultdict(int)
+##############################
+# --- GRID CODES --- #
+##############################
+GRID_LIMIT = 2 ** 31        # Each rounded coordinate must fit in 32 bits to be packed
+TIE_TOLERANCE = 1e-9        # Relative distance to .5 below which Python's round() decides
+
+def round_to_grid(values, size):
+    """Integer grid index k such that k / 10**size == round(value, size) for every value."""
+    if size >= 0:
+        scaled = values * float(10 ** size)
+    else:
+        scaled = values / float(10 ** -size)
+    grid = np.rint(scaled)
+
+    # Float scaling can flip values sitting on a .5 boundary: let round() decide those
+    fraction = np.abs(scaled - np.trunc(scaled))
+    near_tie = np.abs(fraction - 0.5) <= TIE_TOLERANCE * np.maximum(1.0, np.abs(scaled))
+    for index in np.flatnonzero(near_tie):
+        rounded = round(float(values[index]), size)
+        grid[index] = np.rint(rounded * 10 ** size if size >= 0 else rounded / 10 ** -size)
+
+    if np.any(np.abs(grid) >= GRID_LIMIT):
+        raise ValueError(f"Cell size {size} is too fine for the grid encoding")
+    return grid.astype(np.int64)
+
+def cell_codes(latitudes, longitudes, size):
+    """Packs the rounded (lat, lon) cell of every row into one int64 code."""
+    if np.isnan(latitudes).any() or np.isnan(longitudes).any():
+        raise ValueError("could not convert string to float")
+    return round_to_grid(latitudes, size) * (2 * GRID_LIMIT) + (round_to_grid(longitudes, size) + GRID_LIMIT)
+
+class CellCounter:
+    """Counts distinct cell codes chunk by chunk, remembering where each cell first appeared."""
+
+    def __init__(self):
+        self.codes = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.int64)
+        self.first = np.empty(0, dtype=np.int64)
+
+    def add(self, codes, rows):
+        chunk_codes, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+        chunk_counts = np.bincount(inverse, minlength=chunk_codes.size)
+
+        self.codes, inverse = np.unique(np.concatenate((self.codes, chunk_codes)), return_inverse=True)
+        counts = np.zeros(self.codes.size, dtype=np.int64)
+        np.add.at(counts, inverse, np.concatenate((self.counts, chunk_counts)))
+        first_rows = np.full(self.codes.size, np.iinfo(np.int64).max)
+        np.minimum.at(first_rows, inverse, np.concatenate((self.first, rows[first])))
+        self.counts, self.first = counts, first_rows
+
+    def top(self, count, row_limit):
+        """
+        Codes of the `count` most visited cells. Ties keep first-appearance order,
+        like a stable sort of the historical insertion-ordered dictionary.
+        """
+        if count <= 0:
+            return np.empty(0, dtype=np.int64)
+        if count >= self.codes.size:
+            return self.codes
+        rank = -self.counts * (row_limit + 1) + self.first
+        return self.codes[np.argpartition(rank, count - 1)[:count]]
+
+class MeetUtility(MetricPlugin):
+    """
+    Share of the most visited original cells that are also among the most
+    visited anonymized cells. Cells are counted chunk by chunk, so memory
+    grows with the number of distinct cells rather than with the rows.
+    """
+
+    def __init__(self, parameters=None):
+        if parameters is None:
+            parameters = {"size": DEFAULT_SIZE, "pt": DEFAULT_PT}
+        super().__init__(parameters)
+        self.size = operator.index(parameters.get("size", 3))
+        self.pt = parameters.get("pt", 0.2)
+        self.original_cells = CellCounter()
+        self.anonymized_cells = CellCounter()
+
+    def update(self, rows):
+        original = self.context.original
+        anonymized = self.context.anonymized
 
-    for line_ori, line_ano in zip(original_reader, anonymized_reader):
         # --- Process original file
-        key = (round(float(line_ori[2]), size), round(float(line_ori[3]), size))
-        original_cells[key] += 1
+        positions = np.arange(rows.start, rows.stop)
+        self.original_cells.add(cell_codes(original.lat[rows], original.lon[rows], self.size), positions)
 
         # --- Process anonymized file
-        if line_ano[0] != "DEL":
-            gps2 = (round(float(line_ano[2]), size), round(float(line_ano[3]), size))
-            anonymized_cells[gps2] += 1
+        kept = positions[~anonymized.deleted[rows]]
+        self.anonymized_cells.add(cell_codes(anonymized.lat[kept], anonymized.lon[kept], self.size), kept)
+
+    def finalize(self):
+        original_cells = self.original_cells
+        anonymized_cells = self.anonymized_cells
+        num_cells_to_check = int(original_cells.codes.size * self.pt)
+
+        top_original_cells = original_cells.top(num_cells_to_check, self.context.size)
+        top_anonymized_cells = anonymized_cells.top(min(anonymized_cells.codes.size, num_cells_to_check), self.context.size)
 
-    num_cells_to_check = int(len(original_cells) * pt)
-    score = 0
+        # Compute final score based on common highly visited cells
+        score = int(np.isin(top_original_cells, top_anonymized_cells).sum())
 
-    # Sort original and anonymized cell data based on visit frequency (descending order)
-    sorted_original_cells = sorted(original_cells.items(), key=lambda t: t[1], reverse=True)
-    sorted_anonymized_cells = sorted(anonymized_cells.items(), key=lambda t: t[1], reverse=True)
+        return score / num_cells_to_check
 
-    top_original_cells = sorted_original_cells[:num_cells_to_check]
-    top_anonymized_cells = dict(sorted_anonymized_cells[:min(len(anonymized_cells), num_cells_to_check)])
+PLUGIN = MeetUtility
 
-    # Compute final score based on common highly visited cells
-    for cell in top_original_cells:
-        cell = cell[0]
-        if cell in top_anonymized_cells:
-            score += 1
+def evaluate(context, parameters=None):
+    """Compute the crossing metric comparing original and anonymized data."""
+    return MeetUtility(parameters).run(context)
 
-    return score / num_cells_to_check
\ No newline at end of file
+def main(original_file, anonymized_file, parameters=None):
+    """Compute the crossing metric comparing original and anonymized data."""
+    return evaluate(EvaluationContext(original_file, anonymized_file), parameters)
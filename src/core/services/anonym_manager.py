@@ -1,81 +1,224 @@
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from src.core.services.anonym_threads import Footprint, Utility, Shuffle, NaiveAttack
+import os
+import shutil
+import tempfile
+from flask import current_app
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.core.services.anonym_threads import Footprint, Utility, NaiveAttack
 from src.constants.core_msg import *
 from src.core.utils import *
+from src.core.services.evaluation_context import EvaluationContext
+from src.core.services.dataset_cache import DatasetCache
+from src.core.services.file_manager import FileManager
+from src.core.services.metric_registry import MetricRegistry, scoring_digest
+from src.core.services.stage_pool import StagePool, run_stage
+from src.core.services.stage_limits import StageLimits
+from src.core.services.telemetry import StageProbe, file_bytes, read_samples
+from src.core.services.stage_profiler import profiled
+from src.core.services.stage_graph import Stage, StageGraph, CancelToken
+
+# Each stage declares the inputs it needs; it starts as soon as they exist
+PIPELINE_STAGES = (
+    Stage("footprint", requires=("columns",), provides=("footprint",)),
+    Stage("utility", requires=("columns",)),
+    Stage("naive_attack", requires=("columns", "footprint")),  # Footprint is its answer key
+)
 
 class AnonymManager:
     """Handles anonymization processing, including footprint generation and utility calculation."""
     
-    def __init__(self, app, input_file, origin_file, shuffled_file, footprint_file):
+    def __init__(self, app, input_file, origin_file, footprint_file, original_snapshot=None, metrics=None,
+                 original=None, origin_sha=None):
+        """
+        :param original_snapshot: DatasetCache snapshot of the original pinned by the job
+        :param metrics: MetricRegistry snapshot pinned by the job (the current one if None)
+        :param original: original columns already parsed by the caller, shared by its jobs
+        :param origin_sha: SHA-256 of the original file, if already known
+        """
+        self.app = app
         self.input_file = input_file
         self.origin_file = origin_file
-        self.shuffled_file = shuffled_file
         self.footprint_file = footprint_file
+        self.original_snapshot = original_snapshot
+        self.metrics = metrics or MetricRegistry().current()
+        if original_snapshot:
+            origin_sha = original_snapshot["sha256"]
+        self.context = EvaluationContext(
+            origin_file,
+            input_file,
+            original=original if original is not None else self._load_snapshot(original_snapshot),
+            digests={"origin": origin_sha} if origin_sha else None,
+        )
         self.executor = ThreadPoolExecutor(max_workers=4)
-        self.app = app
+        self.runners = {
+            "footprint": self._run_footprint,
+            "utility": self._run_utility,
+            "naive_attack": self._run_naive_attack,
+        }
+        self.job = None  # Set in "process" mode: paths handed to the worker processes
+        self.telemetry = []  # StageProbe samples of the validation and the stages
         
+    def _load_snapshot(self, snapshot):
+        """Maps the cached original columns; falls back to parsing the text file."""
+        if snapshot is None:
+            return None
+        try:
+            return DatasetCache.load(snapshot)
+        except Exception as e:
+            self.app.logger.warning(f"Dataset cache unavailable, parsing original file: {str(e)}")
+            return None
+
     def _run_footprint(self):
         """Runs Footprint calculation in a separate thread."""
         with self.app.app_context():
-            footprint = Footprint(self.input_file, self.origin_file, self.footprint_file)
+            if self.context.cancelled():
+                return (STAGE_CANCELLED, -1)
+            footprint = Footprint(self.input_file, self.origin_file, self.footprint_file, context=self.context)
             return footprint.process()
 
     def _run_utility(self):
         """Runs Utility calculation in a separate thread."""
         with self.app.app_context():
-            utility = Utility(self.input_file, self.origin_file)
+            if self.context.cancelled():
+                return (STAGE_CANCELLED, -1)
+            utility = Utility(self.input_file, self.origin_file, context=self.context, metrics=self.metrics)
             return utility.process() 
         
-    def _run_shuffle(self):
-        """Runs Shuffle in a separate thread."""
-        with self.app.app_context():
-            shuffle = Shuffle(self.input_file, self.origin_file, self.shuffled_file)
-            return shuffle.process() 
-
     def _run_naive_attack(self):
-        """Runs Naive Attack in a separate thread after shuffle is completed."""
+        """Runs Naive Attack in a separate thread after footprint is completed."""
         with self.app.app_context():
-            naive_attack = NaiveAttack(self.origin_file, self.input_file, self.footprint_file)
+            if self.context.cancelled():
+                return (STAGE_CANCELLED, -1)
+            naive_attack = NaiveAttack(self.origin_file, self.input_file, self.footprint_file, context=self.context)
             return naive_attack.process()
         
-    def process(self):
-        """Executes the anonymization process with concurrency."""
-        check = checking_shape(self.input_file, self.origin_file)
+    def _run_limited(self, stage):
+        """Runs a stage of the thread pool in a child process under its StageLimits, measuring it."""
+        with self.app.app_context():
+            limits = StageLimits.for_stage(self.app.config, stage)
+            function = profiled(self.runners[stage], stage, self.input_file, self.app.config)
+            probe = StageProbe(stage, rows=self.context.size, bytes_read=self.files_bytes())
+            try:
+                with probe:
+                    result = limits.run(function, cancelled=self.context.cancelled)
+                    probe.child_usage(limits.usage)
+            finally:
+                self.telemetry.append(probe.sample())
+            return result
+
+    def _submit(self, executor, stage):
+        """Submits a stage to the thread pool, or to the shared process pool with its job paths."""
+        if self.job is not None:
+            return executor.submit(run_stage, stage, self.job)
+        return executor.submit(self._run_limited, stage)
+
+    def _use_process_pool(self):
+        if self.app.config.get("PIPELINE_EXECUTOR", "thread") != "process":
+            return False
+        if not StagePool.supported():
+            self.app.logger.warning("Process pipeline needs fork(); running stages in threads")
+            return False
+        return True
+
+    def export_job(self, job_dir):
+        """
+        Writes the parsed columns for stages running in other processes (the cached
+        original is reused as is) and returns the JSON-serializable job description.
+        """
+        original_dir = self.original_snapshot["path"] if self.original_snapshot else None
+        original_dir, anonymized_dir = self.context.export(job_dir, original_dir=original_dir)
+        return {
+            "job_dir": job_dir,
+            "origin_file": self.origin_file,
+            "input_file": self.input_file,
+            "footprint_file": self.footprint_file,
+            "original_dir": original_dir,
+            "anonymized_dir": anonymized_dir,
+            "cancel_file": os.path.join(job_dir, "cancelled"),
+            "digests": {"origin": self.context.sha256("origin"), "input": self.context.sha256("input")},
+            "metrics": self.metrics,
+        }
+
+    def config_digest(self):
+        """Scoring config digest of this job: its original and the metrics it pinned."""
+        origin_sha = self.context.sha256("origin")
+        if self.original_snapshot is None:
+            DatasetCache.store_sha256(self.origin_file, origin_sha)  # Later uploads look it up
+        return scoring_digest(origin_sha, self.metrics["metrics"])
+
+    def files_bytes(self):
+        return file_bytes(self.origin_file, self.input_file)
+
+    def completed_stages(self):
+        """
+        Stages already done by an earlier attempt of this job. The footprint is
+        written atomically and only on success, so an existing file is complete.
+        """
+        if os.path.exists(self.footprint_file):
+            return {"footprint": 0}
+        return {}
+
+    def validate(self):
+        """Parses both files once (every stage reuses these columns) and checks their shape."""
+        if self.context.load_original() is None:
+            raise ValueError(f"Invalid file shape: {INVALID_ORIGINAL_FILE}")
+        if self.context.load_anonymized() is None:
+            raise ValueError(f"Invalid file shape: {INVALID_UPLOADED_FILE_FORMAT}")
+
+        with StageProbe("checking_shape", rows=self.context.size, bytes_read=self.files_bytes()) as probe:
+            check = checking_shape(self.input_file, self.origin_file, context=self.context)
+        self.telemetry.append(probe.sample())
         if isinstance(check, tuple):
             raise ValueError(f"Invalid file shape: {check[0]}")
 
-        results = {}
+    @staticmethod
+    def scores(results, failure):
+        """
+        Returns (utility, naive_attack, metric_scores) from the stage results,
+        raising the job's failure.
+        """
+        if failure is not None:
+            stage, error = failure
+            if isinstance(error, tuple):
+                raise RuntimeError(UNKNOWN_ERROR.format(error[0]))
+            current_app.logger.exception(f"Stage {stage} failed: {str(error)}", exc_info=error)
+            raise RuntimeError(UNKNOWN_ERROR.format(str(error)))
+
+        utility = results.get("utility", {"score": 0, "metrics": []})
+        return (utility["score"], results.get("naive_attack", -1), utility["metrics"])
+
+    def process(self):
+        """Executes the anonymization process with concurrency."""
+        self.validate()
+        job_dir = None
 
         try:
-            with self.executor as executor:  
-                # Run both functions asynchronously
-                future_footprint = executor.submit(self._run_footprint)
-                future_utility = executor.submit(self._run_utility)
-                future_shuffle = executor.submit(self._run_shuffle)
-                
-                # Wait for completion and store results
-                for future in as_completed([future_footprint, future_utility, future_shuffle]):
-                    try:
-
-                        result = future.result()
-                        if future == future_footprint:
-                            results["footprint"] = result
-                        elif future == future_utility:
-                            results["utility"] = result
-                        elif future == future_shuffle:
-                            results["shuffle"] = result
-                            # Start naive attack after shuffle is done
-                            future_naive_attack = executor.submit(self._run_naive_attack)
-                            results["naive_attack"] = future_naive_attack.result()
-                    except Exception as e:
-                        print(f"Error in task execution: {str(e)}")
-                        raise RuntimeError(UNKNOWN_ERROR.format(str(e)))
-                
-                for key, value in results.items():
-                    if isinstance(value, tuple):
-                        raise Exception(value[0])
-
-                return (results.get("utility", 0), results.get("naive_attack", -1))
+            if self._use_process_pool():
+                job_dir = tempfile.mkdtemp(dir=FileManager(upload_dir="stage_columns").upload_dir)
+                self.job = self.export_job(job_dir)
+                token = CancelToken(self.job["cancel_file"])
+                pool = nullcontext(StagePool.get(self.app))  # Shared pool, never shut down here
+            else:
+                token = CancelToken()
+                pool = self.executor
+            self.context.cancel_token = token
+
+            with pool as executor:
+                results, failure = StageGraph(PIPELINE_STAGES).run(
+                    lambda stage: self._submit(executor, stage.name),
+                    available=("columns",),
+                    token=token,
+                    done=self.completed_stages(),
+                )
+
+            if failure is not None and isinstance(failure[1], BrokenProcessPool):
+                StagePool.reset()
+            return self.scores(results, failure)
         
         except Exception as e:
-            raise RuntimeError(UNKNOWN_ERROR.format(str(e)))
\ No newline at end of file
+            raise RuntimeError(UNKNOWN_ERROR.format(str(e)))
+        finally:
+            if job_dir:
+                self.telemetry.extend(read_samples(job_dir))
+                shutil.rmtree(job_dir, ignore_errors=True)
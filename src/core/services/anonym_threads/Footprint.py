@@ -1,70 +1,83 @@
+import os
+import sys
 import json
-import csv
-from datetime import date
+import numpy as np
 from src.constants.core_msg import *
-from src.extensions import db
-from src.modules.anonymisation.models import AnonymModel 
-from sqlalchemy import select
+from src.core.services.evaluation_context import EvaluationContext
+from src.core.services.checkpoints import CheckpointStore, stage_key
 
 class Footprint:
     """
     Generates a footprint for anonymized data and updates the database.
     """
 
-    def __init__(self, input_file, origin_file, footprint_file):
+    def __init__(self, input_file, origin_file, footprint_file, context=None):
         self.input_file = input_file
         self.origin_file = origin_file
         self.footprint_file = footprint_file
+        self.context = EvaluationContext.resolve(context, origin_file, input_file)
         self.exception = None
 
     def process(self):
         """Main execution function for footprint generation."""
         try:
-            # Open original and anonymized files
-            with open(self.origin_file, "r") as fd_nona_file, open(self.input_file, "r") as fd_anon_file:
-                nona_reader = csv.reader(fd_nona_file, delimiter=SEPARATOR)
-                anon_reader = csv.reader(fd_anon_file, delimiter=SEPARATOR)
+            store = CheckpointStore() if CheckpointStore.enabled() else None
+            if store:
+                key = stage_key(self.context, "footprint", sys.modules[__name__])
+                if store.get_file(key, self.footprint_file):
+                    return 0 # Same inputs already linked
 
-                found_ids_weeks = {}  # {user_id: [list of weeks]}
-                linktable = {}  # {user_id: {week_number: [list of anonymized IDs]}}
+            size = self.context.size
+            original = self.context.original
+            anonymized = self.context.anonymized
 
-                for index, (row1, row2) in enumerate(zip(nona_reader, anon_reader), start=1):
-                    if not row2[0]:  # Missing anonymized user ID
-                        self.exception = MISSING_USER_ID.format(index)
-                        return (self.exception, -1)
+            missing = anonymized.missing_id[:size]
+            active = ~missing & ~anonymized.deleted[:size]
+            bad_date = active & ~anonymized.timestamps.date_valid[:size]
+            bad_original = active & ~bad_date & ~original.timestamps.date_valid[:size]
 
-                    if row2[0] != "DEL":
-                        try:
-                            y2, m2, d2 = row2[1][0:10].split("-")
-                            weeknum2 = date(int(y2), int(m2), int(d2)).isocalendar()[0:2]
-                            weeknum2 = f"{weeknum2[0]}-{weeknum2[1]}"
-                        except:
-                            self.exception = INVALID_DATE_FORMAT.format(index)
-                            return (self.exception, -1)
+            checked = active & ~bad_date & ~bad_original
+            original_weeks = original.week_codes()[:size]
+            week_mismatch = checked & (original_weeks != anonymized.week_codes()[:size])
+            linked = np.flatnonzero(checked & ~week_mismatch)
 
-                        y1, m1, d1 = row1[1][0:10].split("-")
-                        weeknum1 = date(int(y1), int(m1), int(d1)).isocalendar()[0:2]
-                        weeknum1 = f"{weeknum1[0]}-{weeknum1[1]}"
+            # First row of every (user, week) pair, in order of appearance
+            group_keys = original.id_codes[linked].astype(np.int64) * 1_000_000 + original_weeks[linked]
+            _, first_positions, groups = np.unique(group_keys, return_index=True, return_inverse=True)
+            first_rows = linked[first_positions]
+            anonym_codes = anonymized.id_codes
+            duplicates = linked[anonym_codes[linked] != anonym_codes[first_rows[groups]]]
 
-                        if weeknum1 != weeknum2:
-                            self.exception = DUPLICATE_USER_ID_WEEK.format(index)
-                            return (self.exception, -1)
+            # Report the first offending line, like a sequential scan would
+            errors = [
+                (np.flatnonzero(missing), MISSING_USER_ID),
+                (np.flatnonzero(bad_date), INVALID_DATE_FORMAT),
+                (np.flatnonzero(bad_original), INVALID_ORIGINAL_FILE),
+                (np.flatnonzero(week_mismatch), DUPLICATE_USER_ID_WEEK),
+                (duplicates, DUPLICATE_USER_ID_WEEK),
+            ]
+            first_errors = [(int(rows[0]), message) for rows, message in errors if rows.size]
+            if first_errors:
+                row, message = min(first_errors, key=lambda error: error[0])
+                self.exception = message.format(row + 1)
+                return (self.exception, -1)
 
-                        if row1[0] not in found_ids_weeks:
-                            found_ids_weeks[row1[0]] = [weeknum1]
-                            linktable[row1[0]] = {weeknum1: [row2[0]]}
-                        elif weeknum1 not in found_ids_weeks[row1[0]]:
-                            found_ids_weeks[row1[0]].append(weeknum1)
-                            linktable[row1[0]][weeknum1] = [row2[0]]
-                        elif linktable[row1[0]][weeknum1][0] != row2[0]:
-                            self.exception = DUPLICATE_USER_ID_WEEK.format(index)
-                            return (self.exception, -1)
+            linktable = {}  # {user_id: {week_number: [anonymized ID]}}
+            for row in np.sort(first_rows):
+                user_id = original.id_values[original.id_codes[row]]
+                week = original.week_label(original_weeks[row])
+                linktable.setdefault(user_id, {})[week] = [anonymized.id_values[anonym_codes[row]]]
 
-            with open(self.footprint_file, 'w') as result:
+            # Write then rename, so a crash never leaves a partial footprint behind
+            tmp_file = f"{self.footprint_file}.tmp"
+            with open(tmp_file, 'w') as result:
                 json.dump(linktable, result)
-            return 0 # Success 
-        
+            os.replace(tmp_file, self.footprint_file)
+            if store:
+                store.put_file(key, self.footprint_file)
+            return 0 # Success
+
         except Exception as e:
             self.exception = UNKNOWN_ERROR.format(str(e))
             return (self.exception, -1)
-    
\ No newline at end of file
+
@@ -1,56 +1,115 @@
+import sys
 import json
-import csv
+import numpy as np
 from collections import defaultdict
-from datetime import date
-from src.extensions import db
 from src.constants.core_msg import *
+from src.core.services.evaluation_context import EvaluationContext
+from src.core.services.checkpoints import CheckpointStore, stage_key
+
+SCAN_BLOCK = 32  # Candidates examined per query and per side at each sweep step
+
+def nearest_l1(queries, candidates):
+    """
+    Index of the L1-nearest candidate for every query (-1 when there is none).
+
+    Candidates are sorted on their first coordinate and scanned outward from
+    each query until the gap on that coordinate alone exceeds the best distance,
+    which can never be beaten past that point. Ties go to the lowest candidate
+    index, exactly like a sequential scan keeping the first strict minimum.
+    """
+    best_index = np.full(len(queries), -1, dtype=np.int64)
+    best_distance = np.full(len(queries), np.inf)
+    if len(queries) == 0 or len(candidates) == 0:
+        return best_index
+
+    order = np.argsort(candidates[:, 0], kind="stable")
+    xs, ys = candidates[order, 0], candidates[order, 1]
+    qx, qy = queries[:, 0], queries[:, 1]
+    steps = np.arange(SCAN_BLOCK)
+
+    for direction in (-1, 1):
+        start = np.searchsorted(xs, qx) + (-1 if direction < 0 else 0)
+        active = np.arange(len(queries))
+        while active.size:
+            positions = start[active, None] + direction * steps
+            valid = (positions >= 0) & (positions < xs.size)
+            positions = np.clip(positions, 0, xs.size - 1)
+            query_x, query_y = qx[active, None], qy[active, None]
+
+            valid &= np.abs(query_x - xs[positions]) <= best_distance[active, None]
+            distance = np.abs(query_x - xs[positions]) + np.abs(query_y - ys[positions])
+            distance = np.where(valid, distance, np.inf)
+            index = np.where(valid, order[positions], np.iinfo(np.int64).max)
+
+            block_distance = distance.min(axis=1)
+            block_index = np.where(distance == block_distance[:, None], index, np.iinfo(np.int64).max).min(axis=1)
+            better = (block_distance < best_distance[active]) | (
+                (block_distance == best_distance[active]) & (block_index < best_index[active])
+            )
+            best_distance[active[better]] = block_distance[better]
+            best_index[active[better]] = block_index[better]
+
+            # Keep scanning only while the farthest candidate of this block was still in reach
+            last = valid[:, -1] & (np.abs(query_x[:, 0] - xs[positions[:, -1]]) <= best_distance[active])
+            start[active] += direction * SCAN_BLOCK
+            active = active[last]
+
+    return best_index
 
 class NaiveAttack:
     """
     Executes a naive attack to re-identify individuals based on GPS data in anonymized datasets.
     """
     
-    def __init__(self, original_file, anonym_file, answer_json):
+    def __init__(self, original_file, anonym_file, answer_json, context=None):
         self.original_file = original_file
         self.anonym_file = anonym_file
         self.answer_json = answer_json
+        self.context = EvaluationContext.resolve(context, original_file, anonym_file)
         self.score = -1
         self.original_dict = None
         self.anonym_dict = None
     
-    def generate_sum_gps(self, file):
-        """Generates a dictionary mapping each month to the sum of GPS coordinates."""
-        dict_sum_gps = defaultdict(lambda: [0.0, 0.0])
-        with open(file, newline='') as csvfile:
-            reader = csv.reader(csvfile, delimiter=SEPARATOR)
-            for row in reader:
-                if row[0] != "DEL":
-                    y, m, d = row[1][:10].split("-")
-                    calendar = date(int(y), int(m), int(d)).isocalendar()
-                    id_date = f"{row[0]}.{calendar[0]}-{calendar[1]}"
-                    dict_sum_gps[id_date][0] += float(row[-2])
-                    dict_sum_gps[id_date][1] += float(row[-1])
-        return dict_sum_gps
+    def generate_sum_gps(self, columns):
+        """
+        Sums the GPS coordinates of each user-week, in order of first appearance.
+
+        :return: (id_codes, week_codes, sums) with `sums` shaped (user-weeks, 2).
+        """
+        rows = np.flatnonzero(~columns.deleted)
+        invalid = rows[~columns.timestamps.date_valid[rows]]
+        if invalid.size:
+            raise ValueError(INVALID_DATE_FORMAT.format(int(invalid[0]) + 1))
+        if np.isnan(columns.lat[rows]).any() or np.isnan(columns.lon[rows]).any():
+            raise ValueError(INVALID_UPLOADED_FILE_FORMAT)
+
+        weeks = columns.week_codes()[rows]
+        keys = columns.id_codes[rows].astype(np.int64) * 1_000_000 + weeks
+        _, first_positions, groups = np.unique(keys, return_index=True, return_inverse=True)
+
+        # bincount adds weights in row order, exactly like a sequential `+=`
+        sums = np.column_stack((
+            np.bincount(groups, weights=columns.lat[rows], minlength=first_positions.size),
+            np.bincount(groups, weights=columns.lon[rows], minlength=first_positions.size),
+        ))
+
+        appearance = np.argsort(first_positions, kind="stable")
+        first_rows = rows[first_positions[appearance]]
+        return columns.id_codes[first_rows], weeks[first_positions[appearance]], sums[appearance]
     
     def match_gps_data(self):
         """Matches anonymized GPS data with original data to re-identify records."""
-        self.original_dict = self.generate_sum_gps(self.original_file)
-        self.anonym_dict = self.generate_sum_gps(self.anonym_file)
+        original = self.context.original
+        anonymized = self.context.anonymized
+        original_ids, original_weeks, self.original_dict = self.generate_sum_gps(original)
+        anonym_ids, _, self.anonym_dict = self.generate_sum_gps(anonymized)
+
+        best_matches = nearest_l1(self.original_dict, self.anonym_dict)
 
         sol = defaultdict(dict)
-        for key in self.original_dict:
-            original_gps = self.original_dict[key]
-            min_distance = float('inf')
-            best_match = ""
-            
-            for key2 in self.anonym_dict:
-                difference = abs(original_gps[0] - self.anonym_dict[key2][0]) + \
-                             abs(original_gps[1] - self.anonym_dict[key2][1])
-                if difference < min_distance:
-                    min_distance = difference
-                    best_match = key2
-            
-            sol[key.split(".")[0]][key.split(".")[1]] = [best_match.split(".")[0]]
+        for user_code, week, best_match in zip(original_ids, original_weeks, best_matches):
+            matched_id = anonymized.id_values[anonym_ids[best_match]] if best_match >= 0 else ""
+            sol[original.id_values[user_code]][original.week_label(week)] = [matched_id]
         
         return sol
     
@@ -67,8 +126,18 @@ class NaiveAttack:
     
     def process(self):
         """Executes the naive attack and updates the database."""
+        store = CheckpointStore() if CheckpointStore.enabled() else None
+        if store:
+            key = stage_key(self.context, "naive_attack", sys.modules[__name__])
+            score = store.get(key)
+            if score is not None:
+                self.score = score
+                return self.result()
+
         solution = self.match_gps_data()
         self.calculate_score(solution)
+        if store:
+            store.put(key, self.score)
         return self.result()
     
     def result(self):
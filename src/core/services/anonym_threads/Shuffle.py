@@ -1,53 +1,121 @@
-import random
-import pandas as pd
-import csv
+import os
+import shutil
+import tempfile
+import numpy as np
 from src.constants.core_msg import *
-from src.core.utils import csv_length
-from src.core.services.file_manager import FileManager
+
+NEWLINE = ord("\n")
+
+def line_bounds(data):
+    """Start and end offsets of every newline-terminated line in a uint8 buffer."""
+    ends = np.flatnonzero(data == NEWLINE) + 1
+    starts = np.concatenate(([0], ends[:-1])).astype(np.int64)
+    return starts, ends
+
+def gather_lines(data, starts, lengths):
+    """Concatenates the byte ranges [start, start + length) in the given order."""
+    total = int(lengths.sum())
+    if total == 0:
+        return b""
+    shift = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+    return data[np.arange(total) + shift].tobytes()
+
 class Shuffle:
     """
     Handles shuffling of rows in a CSV file for anonymization purposes.
+
+    External-memory shuffle: one pass scatters every line into a uniformly random
+    on-disk bucket, then each bucket is permuted in memory and appended to the
+    output. The result is a uniform random permutation of the lines while RAM
+    stays bounded by the bucket size, whatever the file size.
     """
 
-    def __init__(self, input_file, origin_file, output_file):
+    def __init__(self, input_file, origin_file, output_file, seed=None):
         self.input_file = input_file
         self.origin_file = origin_file
         self.output_file = output_file
-        self.chunksize = 10_000_000  # Number of rows processed at a time
+        self.seed = seed
+        self.block_size = 4 * 1024 * 1024     # Bytes read per scatter step
+        self.bucket_size = 16 * 1024 * 1024   # Target bytes per bucket
+        self.max_buckets = 512
+        self.lines_per_write = 100_000
         self.exception = None
 
     def process(self):
         """Main execution function for shuffling the dataset."""
+        output_dir = os.path.dirname(os.path.abspath(self.output_file))
+        bucket_dir = tempfile.mkdtemp(prefix=".shuffle-", dir=output_dir)
+        fd, tmp_output = tempfile.mkstemp(prefix=".shuffled-", dir=output_dir)
+        output = os.fdopen(fd, "wb")  # Owns the descriptor from here on
         try:
-            size = csv_length(self.origin_file)
-            # Calculate total chunks
-            chunks = (size // self.chunksize) + (1 if size % self.chunksize > 0 else 0)
-            random_order = list(range(chunks))
-            random.shuffle(random_order)
-
-            for i in random_order:
-                start_idx = self.chunksize * i
-                rows_to_read = min(self.chunksize, size - start_idx)
-
-                chunk = self.chunk_shuffler(self.input_file, start_idx, rows_to_read)
-                chunk.to_csv(
-                    self.output_file, mode="a", sep=SEPARATOR, index=False, header=False, lineterminator="\n"
-                )
+            rng = np.random.default_rng(self.seed)
+            file_size = os.path.getsize(self.input_file)
+            buckets = min(self.max_buckets, max(1, -(-file_size // self.bucket_size)))
+            bucket_files = [os.path.join(bucket_dir, f"{i}.bin") for i in range(buckets)]
+
+            self.scatter(rng, bucket_files)
+            with output:
+                for bucket_file in bucket_files:
+                    self.shuffle_bucket(rng, bucket_file, output)
+
+            # Atomic publish: a retried job never sees (or appends to) a partial file
+            os.replace(tmp_output, self.output_file)
             return 0  # Success
 
         except Exception as e:
             self.exception = UNKNOWN_ERROR.format(str(e))
             return (self.exception, -1)
+        finally:
+            output.close()
+            shutil.rmtree(bucket_dir, ignore_errors=True)
+            if os.path.exists(tmp_output):
+                os.remove(tmp_output)
 
-
-    def chunk_shuffler(self, file, start_idx, rows_to_read):
-        """Reads a chunk from the CSV file, shuffles it, and returns as a DataFrame."""
+    def scatter(self, rng, bucket_files):
+        """Single pass over the input, sending every line to a random bucket."""
+        handles = [open(path, "wb") for path in bucket_files]
         try:
-            with open(file, "r") as f:
-                reader = csv.reader(f, delimiter=SEPARATOR)
-                chunk = [row for idx, row in enumerate(reader) if start_idx <= idx < start_idx + rows_to_read]
-                random.shuffle(chunk)
-                return pd.DataFrame(chunk)
-        except Exception as e:
-            self.exception = UNKNOWN_ERROR.format(str(e))
-            return pd.DataFrame()
\ No newline at end of file
+            with open(self.input_file, "rb") as source:
+                remainder = b""
+                while True:
+                    block = source.read(self.block_size)
+                    if not block:
+                        break
+                    data = remainder + block
+                    cut = data.rfind(b"\n") + 1
+                    remainder = data[cut:]
+                    self.scatter_lines(rng, data[:cut], handles)
+                if remainder:
+                    self.scatter_lines(rng, remainder + b"\n", handles)
+        finally:
+            for handle in handles:
+                handle.close()
+
+    def scatter_lines(self, rng, chunk, handles):
+        if not chunk:
+            return
+        data = np.frombuffer(chunk, dtype=np.uint8)
+        starts, ends = line_bounds(data)
+        targets = rng.integers(0, len(handles), size=starts.size)
+
+        order = np.argsort(targets, kind="stable")
+        lengths = (ends - starts)[order]
+        grouped = gather_lines(data, starts[order], lengths)
+
+        sizes = np.bincount(targets[order], weights=lengths, minlength=len(handles)).astype(np.int64)
+        offset = 0
+        for handle, size in zip(handles, sizes):
+            if size:
+                handle.write(grouped[offset:offset + size])
+                offset += size
+
+    def shuffle_bucket(self, rng, bucket_file, output):
+        """Loads one bucket, permutes its lines uniformly and appends them to the output."""
+        data = np.fromfile(bucket_file, dtype=np.uint8)
+        if not data.size:
+            return
+        starts, ends = line_bounds(data)
+        order = rng.permutation(starts.size)
+        for first in range(0, order.size, self.lines_per_write):
+            lines = order[first:first + self.lines_per_write]
+            output.write(gather_lines(data, starts[lines], (ends - starts)[lines]))
@@ -1,11 +1,9 @@
-import json
-import importlib
-from statistics import mean, median
-from sqlalchemy import select
+import time
 from src.constants.core_msg import *
-from src.extensions import db
-from src.modules.anonymisation.models import AnonymModel
-from src.modules.anonymisation.models import MetricModel, AggregationModel
+from src.core.services.evaluation_context import EvaluationContext, BLOCK_ROWS, METRIC_CHUNK_ROWS, row_chunks
+from src.core.services.checkpoints import CheckpointStore, BlockCache, stage_key, code_digest
+from src.core.services.metric_plugin import load_plugin
+from src.core.services.metric_registry import MetricRegistry, compile_metric, aggregation
 
 class Utility:
     """
@@ -13,41 +11,116 @@ class Utility:
     metric scripts and computing an aggregated score.
     """
 
-    def __init__(self, input_file, origin_file):
+    def __init__(self, input_file, origin_file, context=None, metrics=None):
+        """
+        :param metrics: MetricRegistry snapshot pinned by the job (the current one if None)
+        """
         self.input_file = input_file
         self.origin_file = origin_file
+        self.context = EvaluationContext.resolve(context, origin_file, input_file)
         self.error_message = None
         self.scripts = []  # List of selected metric scripts
         self.scores = []  # Stores scores from executed scripts
+        self.metric_scores = []  # Per-metric results, persisted with the submission
+        self.metrics = metrics
 
     def process(self):
-        """Fetches selected metric scripts from the database and executes them."""
+        """Executes the metric scripts selected in the pinned configuration snapshot."""
         try:
-            # Fetch selected metric scripts and parameters from the database
-            stmt = select(MetricModel.name, MetricModel.parameters).where(MetricModel.is_selected == True)
-            results = db.session.execute(stmt).fetchall()
-            self.scripts = [(row[0], row[1]) for row in results]
-            # Execute each script
-            for script_name, parameters in self.scripts:
-                try:
-
-                    metric_module = importlib.import_module(f"src.core.metrics.{script_name}")
-                    result = metric_module.main(self.origin_file, self.input_file, json.loads(parameters))
-                    
-                    if isinstance(result, tuple):  # Error in the submitted file
-                        self.error_message = UTILITY_CALCULATION_ERROR.format(script_name, result[1])
-                        return (self.error_message, -1)
-                    else:
-                        self.scores.append(result)  # Store valid results
-                except Exception as e:
-                    self.error_message = SCRIPT_ERROR.format(script_name, str(e))
-                    return (self.error_message, -1)
-            return self.result()  # Success
+            if self.metrics is None:
+                self.metrics = MetricRegistry().current()
+            self.scripts = [(name, parameters) for name, parameters in self.metrics["metrics"]]
+            error = self.evaluate(self.scripts)
+            if error:
+                return error
+            return self.outcome()  # Success
 
         except Exception as e:
             self.error_message = UNKNOWN_ERROR.format(str(e))
             return (self.error_message, -1)
 
+    def evaluate(self, scripts):
+        """
+        Executes each (script name, JSON parameters) metric, filling `scores` and
+        `metric_scores`. Returns None, or the `(error, -1)` tuple of the first
+        failing metric in `scripts` order.
+
+        Every metric is a fresh plugin instance fed from one streaming pass over
+        the shared columns; metrics whose score is checkpointed are skipped.
+        """
+        store = CheckpointStore() if CheckpointStore.enabled() else None
+        evaluations = [self._prepare(script_name, parameters, store) for script_name, parameters in scripts]
+        running = [entry for entry in evaluations if entry["plugin"] is not None]
+
+        for entry in running:
+            self._step(entry, lambda plugin: plugin.start(self.context))
+        chunk_rows = BLOCK_ROWS if store else METRIC_CHUNK_ROWS  # Block-sized chunks hit the block cache
+        for rows in row_chunks(self.context.size, chunk_rows):
+            if self.context.cancelled():
+                return (STAGE_CANCELLED, -1)
+            for entry in running:
+                if entry["exception"] is None and entry["plugin"].error is None:
+                    self._step(entry, lambda plugin: plugin.update(rows))
+
+        for entry in evaluations:
+            script_name = entry["name"]
+            if entry["plugin"] is not None and entry["exception"] is None:
+                entry["score"] = self._step(entry, lambda plugin: plugin.finalize())
+            if entry["exception"] is not None:
+                self.error_message = SCRIPT_ERROR.format(script_name, str(entry["exception"]))
+                return (self.error_message, -1)
+
+            result = entry["score"]
+            if isinstance(result, tuple):  # Error in the submitted file
+                self.error_message = UTILITY_CALCULATION_ERROR.format(script_name, result[1])
+                return (self.error_message, -1)
+            if entry["key"] is not None and entry["plugin"] is not None:
+                store.put(entry["key"], result)
+            self.scores.append(result)  # Store valid results
+            self.metric_scores.append({
+                "metric": script_name,
+                "parameters_hash": entry["parameters_hash"],
+                "score": float(result),
+                "duration": entry["seconds"],
+            })
+        return None
+
+    def _prepare(self, script_name, parameters, store):
+        """Loads one metric (imported once per process): its checkpointed score, or a new plugin to feed."""
+        entry = {"name": script_name, "parameters_hash": None, "plugin": None, "key": None,
+                 "score": None, "exception": None, "seconds": 0.0}
+        try:
+            metric_module, values, entry["parameters_hash"] = compile_metric(script_name, parameters)
+            block_cache = None
+            if store:
+                entry["key"] = stage_key(self.context, "metric", metric_module, script_name, values)
+                entry["score"] = store.get(entry["key"])
+                if entry["score"] is not None:
+                    return entry
+                block_cache = BlockCache(store, self.context, script_name, values, code_digest(metric_module))
+            entry["plugin"] = load_plugin(metric_module, values, block_cache=block_cache)
+        except Exception as e:
+            entry["exception"] = e
+        return entry
+
+    @staticmethod
+    def _step(entry, call):
+        """Runs one call on the entry's plugin, timing it and recording its exception."""
+        started = time.perf_counter()
+        try:
+            return call(entry["plugin"])
+        except Exception as e:
+            entry["exception"] = e
+        finally:
+            entry["seconds"] += time.perf_counter() - started
+
+    def outcome(self):
+        """Stage result: the utility score with the per-metric scores it aggregates."""
+        score = self.result()
+        if isinstance(score, tuple):
+            return score
+        return {"score": score, "metrics": self.metric_scores}
+
     def result(self):
         """Returns the final utility score based on the selected aggregation method."""
         if self.error_message:
@@ -56,15 +129,8 @@ class Utility:
         if not self.scores:
             return (NO_WORKING_UTILITY_SCRIPT, -1)
 
-        # Fetch the aggregation method from the database
-        stmt = select(AggregationModel.name).where(AggregationModel.is_selected == True)
-        aggregation_method = db.session.execute(stmt).scalar()
+        if self.metrics is None:
+            self.metrics = MetricRegistry().current()
 
         # Compute and return the final aggregated score
-        aggregation_functions = {
-            "mean": mean,
-            "median": median,
-            "max": max,
-            "min": min
-        }
-        return aggregation_functions.get(aggregation_method, mean)(self.scores)  # Default to mean
\ No newline at end of file
+        return aggregation(self.metrics)(self.scores)  # Default to mean
\ No newline at end of file
@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import numpy as np
+from functools import lru_cache
+from flask import current_app
+from src.core.services.file_manager import FileManager
+from src.core.services.evaluation_context import BLOCK_ROWS
+
+@lru_cache(maxsize=64)
+def _source_digest(path, mtime):
+    with open(path, "rb") as source:
+        return hashlib.sha256(source.read()).hexdigest()
+
+
+def code_digest(module):
+    """Digest of a module's source, so editing a stage or metric invalidates its checkpoints."""
+    path = module.__file__
+    return _source_digest(path, os.path.getmtime(path))
+
+
+class CheckpointStore:
+    """
+    Content-addressed outputs of pipeline stages.
+
+    A key hashes everything a stage output depends on: the stage name, the
+    SHA-256 of both input files, the stage's parameters and its source code.
+    Re-running a job (retry, recovery or re-score) therefore reuses every stage
+    whose key already exists, and a changed input or config simply misses.
+    Entries are written to a temp file and renamed, so readers never see a
+    partial checkpoint. Reads refresh an entry's modification time, and
+    `prune()` drops the least recently used ones past CHECKPOINT_MAX_AGE_DAYS
+    or CHECKPOINT_MAX_MB.
+    """
+
+    PRUNE_INTERVAL = 3600  # Seconds between two prunes of one process
+    _last_prune = None
+
+    def __init__(self):
+        self.directory = FileManager(upload_dir="checkpoints").upload_dir
+
+    @staticmethod
+    def enabled():
+        return current_app.config.get("STAGE_CHECKPOINTS", False)
+
+    @staticmethod
+    def key(stage, *parts):
+        payload = json.dumps([stage, *parts], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key[:2], f"{key}{suffix}")
+
+    def _publish(self, write, path):
+        """Writes through a temp file; returns False (and logs) if the disk write fails."""
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write(tmp_path)
+            os.replace(tmp_path, path)
+            return True
+        except (OSError, TypeError) as e:
+            current_app.logger.warning(f"Checkpoint write failed for {path}: {str(e)}")
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    @staticmethod
+    def _touch(path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get(self, key):
+        """Stored value for `key`, or None."""
+        path = self._path(key, ".json")
+        try:
+            with open(path) as entry:
+                value = json.load(entry)["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+        self._touch(path)
+        return value
+
+    def put(self, key, value):
+        def write(path):
+            with open(path, "w") as entry:
+                json.dump({"value": value}, entry)
+        self._publish(write, self._path(key, ".json"))
+
+    def get_array(self, key):
+        """Stored array for `key`, or None."""
+        path = self._path(key, ".npy")
+        try:
+            values = np.load(path)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return values
+
+    def put_array(self, key, values):
+        def write(path):
+            with open(path, "wb") as entry:
+                np.save(entry, values)
+        self._publish(write, self._path(key, ".npy"))
+
+    def get_file(self, key, destination):
+        """Copies the stored file for `key` to `destination`; False if there is none."""
+        source = self._path(key, ".file")
+        if not os.path.exists(source):
+            return False
+        self._touch(source)
+        return self._publish(lambda path: shutil.copyfile(source, path), destination)
+
+    def put_file(self, key, source):
+        self._publish(lambda path: shutil.copyfile(source, path), self._path(key, ".file"))
+
+    def prune(self, max_age_seconds=None, max_bytes=None):
+        """
+        Deletes the entries unused for `max_age_seconds`, then the least
+        recently used ones until the store fits in `max_bytes` (None: no limit).
+        :return: number of deleted entries
+        """
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+        for mtime, size, path in entries:
+            too_old = max_age_seconds is not None and now - mtime > max_age_seconds
+            too_big = max_bytes is not None and total > max_bytes
+            if not (too_old or too_big):
+                break  # Sorted oldest first: everything after is newer and fits
+            try:
+                os.remove(path)
+                deleted += 1
+            except OSError:
+                pass
+            total -= size
+        return deleted
+
+    @classmethod
+    def prune_if_due(cls, config):
+        """Applies the CHECKPOINT_* retention at most every PRUNE_INTERVAL seconds."""
+        if cls._last_prune is not None and time.monotonic() - cls._last_prune < cls.PRUNE_INTERVAL:
+            return 0
+        cls._last_prune = time.monotonic()
+        max_age_days = config.get("CHECKPOINT_MAX_AGE_DAYS", 7)
+        max_mb = config.get("CHECKPOINT_MAX_MB", 1024)
+        return cls().prune(
+            max_age_seconds=max_age_days * 86400 if max_age_days else None,
+            max_bytes=max_mb * 1024 * 1024 if max_mb else None,
+        )
+
+
+def stage_key(context, stage, module, *config):
+    """Checkpoint key of a stage run on the context's two input files."""
+    return CheckpointStore.key(stage, context.sha256("origin"), context.sha256("input"), code_digest(module), *config)
+
+
+class BlockCache:
+    """
+    Partial sums of one metric's row scores for each BLOCK_ROWS block of the
+    anonymized file, keyed by the block's bytes and position: a re-upload that
+    edits a few rows only scores the blocks it touched. Each block stores its
+    sum and row count, a few bytes whatever the block size. Adding block sums
+    rounds differently from one running sum, so this summation mode is part of
+    the scoring config digest.
+    """
+
+    def __init__(self, store, context, *config):
+        self.store = store
+        self.context = context
+        self.config = config
+
+    def _key(self, rows):
+        blocks = self.context.input_blocks(BLOCK_ROWS)
+        index = rows.start // BLOCK_ROWS
+        if rows.start % BLOCK_ROWS or index >= len(blocks):
+            return None  # Not a block boundary, or rows and lines disagree
+        return CheckpointStore.key(
+            "metric_block", *self.config, self.context.sha256("origin"), rows.start, rows.stop, blocks[index]
+        )
+
+    def get(self, rows):
+        """(sum, count) of the block's row scores, or None."""
+        key = self._key(rows)
+        value = self.store.get(key) if key else None
+        return tuple(value) if value is not None else None
+
+    def put(self, rows, total, count):
+        key = self._key(rows)
+        if key:
+            self.store.put(key, [total, count])
@@ -0,0 +1,52 @@
+import os
+import shutil
+from src.core.utils import file_sha256
+from src.core.services.file_manager import FileManager
+
+
+class ContentStore:
+    """
+    Content-addressed storage of uploaded files.
+
+    The bytes of a file live once, under `objects/<sha[:2]>/<sha><ext>`; every
+    submission path is a hard link to that object, so identical uploads share
+    their storage while each row keeps its own (unique) path. Removing a link
+    never touches the other submissions; `release()` drops the object once no
+    link is left.
+    """
+
+    def __init__(self, upload_dir="anonym_file"):
+        self.directory = os.path.join(FileManager(upload_dir=upload_dir).upload_dir, "objects")
+
+    def object_path(self, sha256, ext=".csv"):
+        return os.path.join(self.directory, sha256[:2], f"{sha256}{ext}")
+
+    def put(self, path):
+        """
+        Moves the file at `path` into the store (or drops it when the content is
+        already there) and links it back at `path`.
+        :return: the SHA-256 of the content
+        """
+        sha256 = file_sha256(path)
+        target = self.object_path(sha256, os.path.splitext(path)[1])
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(target):
+            os.remove(path)
+        else:
+            os.replace(path, target)
+        self.link(target, path)
+        return sha256
+
+    @staticmethod
+    def link(source, destination):
+        """Hard-links `destination` to `source`, copying when links are not supported."""
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+
+    def release(self, sha256, ext=".csv"):
+        """Removes the object once no submission links to it anymore."""
+        target = self.object_path(sha256, ext)
+        if os.path.exists(target) and os.stat(target).st_nlink <= 1:
+            os.remove(target)
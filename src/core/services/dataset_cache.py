@@ -0,0 +1,158 @@
+import os
+import json
+import uuid
+import shutil
+from src.core.services.file_manager import FileManager
+from src.core.services.evaluation_context import DatasetColumns
+from src.core.utils import file_sha256
+
+class DatasetCache:
+    """
+    Preprocessed, memory-mapped columnar cache of the active original dataset.
+
+    Each cached version lives in its own directory named `<file_id>-<sha256 prefix>`,
+    so activating another raw file never touches a version that running jobs
+    have already mapped. The active version is published through a small pointer
+    file that is replaced atomically.
+    """
+
+    ACTIVE_POINTER = "active.json"
+    DIGEST_SUFFIX = ".sha256"  # Recorded digest of an original, next to its CSV
+    SOURCE = "source.json"  # CSV a version was built from, for garbage collection
+
+    def __init__(self):
+        self.cache_dir = FileManager(upload_dir="dataset_cache").upload_dir
+        self.pointer_path = os.path.join(self.cache_dir, self.ACTIVE_POINTER)
+
+    @staticmethod
+    def csv_path(raw_file):
+        """Path of the CSV extracted next to an uploaded raw ZIP file (see FileManager.unzip_file)."""
+        return os.path.join(os.path.dirname(raw_file.file_path), FileManager.extracted_csv_name(raw_file.file_path))
+
+    @staticmethod
+    def stored_sha256(csv_path):
+        """
+        SHA-256 of `csv_path` recorded by `store_sha256()`, or None if there is
+        none or the file changed since (size or modification time).
+        """
+        try:
+            with open(f"{csv_path}{DatasetCache.DIGEST_SUFFIX}") as record:
+                stored = json.load(record)
+            stat = os.stat(csv_path)
+        except (OSError, ValueError):
+            return None
+        if stored.get("csv_size") != stat.st_size or stored.get("csv_mtime") != stat.st_mtime:
+            return None
+        return stored.get("sha256")
+
+    @staticmethod
+    def store_sha256(csv_path, sha256):
+        """Records the SHA-256 of `csv_path` next to it, so requests never hash the file themselves."""
+        try:
+            stat = os.stat(csv_path)
+            tmp_record = f"{csv_path}{DatasetCache.DIGEST_SUFFIX}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_record, "w") as record:
+                json.dump({"sha256": sha256, "csv_size": stat.st_size, "csv_mtime": stat.st_mtime}, record)
+            os.replace(tmp_record, f"{csv_path}{DatasetCache.DIGEST_SUFFIX}")
+        except OSError:
+            pass  # Only an optimization: uploads then skip score reuse
+
+    def build(self, file_id, csv_path):
+        """Builds (or reuses) the cached columns of `csv_path` and returns its snapshot."""
+        sha256 = file_sha256(csv_path)
+        self.store_sha256(csv_path, sha256)
+        version = f"{file_id}-{sha256[:16]}"
+        version_dir = os.path.join(self.cache_dir, version)
+
+        if not os.path.isdir(version_dir):
+            tmp_dir = os.path.join(self.cache_dir, f".{version}.{uuid.uuid4().hex[:8]}.tmp")
+            try:
+                DatasetColumns(csv_path).save(tmp_dir)
+                with open(os.path.join(tmp_dir, self.SOURCE), "w") as source:
+                    json.dump({"csv_path": csv_path}, source)
+                os.rename(tmp_dir, version_dir)
+            except OSError:
+                # Another worker published the same version first
+                if not os.path.isdir(version_dir):
+                    raise
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        stat = os.stat(csv_path)
+        return {
+            "file_id": file_id,
+            "sha256": sha256,
+            "version": version,
+            "path": version_dir,
+            "csv_path": csv_path,
+            "csv_size": stat.st_size,
+            "csv_mtime": stat.st_mtime,
+        }
+
+    def activate(self, file_id, csv_path):
+        """Builds the cache of `csv_path` and atomically makes it the active version."""
+        snapshot = self.build(file_id, csv_path)
+        tmp_pointer = f"{self.pointer_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_pointer, "w") as pointer:
+            json.dump(snapshot, pointer)
+        os.replace(tmp_pointer, self.pointer_path)
+        return snapshot
+
+    def deactivate(self):
+        """Clears the active version (evaluations fall back to parsing the text file)."""
+        if os.path.exists(self.pointer_path):
+            os.remove(self.pointer_path)
+
+    def active_snapshot(self):
+        """Returns the active snapshot, or None if there is none or it is stale."""
+        try:
+            with open(self.pointer_path) as pointer:
+                snapshot = json.load(pointer)
+            stat = os.stat(snapshot["csv_path"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+        if not os.path.isdir(snapshot["path"]):
+            return None
+        if stat.st_size != snapshot["csv_size"] or stat.st_mtime != snapshot["csv_mtime"]:
+            return None  # The CSV changed on disk since the cache was built
+        return snapshot
+
+    def remove(self, file_id):
+        """Stops serving a raw file's cache; `collect()` deletes its versions once unused."""
+        snapshot = self.active_snapshot()
+        if snapshot and snapshot["file_id"] == file_id:
+            self.deactivate()
+
+    def collect(self, in_use):
+        """
+        Deletes the versions built from CSVs outside `in_use` (the originals of
+        queued and processing jobs), except the active one. Running jobs keep
+        their mapped copies valid until they unmap them.
+        :return: number of deleted versions
+        """
+        try:
+            with open(self.pointer_path) as pointer:
+                active = json.load(pointer).get("version")
+        except (OSError, ValueError):
+            active = None
+
+        deleted = 0
+        for entry in os.listdir(self.cache_dir):
+            version_dir = os.path.join(self.cache_dir, entry)
+            if entry == active or entry.startswith(".") or not os.path.isdir(version_dir):
+                continue
+            try:
+                with open(os.path.join(version_dir, self.SOURCE)) as source:
+                    csv_path = json.load(source)["csv_path"]
+            except (OSError, ValueError, KeyError):
+                csv_path = None
+            if csv_path not in in_use:
+                shutil.rmtree(version_dir, ignore_errors=True)
+                deleted += 1
+        return deleted
+
+    @staticmethod
+    def load(snapshot):
+        """Maps a snapshot's columns zero-copy."""
+        return DatasetColumns.load(snapshot["path"], file_path=snapshot["csv_path"])
@@ -0,0 +1,437 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import date
+import numpy as np
+import pandas as pd
+from src.constants.core_msg import SEPARATOR
+from src.core.utils import file_sha256
+
+#################################
+#         Global variables      #
+#################################
+DELETED_ID = "DEL"
+HOUR_UNPARSABLE = -100          # Sentinel for hours that int() cannot parse
+DECODE_CHUNK_ROWS = 1_000_000   # Rows decoded at a time (bounds temporary memory)
+METRIC_CHUNK_ROWS = 1_000_000   # Rows scored at a time by vectorized metrics
+BLOCK_ROWS = 8192               # Rows per hashed block of incremental metric evaluation
+TIMESTAMP_WIDTH = 19            # "YYYY-MM-DD HH:MM:SS"
+
+_DIGIT_ZERO = ord("0")
+_DASH = ord("-")
+_COLON = ord(":")
+
+
+def scan_lines(file_path):
+    """
+    Scans the raw bytes of a text file once and returns per-line statistics.
+
+    :return: (line_count, separator_counts, del_prefix) where `separator_counts[i]`
+             is the number of separators on line i and `del_prefix[i]` tells whether
+             line i starts with "DEL".
+    """
+    data = np.fromfile(file_path, dtype=np.uint8)
+    if data.size == 0:
+        return 0, np.zeros(0, dtype=np.int32), np.zeros(0, dtype=bool)
+
+    line_ends = np.flatnonzero(data == ord("\n"))
+    if data[-1] != ord("\n"):
+        line_ends = np.append(line_ends, data.size)
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+
+    separators = np.flatnonzero(data == ord(SEPARATOR))
+    separator_counts = np.diff(np.searchsorted(separators, np.concatenate(([0], line_ends)))).astype(np.int32)
+
+    padded = np.concatenate((data, np.zeros(3, dtype=np.uint8)))
+    del_prefix = (
+        (padded[line_starts] == ord("D"))
+        & (padded[line_starts + 1] == ord("E"))
+        & (padded[line_starts + 2] == ord("L"))
+        & (line_ends - line_starts >= 3)
+    )
+    return line_ends.size, separator_counts, del_prefix
+
+
+def block_digests(file_path, block_rows=BLOCK_ROWS):
+    """SHA-256 of the raw bytes of every `block_rows`-line block of a text file, in order."""
+    data = np.fromfile(file_path, dtype=np.uint8)
+    line_ends = np.flatnonzero(data == ord("\n")) + 1
+    bounds = np.concatenate(([0], line_ends[block_rows - 1::block_rows]))
+    if bounds[-1] != data.size:
+        bounds = np.append(bounds, data.size)
+    return [hashlib.sha256(data[start:end]).hexdigest() for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _legacy_date(timestamp):
+    """Parses the date part exactly like the historical `date(...).isocalendar()` code."""
+    try:
+        year, month, day = timestamp[0:10].split("-")
+        return date(int(year), int(month), int(day)).isocalendar()
+    except Exception:
+        return None
+
+
+def _legacy_hour(timestamp):
+    """Parses the hour exactly like the historical `int(timestamp[11:13])` code."""
+    try:
+        return int(timestamp[11:13])
+    except Exception:
+        return HOUR_UNPARSABLE
+
+
+def _digits(chars, start, count):
+    """Returns the integer value of `count` ASCII digits at `start` and a validity mask."""
+    value = np.zeros(chars.shape[0], dtype=np.int64)
+    valid = np.ones(chars.shape[0], dtype=bool)
+    for offset in range(count):
+        digit = chars[:, start + offset].astype(np.int64) - _DIGIT_ZERO
+        valid &= (digit >= 0) & (digit <= 9)
+        value = value * 10 + digit
+    return value, valid
+
+
+class TimestampColumns:
+    """
+    Vectorized decoding of fixed-format `YYYY-MM-DD HH:MM:SS...` timestamps.
+
+    Rows that do not follow the fixed format fall back to the historical
+    per-row parser, so results are identical to the previous implementation.
+    """
+
+    ARRAYS = ("length", "iso_year", "iso_week", "weekday", "date_valid", "hour", "datetime")
+
+    def __init__(self, timestamps):
+        size = len(timestamps)
+        self.length = np.fromiter(map(len, timestamps), dtype=np.int32, count=size)
+        self.iso_year = np.zeros(size, dtype=np.int32)
+        self.iso_week = np.zeros(size, dtype=np.int16)
+        self.weekday = np.zeros(size, dtype=np.int8)
+        self.date_valid = np.zeros(size, dtype=bool)
+        self.hour = np.full(size, HOUR_UNPARSABLE, dtype=np.int16)
+        self.datetime = np.full(size, np.datetime64("NaT"), dtype="datetime64[s]")
+
+        for start in range(0, size, DECODE_CHUNK_ROWS):
+            stop = min(start + DECODE_CHUNK_ROWS, size)
+            self._decode_chunk(timestamps, start, stop)
+
+    @classmethod
+    def allocate(cls, size):
+        """Columns for `size` rows, filled chunk by chunk with `put()`."""
+        columns = cls(np.empty(0, dtype=object))
+        for name in cls.ARRAYS:
+            setattr(columns, name, np.empty(size, dtype=getattr(columns, name).dtype))
+        return columns
+
+    def put(self, start, chunk):
+        """Copies the rows decoded in `chunk` (a TimestampColumns) to rows `start` onwards."""
+        stop = start + chunk.length.shape[0]
+        for name in self.ARRAYS:
+            getattr(self, name)[start:stop] = getattr(chunk, name)
+
+    @property
+    def epoch(self):
+        """Seconds since 1970-01-01 (NaT rows are reported as the minimum int64)."""
+        return self.datetime.astype(np.int64)
+
+    def _decode_chunk(self, timestamps, start, stop):
+        chunk = np.asarray(timestamps[start:stop]).astype(f"U{TIMESTAMP_WIDTH}")
+        chars = chunk.view(np.uint32).reshape(-1, TIMESTAMP_WIDTH)
+
+        # --- Date part (YYYY-MM-DD)
+        year, ok_year = _digits(chars, 0, 4)
+        month, ok_month = _digits(chars, 5, 2)
+        day, ok_day = _digits(chars, 8, 2)
+        fixed_date = ok_year & ok_month & ok_day & (chars[:, 4] == _DASH) & (chars[:, 7] == _DASH)
+        fixed_date &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1)
+
+        months = np.where(fixed_date, (year - 1970) * 12 + month - 1, 0).astype("datetime64[M]")
+        days = months.astype("datetime64[D]") + np.where(fixed_date, day - 1, 0).astype("timedelta64[D]")
+        fixed_date &= days.astype("datetime64[M]") == months  # Rejects 2025-02-30 and friends
+
+        day_number = days.astype(np.int64)
+        weekday = (day_number + 3) % 7 + 1
+        thursday = (day_number - weekday + 4).astype("datetime64[D]")
+        thursday_year = thursday.astype("datetime64[Y]")
+        iso_week = (thursday - thursday_year.astype("datetime64[D]")).astype(np.int64) // 7 + 1
+
+        self.iso_year[start:stop] = np.where(fixed_date, thursday_year.astype(np.int64) + 1970, 0)
+        self.iso_week[start:stop] = np.where(fixed_date, iso_week, 0)
+        self.weekday[start:stop] = np.where(fixed_date, weekday, 0)
+        self.date_valid[start:stop] = fixed_date
+
+        # --- Time part (HH:MM:SS)
+        hour, fixed_hour = _digits(chars, 11, 2)
+        self.hour[start:stop] = np.where(fixed_hour, hour, HOUR_UNPARSABLE)
+
+        minute, ok_minute = _digits(chars, 14, 2)
+        second, ok_second = _digits(chars, 17, 2)
+        fixed_time = (
+            fixed_date & fixed_hour & ok_minute & ok_second
+            & (chars[:, 13] == _COLON) & (chars[:, 16] == _COLON)
+            & (hour < 24) & (minute < 60) & (second < 60)
+        )
+        seconds = day_number * 86400 + hour * 3600 + minute * 60 + second
+        self.datetime[start:stop] = np.where(
+            fixed_time, seconds.astype("datetime64[s]"), np.datetime64("NaT")
+        )
+
+        # --- Historical per-row fallback for anything that is not fixed-format
+        length = self.length[start:stop]
+        for index in np.flatnonzero(~fixed_date & (length > 0)):
+            calendar = _legacy_date(chunk[index])
+            if calendar is not None:
+                row = start + index
+                self.iso_year[row], self.iso_week[row], self.weekday[row] = calendar
+                self.date_valid[row] = True
+
+        for index in np.flatnonzero(~fixed_hour & (length > 11)):
+            self.hour[start + index] = _legacy_hour(timestamps[start + index])
+
+
+def ordered_sum(values, start=0.0):
+    """
+    Adds `values` one after the other, starting from `start`.
+
+    Unlike `np.sum` (pairwise summation) this rounds exactly like a Python
+    `total += value` loop, so vectorized metrics keep bit-for-bit identical scores.
+    """
+    if values.size == 0:
+        return start
+    return float(np.add.accumulate(np.concatenate(([start], values)))[-1])
+
+
+def row_chunks(size, chunk_rows=METRIC_CHUNK_ROWS):
+    """Yields consecutive row slices of at most `chunk_rows` rows."""
+    for start in range(0, size, chunk_rows):
+        yield slice(start, min(start + chunk_rows, size))
+
+
+def parse_coordinates(values):
+    """
+    Converts a column of strings into float64 exactly like `float()` does.
+    Empty or unparsable cells become NaN.
+    """
+    values = np.asarray(values, dtype=object)
+    result = np.full(values.shape[0], np.nan)
+    filled = np.flatnonzero(values != "")
+    try:
+        result[filled] = values[filled].astype(np.float64)
+    except ValueError:
+        for index in filled:
+            try:
+                result[index] = float(values[index])
+            except ValueError:
+                pass
+    return result
+
+
+class DatasetColumns:
+    """
+    Typed, columnar view of one TSV dataset (id, timestamp, coordinates).
+
+    Every pipeline stage reads these arrays instead of re-tokenizing the file.
+    """
+
+    ARRAYS = ("separator_counts", "del_prefix", "id_codes", "deleted", "missing_id", "lat", "lon")
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.line_count, self.separator_counts, self.del_prefix = scan_lines(file_path)
+        self.width = int(self.separator_counts[0]) + 1 if self.line_count else -1
+
+        # The text is tokenized DECODE_CHUNK_ROWS rows at a time straight into the
+        # typed columns, so only one chunk of Python strings is alive at once
+        self.id_codes = np.empty(self.line_count, dtype=np.int32)
+        self.deleted = np.empty(self.line_count, dtype=bool)
+        self.missing_id = np.empty(self.line_count, dtype=bool)
+        self.lat = np.empty(self.line_count)
+        self.lon = np.empty(self.line_count)
+        self.timestamps = TimestampColumns.allocate(self.line_count)
+        id_index = {}  # Id -> code, in order of first appearance like pd.factorize
+
+        self.size = 0
+        for frame in self._read_chunks():
+            start, stop = self.size, self.size + len(frame)
+            ids = frame[0].to_numpy(dtype=object)
+            codes, uniques = pd.factorize(ids)
+            chunk_codes = np.fromiter(
+                (id_index.setdefault(value, len(id_index)) for value in uniques), dtype=np.int32, count=len(uniques)
+            )
+            self.id_codes[start:stop] = chunk_codes[codes]
+            self.deleted[start:stop] = ids == DELETED_ID
+            self.missing_id[start:stop] = ids == ""
+            self.timestamps.put(start, TimestampColumns(frame[1].to_numpy(dtype=object)))
+            self.lat[start:stop] = parse_coordinates(frame[2].to_numpy(dtype=object))
+            self.lon[start:stop] = parse_coordinates(frame[3].to_numpy(dtype=object))
+            self.size = stop
+
+        if self.size != self.line_count:  # Quoted fields spanning lines
+            for name in ("id_codes", "deleted", "missing_id", "lat", "lon"):
+                setattr(self, name, getattr(self, name)[:self.size])
+            for name in TimestampColumns.ARRAYS:
+                setattr(self.timestamps, name, getattr(self.timestamps, name)[:self.size])
+        self.id_values = np.array(list(id_index), dtype=object)
+
+    def _read_chunks(self):
+        """Yields the rows of the file as string frames of at most DECODE_CHUNK_ROWS rows."""
+        if not self.line_count:
+            return
+        yield from pd.read_csv(
+            self.file_path,
+            sep=SEPARATOR,
+            header=None,
+            names=range(max(int(self.separator_counts.max()) + 1, 4)),
+            dtype=str,
+            na_filter=False,
+            keep_default_na=False,
+            skip_blank_lines=False,
+            encoding="utf-8",
+            chunksize=DECODE_CHUNK_ROWS,
+        )
+
+    def save(self, directory):
+        """Stores every column as a `.npy` file so it can be memory-mapped later."""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        for name in TimestampColumns.ARRAYS:
+            np.save(os.path.join(directory, f"timestamps_{name}.npy"), getattr(self.timestamps, name))
+        np.save(os.path.join(directory, "id_values.npy"), np.array(list(self.id_values), dtype=str))
+        with open(os.path.join(directory, "shape.json"), "w") as shape:
+            json.dump({"line_count": self.line_count, "width": self.width, "size": self.size}, shape)
+
+    @classmethod
+    def load(cls, directory, file_path=None, mmap_mode="r"):
+        """Maps columns previously written by `save()` without copying or parsing them."""
+        columns = cls.__new__(cls)
+        columns.file_path = file_path
+        for name in cls.ARRAYS:
+            setattr(columns, name, np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode))
+        columns.timestamps = TimestampColumns.__new__(TimestampColumns)
+        for name in TimestampColumns.ARRAYS:
+            array = np.load(os.path.join(directory, f"timestamps_{name}.npy"), mmap_mode=mmap_mode)
+            setattr(columns.timestamps, name, array)
+        columns.id_values = np.load(os.path.join(directory, "id_values.npy"), mmap_mode=mmap_mode)
+        with open(os.path.join(directory, "shape.json")) as shape:
+            for key, value in json.load(shape).items():
+                setattr(columns, key, value)
+        return columns
+
+    @property
+    def ids(self):
+        """Row identifiers as strings (decoded from the id codes)."""
+        return self.id_values[self.id_codes]
+
+    def week_codes(self):
+        """Single int64 code per row for the (ISO year, ISO week) pair."""
+        return self.timestamps.iso_year.astype(np.int64) * 100 + self.timestamps.iso_week
+
+    def week_label(self, code):
+        """Formats a week code the way footprints store it ("2025-3")."""
+        return f"{int(code) // 100}-{int(code) % 100}"
+
+
+class EvaluationContext:
+    """
+    Parses the original and the anonymized file once and shares the
+    resulting columns with every stage of the anonymization pipeline.
+
+    Columns are parsed lazily on first access; access is thread-safe so
+    concurrent stages never parse the same file twice. When `original` is
+    given (e.g. a memory-mapped cache snapshot) the original file is not parsed;
+    the same goes for `anonymized`.
+    """
+
+    def __init__(self, origin_file, input_file, original=None, anonymized=None, digests=None):
+        self.origin_file = origin_file
+        self.input_file = input_file
+        self._original = original
+        self._anonymized = anonymized
+        self._lock = threading.Lock()
+        self.digests = dict(digests or {})  # {"origin" | "input": SHA-256 of the file}
+        self._digest_lock = threading.Lock()
+        self._blocks = {}  # {block_rows: block digests}
+        self.cancel_token = None  # Set by the stage scheduler; stages poll `cancelled()`
+
+    @property
+    def original(self):
+        with self._lock:
+            if self._original is None:
+                self._original = DatasetColumns(self.origin_file)
+            return self._original
+
+    @property
+    def anonymized(self):
+        with self._lock:
+            if self._anonymized is None:
+                self._anonymized = DatasetColumns(self.input_file)
+            return self._anonymized
+
+    def load_original(self):
+        """Parses the original file now; returns None if it cannot be parsed."""
+        try:
+            return self.original
+        except Exception:
+            return None
+
+    def load_anonymized(self):
+        """Parses the anonymized file now; returns None if it cannot be parsed."""
+        try:
+            return self.anonymized
+        except Exception:
+            return None
+
+    def sha256(self, which):
+        """SHA-256 of the original ("origin") or the anonymized ("input") file, hashed once."""
+        with self._digest_lock:
+            if which not in self.digests:
+                self.digests[which] = file_sha256(self.origin_file if which == "origin" else self.input_file)
+            return self.digests[which]
+
+    def input_blocks(self, block_rows=BLOCK_ROWS):
+        """Digests of the anonymized file's `block_rows`-row blocks, hashed once."""
+        with self._digest_lock:
+            if block_rows not in self._blocks:
+                self._blocks[block_rows] = block_digests(self.input_file, block_rows)
+            return self._blocks[block_rows]
+
+    def cancelled(self):
+        """True once another stage of the same job has failed."""
+        return self.cancel_token is not None and self.cancel_token.cancelled()
+
+    @property
+    def size(self):
+        """Number of row pairs compared by the stages (like `zip()` of both files)."""
+        return min(self.original.size, self.anonymized.size)
+
+    def export(self, directory, original_dir=None):
+        """
+        Writes the parsed columns under `directory` so other processes can map them.
+
+        `original_dir` points at columns already on disk (e.g. the dataset cache)
+        and skips writing the original again.
+        :return: (original_dir, anonymized_dir)
+        """
+        if original_dir is None:
+            original_dir = os.path.join(directory, "original")
+            self.original.save(original_dir)
+        anonymized_dir = os.path.join(directory, "anonymized")
+        self.anonymized.save(anonymized_dir)
+        return original_dir, anonymized_dir
+
+    @classmethod
+    def mapped(cls, origin_file, input_file, original_dir, anonymized_dir, digests=None):
+        """Context over columns written by `export()`, memory-mapped read-only."""
+        return cls(
+            origin_file,
+            input_file,
+            original=DatasetColumns.load(original_dir, file_path=origin_file),
+            anonymized=DatasetColumns.load(anonymized_dir, file_path=input_file),
+            digests=digests,
+        )
+
+    @staticmethod
+    def resolve(context, origin_file, input_file):
+        """Returns `context`, or a fresh one for callers that only have file paths."""
+        return context if context is not None else EvaluationContext(origin_file, input_file)
@@ -67,6 +67,11 @@ class FileManager:
         abs_target = os.path.abspath(os.path.join(base_path, path))
         return abs_target.startswith(abs_base)
     
+    @staticmethod
+    def extracted_csv_name(zip_path):
+        """Name `unzip_file` gives the CSV extracted from `zip_path`."""
+        return f"{secure_filename(os.path.basename(zip_path))[:-4]}.csv"
+
     def unzip_file(self, file_path):
         """Extracts a ZIP file containing exactly one file into the upload directory."""
         # Extract only the filename from the provided path
@@ -108,7 +113,7 @@ class FileManager:
 
                 # Move the extracted CSV file to the upload directory
                 extracted_file_path = os.path.join(extraction_dir, extracted_file)
-                final_csv_filename = f"{safe_filename[:-4]}.csv"
+                final_csv_filename = self.extracted_csv_name(file_path)
                 final_file_path = os.path.join(self.upload_dir, final_csv_filename)
 
                 os.rename(extracted_file_path, final_file_path)
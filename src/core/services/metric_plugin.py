@@ -0,0 +1,113 @@
+from abc import ABC, abstractmethod
+from src.core.services.evaluation_context import METRIC_CHUNK_ROWS, ordered_sum, row_chunks
+
+class MetricPlugin(ABC):
+    """
+    A utility metric evaluated in one streaming pass.
+
+    An instance holds every piece of state of one evaluation, parameters
+    included, so any number of evaluations can run side by side. The driver
+    calls `start(context)` once, `update(rows)` with consecutive row slices of
+    the shared columns, then `finalize()` for the score or an `(error, line)`
+    tuple. Setting `error` stops the updates early.
+    """
+
+    def __init__(self, parameters=None):
+        self.parameters = parameters
+        self.context = None
+        self.error = None
+
+    def start(self, context):
+        self.context = context
+
+    @abstractmethod
+    def update(self, rows):
+        """Feeds the `rows` slice of the shared columns."""
+        pass
+
+    @abstractmethod
+    def finalize(self):
+        """Score of the evaluation, or an `(error, line)` tuple."""
+        pass
+
+    def run(self, context, chunk_rows=METRIC_CHUNK_ROWS):
+        """Evaluates the metric alone over the whole context."""
+        self.start(context)
+        for rows in row_chunks(context.size, chunk_rows):
+            if self.error is not None:
+                break
+            self.update(rows)
+        return self.finalize()
+
+class RowMetric(MetricPlugin):
+    """
+    Metric averaging independent per-row scores.
+
+    Subclasses implement `score_rows(rows)`. Row scores are summed in order,
+    so any chunking gives the same float result. With a `block_cache` (see
+    checkpoints.BlockCache) each block is summed on its own and its partial
+    sum added to the total, whether it was cached or not; the score may then
+    differ from an uncached run in the last bits.
+    """
+
+    def __init__(self, parameters=None, block_cache=None):
+        super().__init__(parameters)
+        self.block_cache = block_cache
+        self.total = 0
+
+    @abstractmethod
+    def score_rows(self, rows):
+        """Scores of the scored rows of the `rows` slice, in row order, or an `(error, line)` tuple."""
+        pass
+
+    def update(self, rows):
+        if self.block_cache is None:
+            scores = self.score_rows(rows)
+            if isinstance(scores, tuple):
+                self.error = scores
+                return
+            self.total = ordered_sum(scores, self.total)
+            return
+
+        cached = self.block_cache.get(rows)
+        if cached is None:
+            scores = self.score_rows(rows)
+            if isinstance(scores, tuple):
+                self.error = scores
+                return
+            cached = (ordered_sum(scores), int(scores.size))
+            self.block_cache.put(rows, *cached)
+        self.total += cached[0]
+
+    def finalize(self):
+        if self.error is not None:
+            return self.error
+        return self.total / self.context.size
+
+class ScriptMetric(MetricPlugin):
+    """
+    Adapter for metric scripts without a plugin class: they are evaluated whole
+    at the end of the pass, through `evaluate(context, parameters)` or the
+    legacy `main(nona, anon, parameters)`.
+    """
+
+    def __init__(self, module, parameters=None):
+        super().__init__(parameters)
+        self.module = module
+
+    def update(self, rows):
+        pass
+
+    def finalize(self):
+        if hasattr(self.module, "evaluate"):
+            return self.module.evaluate(self.context, self.parameters)
+        return self.module.main(self.context.origin_file, self.context.input_file, self.parameters)
+
+def load_plugin(module, parameters=None, block_cache=None):
+    """New evaluation of the metric defined in `module` (its `PLUGIN` class, or a script adapter)."""
+    plugin_class = getattr(module, "PLUGIN", None)
+    if plugin_class is None:
+        return ScriptMetric(module, parameters)
+    if issubclass(plugin_class, RowMetric):
+        return plugin_class(parameters, block_cache=block_cache)
+    return plugin_class(parameters)
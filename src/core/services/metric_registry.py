@@ -0,0 +1,126 @@
+import os
+import json
+import uuid
+import hashlib
+import importlib
+from functools import lru_cache
+from statistics import mean, median
+from sqlalchemy import select
+from src.extensions import db
+from src.core.services.file_manager import FileManager
+from src.core.services.checkpoints import CheckpointStore
+from src.modules.anonymisation.models import MetricModel, AggregationModel
+
+# Reductions of the per-metric scores into the utility score
+AGGREGATIONS = {
+    "mean": mean,
+    "median": median,
+    "max": max,
+    "min": min
+}
+
+def parameters_hash(parameters):
+    """Hash of a metric's JSON parameters, independent of key order and spacing."""
+    canonical = json.dumps(json.loads(parameters or "{}"), sort_keys=True)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+@lru_cache(maxsize=64)
+def compile_metric(name, parameters):
+    """
+    Imported module, parsed parameters and parameters hash of one metric
+    configuration, built once per process. The parameters dict is shared by
+    every evaluation and must not be modified. Failures are not cached.
+    """
+    module = importlib.import_module(f"src.core.metrics.{name}")
+    return module, json.loads(parameters), parameters_hash(parameters)
+
+def scoring_digest(origin_sha, metrics):
+    """
+    Digest of everything the scores depend on besides the upload: the original
+    file, the (name, JSON parameters) metrics it was scored with and the
+    summation of row scores (block partial sums when STAGE_CHECKPOINTS is on,
+    which may differ from row order in the last bits, see RowMetric). The
+    aggregation is left out since `utility` follows it through
+    `reaggregate_utility()`.
+    """
+    summation = "blocks" if CheckpointStore.enabled() else "rows"
+    return CheckpointStore.key(
+        "scoring", origin_sha, sorted([name, parameters] for name, parameters in metrics), summation
+    )
+
+def aggregation(snapshot):
+    """Reduction function of a snapshot (mean by default)."""
+    return AGGREGATIONS.get(snapshot["aggregation"], mean)
+
+class MetricRegistry:
+    """
+    Versioned snapshot of the scoring configuration: the selected metrics with
+    their JSON parameters, and the selected aggregation.
+
+    The snapshot is published through a pointer file replaced atomically (as
+    in DatasetCache) and read without touching the database. Each admin change
+    publishes the next version; a job pins the snapshot current when it is
+    claimed and carries it to its stages, so a change never affects running
+    jobs and scoring workers make no configuration queries.
+    """
+
+    ACTIVE_POINTER = "active.json"
+
+    def __init__(self):
+        self.registry_dir = FileManager(upload_dir="metric_registry").upload_dir
+        self.pointer_path = os.path.join(self.registry_dir, self.ACTIVE_POINTER)
+
+    def _read(self):
+        try:
+            with open(self.pointer_path) as pointer:
+                return json.load(pointer)
+        except (OSError, ValueError):
+            return None
+
+    def current(self):
+        """The active snapshot, published from the database on first use."""
+        return self._read() or self.invalidate()
+
+    def invalidate(self):
+        """
+        Publishes the configuration stored in the database as a new version.
+        Must be called after every change of the metrics or aggregation.
+        :return: the new snapshot
+        """
+        return self._publish(self._read(), self._stored())
+
+    def refresh(self):
+        """
+        Publishes the stored configuration only if it differs from the active
+        snapshot, which a restart, a seeding or a direct database change may
+        have left stale. Called at app startup.
+        :return: the active snapshot
+        """
+        previous = self._read()
+        stored = self._stored()
+        if previous and all(previous.get(key) == value for key, value in stored.items()):
+            return previous
+        return self._publish(previous, stored)
+
+    def _stored(self):
+        metrics = db.session.execute(
+            select(MetricModel.name, MetricModel.parameters)
+            .where(MetricModel.is_selected == True)
+            .order_by(MetricModel.id)
+        ).fetchall()
+        aggregation_name = db.session.execute(
+            select(AggregationModel.name).where(AggregationModel.is_selected == True)
+        ).scalar()
+        return {
+            "metrics": [[name, parameters] for name, parameters in metrics],
+            "aggregation": aggregation_name,
+        }
+
+    def _publish(self, previous, stored):
+        snapshot = {"version": (previous["version"] if previous else 0) + 1, **stored}
+
+        tmp_pointer = f"{self.pointer_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_pointer, "w") as pointer:
+            json.dump(snapshot, pointer)
+        os.replace(tmp_pointer, self.pointer_path)
+        return snapshot
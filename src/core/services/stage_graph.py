@@ -0,0 +1,109 @@
+import os
+import threading
+from concurrent.futures import wait, FIRST_COMPLETED
+
+class CancelToken:
+    """
+    Cooperative cancellation flag shared by the stages of one job.
+
+    Threads see the in-memory event; other processes (pool or Celery workers)
+    build their own token on the same marker file `path`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+        if self.path:
+            open(self.path, "w").close()
+
+    def cancelled(self):
+        return self._event.is_set() or bool(self.path and os.path.exists(self.path))
+
+class Stage:
+    """A pipeline stage with the inputs it needs and the outputs it produces."""
+
+    def __init__(self, name, requires=(), provides=()):
+        self.name = name
+        self.requires = set(requires)
+        self.provides = set(provides)
+
+    def __repr__(self):
+        return f"<Stage {self.name}>"
+
+class StageGraph:
+    """
+    Runs stages as soon as their inputs are available, with maximum overlap.
+
+    A stage fails when it raises or returns an `(error, -1)` tuple. The first
+    failure cancels the token, drops stages that have not started and stops
+    scheduling new ones; running stages are expected to check the token and
+    return early.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        names = {stage.name for stage in self.stages}
+        if len(names) != len(self.stages):
+            raise ValueError("Stage names must be unique")
+
+    def run(self, submit, available=(), token=None, done=None):
+        """
+        :param submit: callable(stage) -> Future
+        :param available: inputs that exist before any stage runs
+        :param done: {stage name: result} of stages finished by an earlier
+                     attempt; they are not run again and their outputs are available
+        :return: (results, failure) where `results` maps stage names to their
+                 return values and `failure` is None or `(stage_name, error)`,
+                 `error` being the failed tuple or the raised exception.
+        """
+        available = set(available)
+        results = dict(done or {})
+        pending = [stage for stage in self.stages if stage.name not in results]
+        for stage in self.stages:
+            if stage.name in results:
+                available |= stage.provides
+        running = {}
+        failure = None
+
+        while True:
+            if failure is None:
+                ready = [stage for stage in pending if stage.requires <= available]
+                for stage in ready:
+                    pending.remove(stage)
+                    running[submit(stage)] = stage
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                if future.cancelled():
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = e
+
+                results[stage.name] = result
+                if isinstance(result, (tuple, Exception)):
+                    if failure is None:
+                        failure = (stage.name, result)
+                        self._cancel(running, token)
+                else:
+                    available |= stage.provides
+
+        if failure is None and pending:
+            missing = sorted(set().union(*(stage.requires for stage in pending)) - available)
+            raise RuntimeError(f"Unsatisfiable stage inputs: {', '.join(missing)}")
+        return results, failure
+
+    @staticmethod
+    def _cancel(running, token):
+        if token is not None:
+            token.cancel()
+        for future in running:
+            future.cancel()
@@ -0,0 +1,196 @@
+import os
+import time
+import pickle
+import select
+import signal
+import struct
+from flask import has_app_context
+from src.extensions import db
+from src.constants.core_msg import STAGE_CANCELLED, STAGE_LIMIT_EXCEEDED, STAGE_CRASHED
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+MB = 1024 * 1024
+HEADER = struct.Struct("!Q")  # Length of the pickled outcome sent by the child
+POLL_SECONDS = 0.2  # How often the waiting parent checks the job's cancellation
+
+class StageLimits:
+    """
+    Wall-clock, CPU-time and memory caps of one pipeline stage (0: no cap).
+
+    `run()` forks a child that lowers its own rlimits before running the stage,
+    so a runaway submission only takes down that child. RLIMIT_CPU stops it
+    with SIGXCPU; RLIMIT_DATA (heap and private mappings, which leaves out the
+    file-backed, memory-mapped dataset columns) turns allocations past the cap
+    into MemoryError; the parent kills it once the wall-clock budget is spent.
+
+    The child is a fork of the calling process, so two caveats apply. Forking a
+    multithreaded process only copies the calling thread: a lock another thread
+    held at that moment (logging, the database pool, the allocator) stays held
+    in the child and can deadlock it. And RLIMIT_DATA counts the heap the child
+    inherits, whatever else the process was holding. Limits are therefore off
+    by default and best enabled for the process pool or Celery workers.
+    """
+
+    def __init__(self, stage, wall_seconds=0, cpu_seconds=0, memory_mb=0):
+        self.stage = stage
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.usage = None  # Resource usage of the last child, for telemetry
+
+    @classmethod
+    def for_stage(cls, config, stage):
+        """Limits of `stage`: the STAGE_* defaults with its STAGE_LIMITS overrides."""
+        limits = {
+            "wall_seconds": config.get("STAGE_WALL_SECONDS", 0),
+            "cpu_seconds": config.get("STAGE_CPU_SECONDS", 0),
+            "memory_mb": config.get("STAGE_MEMORY_MB", 0),
+        }
+        limits.update((config.get("STAGE_LIMITS") or {}).get(stage, {}))
+        return cls(stage, **limits)
+
+    @staticmethod
+    def supported():
+        return resource is not None and hasattr(os, "fork")
+
+    def enabled(self):
+        return bool(self.wall_seconds or self.cpu_seconds or self.memory_mb) and self.supported()
+
+    def run(self, function, cancelled=None):
+        """
+        Returns `function()` computed in a child process under the limits.
+
+        A breached limit, a crash or a cancellation (`cancelled()` becoming true)
+        returns an `(error, -1)` tuple like any failed stage; an exception raised
+        by `function` is raised again here. Runs inline when no limit is set.
+        """
+        if not self.enabled():
+            return function()
+
+        self.usage = None
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            self._child(function, write_fd)  # Never returns
+
+        os.close(write_fd)
+        try:
+            payload, status, stopped = self._collect(pid, read_fd, cancelled)
+        finally:
+            os.close(read_fd)
+
+        if stopped == "cancelled":
+            return (STAGE_CANCELLED, -1)
+        if stopped == "wall-clock":
+            return self.exceeded("wall-clock", f"{self.wall_seconds} s")
+        if os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGXCPU:
+            return self.exceeded("CPU time", f"{self.cpu_seconds} s")
+        if not payload:
+            reason = f"signal {os.WTERMSIG(status)}" if os.WIFSIGNALED(status) else f"exit code {os.WEXITSTATUS(status)}"
+            return (STAGE_CRASHED.format(self.stage, reason), -1)
+
+        kind, value = pickle.loads(payload)
+        if kind == "memory":
+            return self.exceeded("memory", f"{self.memory_mb} MB")
+        if kind == "exception":
+            raise value
+        return value
+
+    def exceeded(self, limit, value):
+        return (STAGE_LIMIT_EXCEEDED.format(self.stage, limit, value), -1)
+
+    def _collect(self, pid, read_fd, cancelled):
+        """
+        Reads the child's outcome and reaps it, killing it past the wall-clock
+        deadline or on cancellation. The outcome is length-prefixed and the
+        child polled, since a sibling stage forked meanwhile may hold the pipe
+        open and delay its end of file.
+        :return: (payload or None, exit status, None | "wall-clock" | "cancelled")
+        """
+        deadline = time.monotonic() + self.wall_seconds if self.wall_seconds else None
+        data = b""
+        while True:
+            timeout = POLL_SECONDS
+            stopped = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    stopped = "wall-clock"
+                timeout = max(0, min(timeout, remaining))
+            if cancelled is not None and cancelled():
+                stopped = "cancelled"
+            if stopped:
+                os.kill(pid, signal.SIGKILL)
+                return None, self._reap(pid, 0), stopped
+
+            ready, _, _ = select.select([read_fd], [], [], timeout)
+            chunk = os.read(read_fd, 65536) if ready else None
+            if chunk:
+                data += chunk
+                if _outcome(data) is not None:
+                    return _outcome(data), self._reap(pid, 0), None
+                continue
+            status = self._reap(pid, 0 if chunk == b"" else os.WNOHANG)
+            if status is not None:
+                while select.select([read_fd], [], [], 0)[0]:  # Written just before it exited
+                    chunk = os.read(read_fd, 65536)
+                    if not chunk:
+                        break
+                    data += chunk
+                return _outcome(data), status, None
+
+    def _reap(self, pid, options):
+        """Exit status of the child (None if still running), keeping its resource usage."""
+        finished, status, usage = os.wait4(pid, options)
+        if not finished:
+            return None
+        self.usage = usage
+        return status
+
+    def _child(self, function, write_fd):
+        """Runs `function` under the limits and writes its outcome to the parent."""
+        code = 0
+        try:
+            if has_app_context():
+                db.engine.dispose(close=False)  # Keep the parent's pooled connections untouched
+            self._apply()
+            try:
+                outcome = ("result", function())
+            except MemoryError:
+                outcome = ("memory", None)
+            except Exception as e:
+                outcome = ("exception", e)
+            try:
+                payload = pickle.dumps(outcome)
+            except Exception:
+                payload = pickle.dumps(("exception", RuntimeError(str(outcome[1]))))
+            with os.fdopen(write_fd, "wb") as pipe:
+                pipe.write(HEADER.pack(len(payload)) + payload)
+        except BaseException:
+            code = 1
+        finally:
+            os._exit(code)
+
+    def _apply(self):
+        if self.cpu_seconds:
+            _lower(resource.RLIMIT_CPU, self.cpu_seconds, self.cpu_seconds + 1)  # SIGKILL one second later
+        if self.memory_mb:
+            _lower(resource.RLIMIT_DATA, self.memory_mb * MB, self.memory_mb * MB)
+
+def _outcome(data):
+    """The pickled outcome once `data` holds all of it, else None."""
+    if len(data) < HEADER.size or len(data) < HEADER.size + HEADER.unpack_from(data)[0]:
+        return None
+    return data[HEADER.size:]
+
+def _lower(kind, soft, hard):
+    """Sets a limit, never above the current hard limit."""
+    _, current = resource.getrlimit(kind)
+    if current != resource.RLIM_INFINITY:
+        soft, hard = min(soft, current), min(hard, current)
+    resource.setrlimit(kind, (soft, hard))
@@ -0,0 +1,103 @@
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+from src.extensions import db
+from src.constants.core_msg import STAGE_CANCELLED
+from src.core.services.anonym_threads import Footprint, Utility, NaiveAttack
+from src.core.services.evaluation_context import EvaluationContext
+from src.core.services.stage_graph import CancelToken
+from src.core.services.stage_limits import StageLimits
+from src.core.services.telemetry import StageProbe, file_bytes, write_sample
+from src.core.services.stage_profiler import profiled
+
+_app = None  # Flask app inherited by the forked workers
+
+def _init_worker():
+    """Drops the pooled connections inherited from the parent so the worker opens its own."""
+    with _app.app_context():
+        db.engine.dispose(close=False)
+
+def _footprint(context, job):
+    return Footprint(job["input_file"], job["origin_file"], job["footprint_file"], context=context).process()
+
+def _utility(context, job):
+    return Utility(job["input_file"], job["origin_file"], context=context, metrics=job["metrics"]).process()
+
+def _naive_attack(context, job):
+    return NaiveAttack(job["origin_file"], job["input_file"], job["footprint_file"], context=context).process()
+
+STAGES = {
+    "footprint": _footprint,
+    "utility": _utility,
+    "naive_attack": _naive_attack,
+}
+
+def execute_stage(stage, job):
+    """
+    Runs one pipeline stage from a job exported by `AnonymManager.export_job()`.
+
+    `job` only carries file paths; the parsed columns are memory-mapped from the
+    directories written by `EvaluationContext.export()`, so every worker shares
+    the same pages. The return value is the stage's usual small result
+    (a score, 0, or an `(error, -1)` tuple). The stage runs under its
+    StageLimits and may be profiled; its telemetry sample is left in the job
+    directory. Must run inside an app context.
+    """
+    context = EvaluationContext.mapped(
+        job["origin_file"], job["input_file"], job["original_dir"], job["anonymized_dir"], digests=job["digests"]
+    )
+    context.cancel_token = CancelToken(job["cancel_file"])
+    if context.cancelled():
+        return (STAGE_CANCELLED, -1)
+    limits = StageLimits.for_stage(current_app.config, stage)
+    function = profiled(lambda: STAGES[stage](context, job), stage, job["input_file"], current_app.config)
+    probe = StageProbe(stage, rows=context.size, bytes_read=file_bytes(job["origin_file"], job["input_file"]))
+    try:
+        with probe:
+            result = limits.run(function, cancelled=context.cancelled)
+            probe.child_usage(limits.usage)
+    finally:
+        write_sample(job["job_dir"], probe.sample())
+    return result
+
+def run_stage(stage, job):
+    """Entry point of the process-pool workers."""
+    with _app.app_context():
+        try:
+            return execute_stage(stage, job)
+        finally:
+            db.session.remove()
+
+class StagePool:
+    """Process pool shared by every AnonymManager running in "process" mode."""
+
+    _executor = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def supported():
+        """Workers inherit the app by forking, which is not available everywhere."""
+        return "fork" in multiprocessing.get_all_start_methods()
+
+    @classmethod
+    def get(cls, app):
+        """Returns the shared pool, forking its workers on first use."""
+        global _app
+        with cls._lock:
+            if cls._executor is None:
+                _app = app
+                cls._executor = ProcessPoolExecutor(
+                    max_workers=app.config.get("PIPELINE_PROCESS_WORKERS", 4),
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=_init_worker,
+                )
+            return cls._executor
+
+    @classmethod
+    def reset(cls):
+        """Discards a broken pool (e.g. a worker was killed); the next job forks a new one."""
+        with cls._lock:
+            if cls._executor is not None:
+                cls._executor.shutdown(wait=False, cancel_futures=True)
+                cls._executor = None
@@ -0,0 +1,105 @@
+import os
+import sys
+import glob
+import time
+import uuid
+import threading
+from collections import Counter
+
+PROFILE_SUFFIX = ".collapsed"
+MARKER_POLL_SECONDS = 0.5  # How often an idle sampler checks the threshold and the job's marker
+
+def profile_marker(input_file):
+    """File whose presence turns profiling on for the submission `input_file` (set by admins)."""
+    return f"{os.path.splitext(input_file)[0]}.profile"
+
+def profile_path(input_file, stage):
+    """Collapsed-stack profile of one stage, next to the submission file."""
+    return f"{os.path.splitext(input_file)[0]}.{stage}{PROFILE_SUFFIX}"
+
+def profile_files(input_file):
+    """{stage: path} of the profiles written for the submission `input_file`."""
+    prefix = f"{os.path.splitext(input_file)[0]}."
+    return {
+        path[len(prefix):-len(PROFILE_SUFFIX)]: path
+        for path in glob.glob(f"{glob.escape(prefix)}*{PROFILE_SUFFIX}")
+    }
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StageProfiler:
+    """
+    Sampling profiler of the thread running a stage.
+
+    A daemon thread stays idle until the stage has run for `threshold`
+    seconds or the job's `marker` file exists, then captures the stage
+    thread's stack through `sys._current_frames()` every `interval` seconds.
+    On exit the samples are written as collapsed stacks ("outer;inner count"
+    lines, the input of flamegraph.pl and speedscope) to `output_path`.
+    Nothing is written for stages that finish before it starts sampling.
+    """
+
+    def __init__(self, output_path, threshold=None, interval=0.01, marker=None):
+        """
+        :param threshold: seconds before sampling starts on its own (None: only through `marker`)
+        """
+        self.output_path = output_path
+        self.threshold = threshold
+        self.interval = interval
+        self.marker = marker
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._target = threading.get_ident()
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="stage-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        if self.samples:
+            self.write()
+        return False
+
+    def _triggered(self):
+        if self.threshold is not None and time.monotonic() - self._started >= self.threshold:
+            return True
+        return bool(self.marker and os.path.exists(self.marker))
+
+    def _run(self):
+        while not self._triggered():
+            if self._stop.wait(MARKER_POLL_SECONDS):
+                return
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self):
+        """Writes the collapsed stacks, replacing the profile of an earlier attempt."""
+        tmp_path = f"{self.output_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w") as output:
+            for stack, count in self.samples.most_common():
+                output.write(f"{stack} {count}\n")
+        os.replace(tmp_path, self.output_path)
+
+def profiled(function, stage, input_file, config):
+    """`function` wrapped in a StageProfiler configured by PROFILE_* (unchanged when profiling is off)."""
+    if not config.get("STAGE_PROFILING", True):
+        return function
+    threshold = config.get("PROFILE_THRESHOLD_SECONDS", 0) or None
+    interval = config.get("PROFILE_INTERVAL_MS", 10) / 1000
+
+    def run():
+        with StageProfiler(profile_path(input_file, stage), threshold, interval, profile_marker(input_file)):
+            return function()
+    return run
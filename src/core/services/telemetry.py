@@ -0,0 +1,107 @@
+import os
+import json
+import time
+import threading
+
+TELEMETRY_PREFIX = "telemetry-"
+RSS_SAMPLE_SECONDS = 0.05  # Interval of the RSS sampler of a stage
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def current_rss_mb():
+    """Resident set size of this process right now, or None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def file_bytes(*paths):
+    """Total size of the files in `paths` that exist."""
+    return sum(os.path.getsize(path) for path in paths if path and os.path.exists(path))
+
+class StageProbe:
+    """
+    Measures one run of a submission stage: wall time, CPU time, peak RSS,
+    rows processed and bytes read.
+
+    CPU time is the calling thread's, or the child's when the stage ran in a
+    child process (see `child_usage`). Peak RSS is the child's own peak in
+    that case. Otherwise a sampler thread reads the process's current RSS
+    every RSS_SAMPLE_SECONDS while the stage runs and keeps the highest value:
+    unlike the lifetime `ru_maxrss` it is measured per stage, but it still
+    includes what the process already held and what stages running in other
+    threads of the same process allocate meanwhile.
+    """
+
+    def __init__(self, stage, rows=None, bytes_read=None):
+        self.stage = stage
+        self.rows = rows
+        self.bytes_read = bytes_read
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.peak_rss_mb = None
+        self._usage = None
+        self._stopped = threading.Event()
+        self._sampler = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        self._cpu_started = time.thread_time()
+        self.peak_rss_mb = current_rss_mb()
+        if self.peak_rss_mb is not None:
+            self._sampler = threading.Thread(target=self._sample_rss, daemon=True)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_seconds = time.perf_counter() - self._started
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._record_rss(current_rss_mb())
+        if self._usage is not None:
+            self.cpu_seconds = self._usage.ru_utime + self._usage.ru_stime
+            self.peak_rss_mb = self._usage.ru_maxrss / 1024  # Kilobytes on Linux
+        else:
+            self.cpu_seconds = time.thread_time() - self._cpu_started
+        return False
+
+    def _sample_rss(self):
+        while not self._stopped.wait(RSS_SAMPLE_SECONDS):
+            self._record_rss(current_rss_mb())
+
+    def _record_rss(self, rss_mb):
+        if rss_mb is not None and (self.peak_rss_mb is None or rss_mb > self.peak_rss_mb):
+            self.peak_rss_mb = rss_mb
+
+    def child_usage(self, usage):
+        """Takes CPU time and peak RSS from the rusage of the child that ran the stage."""
+        self._usage = usage
+
+    def sample(self):
+        """Row of `submission_stage_metrics`, without the submission."""
+        return {
+            "stage": self.stage,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "peak_rss_mb": self.peak_rss_mb,
+            "rows_processed": self.rows,
+            "bytes_read": self.bytes_read,
+        }
+
+def write_sample(job_dir, sample):
+    """Leaves a stage's sample in the job directory for the process recording the outcome."""
+    with open(os.path.join(job_dir, f"{TELEMETRY_PREFIX}{sample['stage']}.json"), "w") as output:
+        json.dump(sample, output)
+
+def read_samples(job_dir):
+    """Samples written to the job directory by `write_sample`."""
+    samples = []
+    for entry in sorted(os.listdir(job_dir)) if os.path.isdir(job_dir) else ():
+        if entry.startswith(TELEMETRY_PREFIX):
+            try:
+                with open(os.path.join(job_dir, entry)) as sample:
+                    samples.append(json.load(sample))
+            except (OSError, ValueError):
+                continue
+    return samples
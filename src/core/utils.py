@@ -3,6 +3,7 @@
 #       Global functions        #
 #################################
 from src.constants.core_msg import *
+import hashlib
 import uuid
 
 # Count the number of lines in csv file
@@ -12,11 +13,22 @@ def csv_length(filename):
     except:
         return -1
 
+# Streaming SHA-256 of a file (constant memory, works on multi-GB files)
+def file_sha256(filename, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 # Count the number of columns in the first row of a CSV file based on a separator
 def csv_width(filename):
     return sum(1 for char in next(open(filename)) if char == SEPARATOR) + 1
 
-def checking_shape(input, default):
+def checking_shape(input, default, context=None):
+    if context is not None:
+        return checking_columns_shape(context.anonymized, context.original)
+
     length = 0
     size = (csv_length(default), csv_width(default))
     if size[0] < 0 or size[1] < 0 : 
@@ -31,6 +43,18 @@ def checking_shape(input, default):
         return (INVALID_UPLOADED_FILE_FORMAT, 0)
     return (INVALID_UPLOADED_FILE_ROWS, length) if length != size[0] else 0
 
+# Same checks as `checking_shape`, computed from already scanned columns
+def checking_columns_shape(input_columns, default_columns):
+    size = (default_columns.line_count, default_columns.width)
+    if size[0] <= 0 or size[1] < 0 :
+        return (INVALID_ORIGINAL_FILE, -1)
+
+    wrong_width = ~input_columns.del_prefix & (input_columns.separator_counts + 1 != size[1])
+    if wrong_width.any():
+        return (INVALID_UPLOADED_FILE_COLUMNS, int(wrong_width.argmax()))
+    length = input_columns.line_count
+    return (INVALID_UPLOADED_FILE_ROWS, length) if length != size[0] else 0
+
 def generate_secure_filename():
     """
     Generates a short, unique, and secure filename.
@@ -10,6 +10,7 @@ import json
 from src.constants.admin import ADMIN_ROLE
 from src.constants.app_msg import UNAUTHORIZED_ACCESS
 from src.modules.anonymisation.models import MetricModel
+from src.core.services.metric_registry import MetricRegistry
 from wtforms import TextAreaField
 
 
@@ -115,6 +116,13 @@ class MetricAdmin(SecureModelView):
 
     # column_formatters = {"parameters": format_parameters}
 
+    def after_model_change(self, form, model, is_created):
+        """Publishes the new metric selection to the scoring workers."""
+        MetricRegistry().invalidate()
+
+    def after_model_delete(self, model):
+        MetricRegistry().invalidate()
+
 
 class AnonymAdmin(SecureModelView):
     """Flask-Admin Panel View for Managing Anonymization Records"""
@@ -20,6 +20,9 @@ def init_celery(app: Flask) -> Celery:
     )            
     celery.conf.broker_url = app.config.get("CELERY_BROKER_URL")
     celery.conf.result_backend = app.config.get("CELERY_RESULT_BACKEND")
+    # Run tasks inline (no broker needed), e.g. for tests
+    celery.conf.task_always_eager = app.config.get("CELERY_TASK_ALWAYS_EAGER", False)
+    celery.conf.task_eager_propagates = app.config.get("CELERY_TASK_ALWAYS_EAGER", False)
     celery.set_default()
     app.extensions["celery"] = celery
     return celery
@@ -1,9 +1,14 @@
 from flask.views import MethodView
 from flask_smorest import abort
-from flask import jsonify, request
+from flask import jsonify, request, send_file
 from http import HTTPStatus
 from src.extensions import db
-from src.modules.anonymisation.models import MetricModel, AggregationModel
+from src.modules.anonymisation.models import MetricModel, AggregationModel, AnonymModel
+from src.modules.anonymisation.services import AnonymService
+from src.core.services.metric_registry import MetricRegistry
+from src.modules.admin.services import get_stage_metric_summary
+from src.core.services.stage_profiler import profile_marker, profile_files
+import os
 from src.modules.admin.resources import admin_blp
 from sqlalchemy import select
 from src.modules.anonymisation.schemas import MetricSchema
@@ -28,6 +33,7 @@ class MetricActivation(MethodView):
 
         metric.is_selected = not metric.is_selected
         db.session.commit()
+        MetricRegistry().invalidate()  # Jobs claimed from now on use the new selection
 
         return jsonify({
             "message": f"Metric '{metric.name}' {'activated' if metric.is_selected else 'deactivated'}.",
@@ -102,6 +108,7 @@ class MetricParamUpdate(MethodView):
 
         metric.parameters = parameters
         db.session.commit()
+        MetricRegistry().invalidate()
 
         return jsonify({
             "message": "Parameters updated.",
@@ -135,12 +142,14 @@ class AggregationActivation(MethodView):
             aggregation.is_selected = True
 
         db.session.commit()
+        MetricRegistry().invalidate()
+        updated = AnonymService.reaggregate_utility()  # From the stored metric scores, no rescoring
 
         return (
             ResponseBuilder()
             .success(
                 message=f"Aggregation '{aggregation.name}' {'activated' if aggregation.is_selected else 'deactivated'}.",
-                data={"name": aggregation.name, "is_selected": aggregation.is_selected},
+                data={"name": aggregation.name, "is_selected": aggregation.is_selected, "updated_submissions": updated},
                 status_code=HTTPStatus.OK,
             )
             .build()
@@ -159,4 +168,79 @@ class AggregationList(MethodView):
             "id": agg.id,
             "name": agg.name,
             "is_selected": agg.is_selected
-        } for agg in aggregations])
\ No newline at end of file
+        } for agg in aggregations])
+
+
+# ===== TELEMETRY ENDPOINTS =====
+
+@admin_blp.route("/stage-metrics")
+class StageMetricSummary(MethodView):
+    """Per-stage resource usage of the scored submissions."""
+    @role_required([ADMIN_ROLE])
+    def get(self):
+        """p50/p95/p99 per stage of wall time, CPU time, peak RSS, rows and bytes over the last `hours` (default 24)."""
+        hours = request.args.get("hours", default=24, type=float)
+        if hours is None or hours <= 0:
+            abort(HTTPStatus.BAD_REQUEST, message="hours must be a positive number.")
+
+        return (
+            ResponseBuilder()
+            .success(
+                message="Stage metrics retrieved.",
+                data={"hours": hours, "stages": get_stage_metric_summary(hours)},
+                status_code=HTTPStatus.OK,
+            )
+            .build()
+        )
+
+
+# ===== PROFILING ENDPOINTS =====
+
+def _submission_file(anonym_id):
+    anonym = db.session.get(AnonymModel, anonym_id)
+    if not anonym:
+        abort(HTTPStatus.NOT_FOUND, message="Anonymization not found.")
+    return f"{anonym.file_link}.csv"
+
+
+@admin_blp.route("/anonym/<int:anonym_id>/profile")
+class SubmissionProfiling(MethodView):
+    """Sampling profiler of one submission's stages."""
+    @role_required([ADMIN_ROLE])
+    def get(self, anonym_id):
+        """Whether profiling is enabled for the submission and which stages have a profile."""
+        input_file = _submission_file(anonym_id)
+        return (
+            ResponseBuilder()
+            .success(
+                message="Profiling status retrieved.",
+                data={"enabled": os.path.exists(profile_marker(input_file)), "profiles": sorted(profile_files(input_file))},
+                status_code=HTTPStatus.OK,
+            )
+            .build()
+        )
+
+    @role_required([ADMIN_ROLE])
+    def post(self, anonym_id):
+        """Profiles every stage of the submission from now on, including stages already running."""
+        open(profile_marker(_submission_file(anonym_id)), "w").close()
+        return ResponseBuilder().success(message="Profiling enabled.", status_code=HTTPStatus.OK).build()
+
+    @role_required([ADMIN_ROLE])
+    def delete(self, anonym_id):
+        """Stops profiling the submission's next stages (slow stages are still profiled past the threshold)."""
+        marker = profile_marker(_submission_file(anonym_id))
+        if os.path.exists(marker):
+            os.remove(marker)
+        return ResponseBuilder().success(message="Profiling disabled.", status_code=HTTPStatus.OK).build()
+
+
+@admin_blp.route("/anonym/<int:anonym_id>/profile/<string:stage>")
+class SubmissionProfileDownload(MethodView):
+    @role_required([ADMIN_ROLE])
+    def get(self, anonym_id, stage):
+        """Downloads the collapsed-stack profile of one stage (flamegraph.pl or speedscope input)."""
+        path = profile_files(_submission_file(anonym_id)).get(stage)
+        if not path:
+            abort(HTTPStatus.NOT_FOUND, message="No profile for this stage.")
+        return send_file(path, as_attachment=True, download_name=f"anonym_{anonym_id}_{stage}.collapsed", mimetype="text/plain")
@@ -6,6 +6,9 @@ from src.constants.admin import *
 from src.constants.app_msg import *
 from http import HTTPStatus
 from src.core.services.file_manager import FileManager
+from src.core.services.dataset_cache import DatasetCache
+from src.core.services.content_store import ContentStore
+from src.core.services.stage_profiler import profile_marker, profile_files
 from flask import jsonify
 from src.modules.admin.resources import admin_blp
 from src.modules.admin.models import RawFileModel
@@ -16,11 +19,13 @@ from src.common.response_builder import ResponseBuilder
 import time
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from flask import send_file
 from src.modules.auth.models import GroupUserModel
 from src.modules.admin.services import get_group_files
 from src.modules.admin.schemas import GroupFileSchema
 from src.modules.anonymisation.models import AnonymModel
+from src.modules.anonymisation.scheduler import QUEUED_STATUS, PROCESSING_STATUS
 from src.modules.attack.models import AttackModel
 from flask import after_this_request
 
@@ -39,6 +44,45 @@ def get_next_available_filename(base, ext, upload_dir):
         next_num += 1
     return f"{base}({next_num}){ext}"
 
+# Cache builds run one at a time, off the request; the last one to finish wins only if still active
+_cache_builder = ThreadPoolExecutor(max_workers=1)
+
+def refresh_dataset_cache(file_model):
+    """
+    Rebuilds the columnar cache of the active raw file (or clears it when none
+    is active) in the background, then drops the versions no job uses.
+    The current version stops being served right away, so new submissions
+    are scored against the newly active file while its cache is built.
+    """
+    DatasetCache().deactivate()
+    app = current_app._get_current_object()
+    csv_path = DatasetCache.csv_path(file_model)
+    _cache_builder.submit(_build_dataset_cache, app, file_model.id, csv_path if file_model.is_active else None)
+
+def collect_dataset_cache():
+    """Drops, in the background, the cache versions no queued or processing job uses."""
+    _cache_builder.submit(_build_dataset_cache, current_app._get_current_object(), None, None)
+
+def _build_dataset_cache(app, file_id, csv_path):
+    with app.app_context():
+        try:
+            dataset_cache = DatasetCache()
+            file_model = db.session.get(RawFileModel, file_id) if file_id is not None else None
+            if csv_path and file_model and file_model.is_active:
+                dataset_cache.activate(file_id, csv_path)
+            in_use = {
+                f"{original_file}.csv"
+                for (original_file,) in db.session.query(AnonymModel.original_file)
+                .filter(AnonymModel.status.in_((QUEUED_STATUS, PROCESSING_STATUS)))
+                .distinct()
+            }
+            dataset_cache.collect(in_use)
+        except Exception as e:
+            # Evaluations still work without the cache, they just parse the text file
+            app.logger.error(f"Dataset cache build failed for file {file_id}: {str(e)}")
+        finally:
+            db.session.remove()
+
 @admin_blp.route("/upload")
 class OriginalFile(MethodView):
     @role_required([ADMIN_ROLE])
@@ -115,6 +159,7 @@ class OriginalFile(MethodView):
             )
             db.session.add(file_model)
             db.session.commit()
+            refresh_dataset_cache(file_model)
 
             return (
                 ResponseBuilder()
@@ -172,9 +217,11 @@ class FileResource(MethodView):
             # Delete file from filesystem
             file_manager = FileManager(upload_dir="original_files")
             file_manager.delete_file(file.file_path)
+            DatasetCache().remove(file.id)
             # Delete from database
             db.session.delete(file)
             db.session.commit()
+            collect_dataset_cache()
             return (
                 ResponseBuilder()
                 .success(
@@ -199,7 +246,9 @@ class FileActivateResource(MethodView):
                 # Nếu file chưa active thì active nó và inactive tất cả file khác
                 RawFileModel.query.update({"is_active": False})
                 file.is_active = True
+                current_app.config["ORIGINAL_FILE_PATH"] = DatasetCache.csv_path(file)
             db.session.commit()
+            refresh_dataset_cache(file)
             return (
                 ResponseBuilder()
                 .success(
@@ -301,10 +350,17 @@ class GroupUserFileManagement(MethodView):
                 # Delete physical files
                 if anonym.file_link and os.path.exists(anonym.file_link):
                     os.remove(anonym.file_link)
+                if anonym.file_link and os.path.exists(f"{anonym.file_link}.csv"):
+                    os.remove(f"{anonym.file_link}.csv")
+                if anonym.content_hash:
+                    ContentStore().release(anonym.content_hash)  # Last upload of this content
                 if anonym.footprint_file and os.path.exists(anonym.footprint_file):
                     os.remove(anonym.footprint_file)
-                if anonym.shuffled_file and os.path.exists(anonym.shuffled_file):
-                    os.remove(anonym.shuffled_file)
+                if anonym.shuffled_file and os.path.exists(f"{anonym.shuffled_file}.csv"):
+                    os.remove(f"{anonym.shuffled_file}.csv")
+                for path in [profile_marker(f"{anonym.file_link}.csv"), *profile_files(f"{anonym.file_link}.csv").values()]:
+                    if os.path.exists(path):
+                        os.remove(path)
                 
                 # Delete database record
                 db.session.delete(anonym)
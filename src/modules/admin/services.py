@@ -1,10 +1,11 @@
+import math
 import secrets
 import string
 from src.modules.admin.models import InviteKeyModel, CompetitionModel, RawFileModel
 from src.constants.admin import EXPIRATION_INVITE_KEY
 from datetime import datetime, timezone, timedelta
 from src.modules.auth.models import GroupUserModel, UserModel
-from src.modules.anonymisation.models import AnonymModel, MetricModel, AggregationModel
+from src.modules.anonymisation.models import AnonymModel, MetricModel, AggregationModel, StageMetricModel
 from src.modules.admin.models import CompetitionModel
 from src.modules.attack.models import AttackModel
 from src.extensions import db
@@ -353,4 +354,36 @@ def get_group_defense_score(group):
     if not published_anonyms:
         return 0.0
     defense_scores = [get_defense_score_for_file(a) for a in published_anonyms]
-    return max(defense_scores) if defense_scores else 0.0
\ No newline at end of file
+    return max(defense_scores) if defense_scores else 0.0
+
+STAGE_METRIC_FIELDS = ("wall_seconds", "cpu_seconds", "peak_rss_mb", "rows_processed", "bytes_read")
+
+def percentile(values: list, fraction: float):
+    """Nearest-rank percentile of sorted `values` (None when empty)."""
+    if not values:
+        return None
+    return values[max(1, math.ceil(len(values) * fraction)) - 1]
+
+def get_stage_metric_summary(hours: float) -> list:
+    """
+    p50/p95/p99 of every telemetry field per stage over the last `hours`.
+    Percentiles are computed here rather than in SQL, which not every database supports.
+    """
+    since = get_vietnam_time() - timedelta(hours=hours)
+    rows = db.session.execute(
+        select(StageMetricModel.stage, *(getattr(StageMetricModel, field) for field in STAGE_METRIC_FIELDS))
+        .where(StageMetricModel.created_at >= since)
+    ).fetchall()
+
+    stages = {}
+    for stage, *values in rows:
+        stages.setdefault(stage, []).append(values)
+
+    summary = []
+    for stage, samples in sorted(stages.items()):
+        entry = {"stage": stage, "count": len(samples)}
+        for index, field in enumerate(STAGE_METRIC_FIELDS):
+            values = sorted(sample[index] for sample in samples if sample[index] is not None)
+            entry[field] = {name: percentile(values, fraction) for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))}
+        summary.append(entry)
+    return summary
@@ -21,14 +21,26 @@ class AnonymModel(db.Model):
 
     footprint_file: so.Mapped[str] = so.mapped_column(sa.String(255), nullable=True, unique=True)
     shuffled_file: so.Mapped[str] = so.mapped_column(sa.String(255), nullable=True, unique=True)
+    shuffle_seed: so.Mapped[int] = so.mapped_column(sa.BigInteger(), nullable=True)
     original_file: so.Mapped[str] = so.mapped_column(sa.String(255), nullable=False)
     file_link: so.Mapped[str] = so.mapped_column(sa.String(255), nullable=False, unique=True)
 
+    # Identical uploads scored under the same original file and metric selection reuse the scores
+    content_hash: so.Mapped[str] = so.mapped_column(sa.String(64), nullable=True, index=True)
+    config_digest: so.Mapped[str] = so.mapped_column(sa.String(64), nullable=True)
+
     naive_attack: so.Mapped[float] = so.mapped_column(sa.Float(), nullable=False, default=0.0)
     utility: so.Mapped[float] = so.mapped_column(sa.Float(), nullable=False, default=0.0)
 
     status: so.Mapped[str] = so.mapped_column(sa.String(255), nullable=False, default="pending")
     created_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime, nullable=False, default=get_vietnam_time)
+    started_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime, nullable=True)
+    finished_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime, nullable=True)
+
+    # Job lease: renewed by heartbeats while processing, recovered by the sweeper once expired
+    lease_expires_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime, nullable=True, index=True)
+    attempts: so.Mapped[int] = so.mapped_column(sa.Integer(), nullable=False, default=0)
+    max_attempts: so.Mapped[int] = so.mapped_column(sa.Integer(), nullable=False, default=3)
 
     name: so.Mapped[str] = so.mapped_column(sa.String(64), nullable=False, index=True)
     is_published: so.Mapped[bool] = so.mapped_column(sa.Boolean(), nullable=False, default=False, index=True)
@@ -40,12 +52,90 @@ class AnonymModel(db.Model):
     group: so.Mapped["GroupUserModel"] = so.relationship("GroupUserModel", back_populates="anonyms")
     
     attacks: so.Mapped[list["AttackModel"]] = so.relationship("AttackModel", back_populates="anonym", cascade="all, delete-orphan")
+    metric_scores: so.Mapped[list["MetricScoreModel"]] = so.relationship(
+        "MetricScoreModel", back_populates="anonym", cascade="all, delete-orphan"
+    )
+    stage_metrics: so.Mapped[list["StageMetricModel"]] = so.relationship(
+        "StageMetricModel", back_populates="anonym", cascade="all, delete-orphan"
+    )
+
+    def mark_completed(self, utility, naive_attack, metric_scores=None):
+        """
+        Stores the final scores. `metric_scores` is the list of per-metric results
+        ({"metric", "parameters_hash", "score", "duration"}) the utility aggregates.
+        """
+        self.status = "completed"
+        self.utility = utility
+        self.naive_attack = naive_attack
+        if metric_scores is not None:
+            self.metric_scores = [MetricScoreModel(**score) for score in metric_scores]
+        self.finished_at = get_vietnam_time()
+        self.lease_expires_at = None
+
+    def add_stage_metrics(self, samples):
+        """Records telemetry samples ({"stage", "wall_seconds", ...}, see StageProbe) of this submission."""
+        self.stage_metrics.extend(StageMetricModel(**sample) for sample in samples)
+
+    def mark_failed(self, error):
+        self.status = f"failed with Error: {error}"
+        self.finished_at = get_vietnam_time()
+        self.lease_expires_at = None
 
     def __repr__(self):
         return f"<Anonymisation {self.name} - {self.status}>"
     
     
 
+class MetricScoreModel(db.Model):
+    """Score of one metric for one submission; `utility` aggregates these."""
+    __tablename__ = "submission_metric_scores"
+    __table_args__ = (sa.UniqueConstraint("anonym_id", "metric", name="uq_submission_metric"),)
+
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    anonym_id: so.Mapped[int] = so.mapped_column(
+        sa.ForeignKey("anonymisations.id", name="fk_metric_score_anonym", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    metric: so.Mapped[str] = so.mapped_column(sa.String(32), nullable=False)
+    parameters_hash: so.Mapped[str] = so.mapped_column(sa.String(64), nullable=False)
+    score: so.Mapped[float] = so.mapped_column(sa.Float(), nullable=False)
+    duration: so.Mapped[float] = so.mapped_column(sa.Float(), nullable=False, default=0.0)  # Seconds
+    created_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime, nullable=False, default=get_vietnam_time)
+
+    anonym: so.Mapped["AnonymModel"] = so.relationship("AnonymModel", back_populates="metric_scores")
+
+    def as_result(self):
+        return {"metric": self.metric, "parameters_hash": self.parameters_hash, "score": self.score, "duration": self.duration}
+
+    def __repr__(self):
+        return f"<MetricScore {self.metric} - {self.score}>"
+
+
+class StageMetricModel(db.Model):
+    """Resources used by one stage of one submission (upload, unzip, validation or a pipeline stage)."""
+    __tablename__ = "submission_stage_metrics"
+
+    id: so.Mapped[int] = so.mapped_column(primary_key=True)
+    anonym_id: so.Mapped[int] = so.mapped_column(
+        sa.ForeignKey("anonymisations.id", name="fk_stage_metric_anonym", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    stage: so.Mapped[str] = so.mapped_column(sa.String(32), nullable=False)
+    wall_seconds: so.Mapped[float] = so.mapped_column(sa.Float(), nullable=False)
+    cpu_seconds: so.Mapped[float] = so.mapped_column(sa.Float(), nullable=True)
+    peak_rss_mb: so.Mapped[float] = so.mapped_column(sa.Float(), nullable=True)
+    rows_processed: so.Mapped[int] = so.mapped_column(sa.Integer(), nullable=True)
+    bytes_read: so.Mapped[int] = so.mapped_column(sa.BigInteger(), nullable=True)
+    created_at: so.Mapped[datetime] = so.mapped_column(sa.DateTime, nullable=False, default=get_vietnam_time, index=True)
+
+    anonym: so.Mapped["AnonymModel"] = so.relationship("AnonymModel", back_populates="stage_metrics")
+
+    def __repr__(self):
+        return f"<StageMetric {self.stage} - {self.wall_seconds:.3f}s>"
+
+
 class MetricModel(db.Model):
     """Tracks evaluation metrics for anonymization."""
     __tablename__ = "metrics"
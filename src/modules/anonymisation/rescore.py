@@ -0,0 +1,289 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from flask import current_app
+from sqlalchemy import select, delete
+from src.extensions import db
+from src.constants.core_msg import INVALID_UPLOADED_FILE_FORMAT
+from src.core.services.anonym_threads.Utility import Utility
+from src.core.services.metric_registry import MetricRegistry, parameters_hash, scoring_digest
+from src.core.services.anonym_manager import AnonymManager
+from src.core.services.dataset_cache import DatasetCache
+from src.core.utils import file_sha256
+from src.core.services.evaluation_context import EvaluationContext, DatasetColumns
+from src.modules.anonymisation.models import AnonymModel, MetricModel, MetricScoreModel
+from src.modules.anonymisation.services import AnonymService
+
+_app = None       # Flask app inherited by the forked workers
+_original = None  # Original columns, parsed once in the parent and shared copy-on-write
+_origin_sha = None
+
+
+def _init_worker(niceness):
+    """Lowers the worker's priority so the API keeps its CPU, and drops inherited DB connections."""
+    os.nice(niceness)
+    with _app.app_context():
+        db.engine.dispose(close=False)
+
+
+def _rescore_submission(anonym_id, origin_file, input_file, scripts):
+    """
+    Evaluates `scripts` ((name, JSON parameters) pairs) on one submission.
+    :return: (anonym_id, per-metric results or an `(error, -1)` tuple)
+    """
+    with _app.app_context():
+        try:
+            context = EvaluationContext(origin_file, input_file, original=_original, digests={"origin": _origin_sha})
+            if context.load_anonymized() is None:
+                return anonym_id, (INVALID_UPLOADED_FILE_FORMAT, -1)
+            utility = Utility(input_file, origin_file, context=context)
+            error = utility.evaluate(scripts)
+            return anonym_id, error or utility.metric_scores
+        except Exception as e:
+            return anonym_id, (str(e), -1)
+        finally:
+            db.session.remove()
+
+
+class BulkRescore:
+    """
+    Re-evaluates the metrics of completed submissions after the metric selection
+    or parameters changed, without re-uploading anything.
+
+    Only the selected metrics whose stored parameters hash differs from the
+    current one (or that were never stored) are evaluated. The original file
+    is parsed once per distinct original and shared with forked workers; the
+    workers run at a lower priority and at most `workers` submissions are in
+    flight, so the API is not starved. `utility` is re-aggregated at the end
+    with one set-based update.
+    """
+
+    def __init__(self, app, workers=None, metrics=None, progress=None):
+        """
+        :param metrics: names of metrics to re-evaluate even if their parameters did not change
+        :param progress: callable(done, total, anonym_id, error) called after each submission
+        """
+        self.app = app
+        self.workers = max(1, workers or app.config.get("RESCORE_WORKERS", 2))
+        self.niceness = app.config.get("RESCORE_NICE", 10)
+        self.forced = set(metrics or ())
+        self.progress = progress or (lambda done, total, anonym_id, error: None)
+
+    def selected_scripts(self):
+        return db.session.execute(
+            select(MetricModel.name, MetricModel.parameters).where(MetricModel.is_selected == True)
+        ).fetchall()
+
+    def plan(self):
+        """
+        Work to do: {original file: [(anonym_id, input file, [(name, parameters)])]}.
+        Submissions whose stored scores are all current are left out.
+        """
+        scripts = self.selected_scripts()
+        hashes = {name: parameters_hash(parameters) for name, parameters in scripts}
+        work = {}
+        for anonym in AnonymModel.query.filter_by(status="completed").order_by(AnonymModel.id):
+            stored = {score.metric: score.parameters_hash for score in anonym.metric_scores}
+            stale = [
+                (name, parameters) for name, parameters in scripts
+                if name in self.forced or stored.get(name) != hashes[name]
+            ]
+            if stale:
+                work.setdefault(f"{anonym.original_file}.csv", []).append((anonym.id, f"{anonym.file_link}.csv", stale))
+        return work
+
+    def run(self):
+        """
+        Re-scores every stale submission.
+        :return: {"submissions", "rescored", "failed": {anonym_id: error}, "utility_updated"}
+        """
+        global _app, _original, _origin_sha
+        work = self.plan()
+        total = sum(len(jobs) for jobs in work.values())
+        summary = {"submissions": total, "rescored": 0, "failed": {}, "utility_updated": 0}
+
+        done = 0
+        for origin_file, jobs in work.items():
+            snapshot = DatasetCache().active_snapshot()
+            if snapshot and snapshot["csv_path"] != origin_file:
+                snapshot = None
+            _app = self.app
+            _original = DatasetCache.load(snapshot) if snapshot else DatasetColumns(origin_file)
+            _origin_sha = snapshot["sha256"] if snapshot else file_sha256(origin_file)
+            config_digest = scoring_digest(_origin_sha, self.selected_scripts())
+
+            try:
+                for anonym_id, results in self._evaluate(origin_file, jobs):
+                    error = results[0] if isinstance(results, tuple) else None
+                    if error is None:
+                        self._store(anonym_id, results, config_digest)
+                        summary["rescored"] += 1
+                    else:
+                        summary["failed"][anonym_id] = error
+                        current_app.logger.error(f"Re-scoring of anonymization {anonym_id} failed: {error}")
+                    done += 1
+                    self.progress(done, total, anonym_id, error)
+            finally:
+                _original = None
+
+        # Scores of metrics that are no longer selected leave the aggregation, in its transaction
+        selected = [name for name, _ in self.selected_scripts()]
+        if selected:
+            db.session.execute(delete(MetricScoreModel).where(MetricScoreModel.metric.notin_(selected)))
+        summary["utility_updated"] = AnonymService.reaggregate_utility()
+        return summary
+
+    def _evaluate(self, origin_file, jobs):
+        """Yields (anonym_id, results) as submissions finish, keeping at most `workers` in flight."""
+        if "fork" not in multiprocessing.get_all_start_methods():
+            for anonym_id, input_file, scripts in jobs:  # Workers could not inherit the parsed original
+                yield _rescore_submission(anonym_id, origin_file, input_file, scripts)
+            return
+
+        pending = list(jobs)
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(self.niceness,),
+        ) as executor:
+            running = set()
+            while pending or running:
+                while pending and len(running) < self.workers:
+                    anonym_id, input_file, scripts = pending.pop(0)
+                    running.add(executor.submit(_rescore_submission, anonym_id, origin_file, input_file, scripts))
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    yield future.result()
+
+    def _store(self, anonym_id, results, config_digest):
+        """Replaces the re-evaluated metric scores of one submission."""
+        anonym = db.session.get(AnonymModel, anonym_id)
+        if not anonym:
+            return
+        rows = {score.metric: score for score in anonym.metric_scores}
+        for result in results:
+            row = rows.get(result["metric"])
+            if row is None:
+                anonym.metric_scores.append(MetricScoreModel(**result))
+            else:
+                row.parameters_hash = result["parameters_hash"]
+                row.score = result["score"]
+                row.duration = result["duration"]
+        anonym.config_digest = config_digest
+        db.session.commit()
+
+
+class OriginalRescore:
+    """
+    Re-scores completed submissions against a new original (the newly active
+    raw file), through the whole pipeline since every stage depends on it.
+
+    Submissions failing the row and column shape check against the new
+    original are left as they are. The new original is parsed (or mapped from
+    its cache) once, and shared by the shape checks and every run. The others
+    are scored one at a time with their footprint written next to the current
+    one; the footprint (the attacks' answer key) and the scores are only
+    replaced once the new run succeeded, so a failed run keeps the previous
+    results.
+    """
+
+    PENDING_SUFFIX = ".rescore.json"
+
+    def __init__(self, app, origin_file, progress=None):
+        """
+        :param progress: callable(done, total, anonym_id, error) called after each submission
+        """
+        self.app = app
+        self.origin_file = origin_file
+        self.progress = progress or (lambda done, total, anonym_id, error: None)
+        self.snapshot = DatasetCache().active_snapshot()
+        if self.snapshot and self.snapshot["csv_path"] != origin_file:
+            self.snapshot = None
+        self.original = None
+        self.origin_sha = None
+
+    def load_original(self):
+        """Parses the new original once; every submission's context reuses it."""
+        if self.original is None:
+            self.original = DatasetCache.load(self.snapshot) if self.snapshot else DatasetColumns(self.origin_file)
+            self.origin_sha = self.snapshot["sha256"] if self.snapshot else file_sha256(self.origin_file)
+        return self.original
+
+    def manager(self, anonym, footprint_file, metrics=None):
+        return AnonymManager(
+            self.app, f"{anonym.file_link}.csv", self.origin_file, footprint_file,
+            original_snapshot=self.snapshot, metrics=metrics,
+            original=self.load_original(), origin_sha=self.origin_sha,
+        )
+
+    def plan(self):
+        """
+        :return: ([anonym_id] to re-score, {anonym_id: shape error} of the submissions left as they are)
+        """
+        eligible, skipped = [], {}
+        for anonym in AnonymModel.query.filter_by(status="completed").order_by(AnonymModel.id):
+            try:
+                self.manager(anonym, anonym.footprint_file).validate()
+                eligible.append(anonym.id)
+            except ValueError as e:
+                skipped[anonym.id] = str(e)
+        return eligible, skipped
+
+    def run(self):
+        """
+        Re-scores every submission passing the shape check.
+        :return: {"submissions", "rescored", "skipped": {anonym_id: error}, "failed": {anonym_id: error}}
+        """
+        eligible, skipped = self.plan()
+        summary = {"submissions": len(eligible), "rescored": 0, "skipped": skipped, "failed": {}}
+        metrics = MetricRegistry().current()
+        self.load_original()
+        config_digest = scoring_digest(self.origin_sha, metrics["metrics"])
+
+        for done, anonym_id in enumerate(eligible, 1):
+            error = self._rescore(anonym_id, config_digest, metrics)
+            if error is None:
+                summary["rescored"] += 1
+            else:
+                summary["failed"][anonym_id] = error
+                current_app.logger.error(f"Re-scoring of anonymization {anonym_id} failed: {error}")
+            self.progress(done, len(eligible), anonym_id, error)
+        return summary
+
+    def _rescore(self, anonym_id, config_digest, metrics):
+        """Scores one submission on a pending footprint, swapped in on success. :return: error or None"""
+        anonym = db.session.get(AnonymModel, anonym_id)
+        if not anonym or anonym.status != "completed":
+            return "no longer completed"
+        pending_footprint = f"{os.path.splitext(anonym.footprint_file)[0]}{self.PENDING_SUFFIX}"
+        if os.path.exists(pending_footprint):
+            os.remove(pending_footprint)  # Left by an interrupted run; would be taken as done
+
+        try:
+            utility, naive_attack, metric_scores = self.manager(anonym, pending_footprint, metrics).process()
+        except Exception as e:
+            if os.path.exists(pending_footprint):
+                os.remove(pending_footprint)
+            db.session.rollback()
+            return str(e)
+
+        anonym = db.session.get(AnonymModel, anonym_id)
+        if not anonym or anonym.status != "completed":  # Deleted or re-submitted meanwhile
+            os.remove(pending_footprint)
+            return "no longer completed"
+        try:
+            anonym.metric_scores = []
+            db.session.flush()  # Old rows go before the new ones take their (anonym, metric) keys
+            anonym.original_file = self.origin_file[:-4]
+            anonym.config_digest = config_digest
+            anonym.mark_completed(utility, naive_attack, metric_scores)
+            db.session.flush()
+            os.replace(pending_footprint, anonym.footprint_file)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            if os.path.exists(pending_footprint):
+                os.remove(pending_footprint)
+            return str(e)
+        return None
@@ -1,6 +1,6 @@
 from flask.views import MethodView
 from flask_smorest import Blueprint, abort
-from flask import request, send_file, after_this_request
+from flask import request, send_file, after_this_request, current_app
 from http import HTTPStatus
 from .services import AnonymService
 from .models import AnonymModel
@@ -11,12 +11,18 @@ from src.modules.admin.models import RawFileModel
 from src.common.response_builder import ResponseBuilder
 from src.constants.app_msg import *
 from src.modules.anonymisation.services import validate_submission_limit
+from src.modules.anonymisation.scheduler import admission_retry_after, queue_position, queue_eta
 from src.modules.admin.services import group_not_banned_required
 from src.modules.attack.models import AttackModel
 from src.modules.auth.models import GroupUserModel
 
 blp = Blueprint("anonymisation_func", __name__, description="Anonymisation Management")
 
+@blp.before_app_request
+def start_scoring_sweeper():
+    """Starts this process's lease sweeper on its first request (no-op afterwards)."""
+    AnonymService.start_sweeper(current_app._get_current_object())
+
 @blp.route("/upload")
 class AnonymUpload(MethodView):
     """Handles file upload and triggers anonymization."""
@@ -33,6 +39,16 @@ class AnonymUpload(MethodView):
         if "file" not in request.files:
             abort(HTTPStatus.BAD_REQUEST, message=NO_FILE_UPLOADED)
 
+        retry_after = admission_retry_after()
+        if retry_after is not None:
+            response = ResponseBuilder().error(
+                error="Too Many Requests",
+                message=SCORING_QUEUE_FULL.format(retry_after),
+                status_code=HTTPStatus.TOO_MANY_REQUESTS
+            ).build()
+            response.headers["Retry-After"] = str(retry_after)
+            return response
+
         file = request.files["file"]
         response, status_code = AnonymService.process_anonymization(file)
 
@@ -49,6 +65,7 @@ class AnonymResult(MethodView):
         if not anonym:
             abort(HTTPStatus.NOT_FOUND, message="Anonymization result not found.")
 
+        position = queue_position(anonym)
         return (
             ResponseBuilder()
             .success(
@@ -57,7 +74,9 @@ class AnonymResult(MethodView):
                     "status": anonym.status,
                     "utility_score": anonym.utility,
                     "naive_attack_score": anonym.naive_attack,
-                    "is_published": anonym.is_published
+                    "is_published": anonym.is_published,
+                    "queue_position": position,
+                    "eta_seconds": queue_eta(anonym, position)
                 },
                 status_code=HTTPStatus.OK
             )
@@ -80,7 +99,15 @@ class AnonymTogglePublish(MethodView):
         if anonym.status != "completed":
             abort(HTTPStatus.BAD_REQUEST, message="Anonymization must be 'completed' before modifying publish status.")
 
-        # Toggle publish state
+        # Toggle publish state; the shuffled copy only exists while published
+        try:
+            if anonym.is_published:
+                AnonymService.discard_shuffled(anonym)
+            else:
+                AnonymService.materialize_shuffled(anonym)
+        except Exception as e:
+            abort(HTTPStatus.INTERNAL_SERVER_ERROR, message=f"Could not prepare the shuffled file: {str(e)}")
+
         anonym.is_published = not anonym.is_published
         db.session.commit()
 
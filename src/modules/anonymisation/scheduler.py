@@ -0,0 +1,354 @@
+import math
+import time
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import func
+from src.extensions import db
+from src.constants.core_msg import JOB_ATTEMPTS_EXHAUSTED
+from src.core.services.dataset_cache import DatasetCache
+from src.core.services.checkpoints import CheckpointStore
+from src.core.services.metric_registry import MetricRegistry
+from src.modules.anonymisation.models import AnonymModel, get_vietnam_time
+from src.modules.admin.models import RawFileModel
+
+QUEUED_STATUS = "queued"
+PROCESSING_STATUS = "processing"
+RECENT_JOBS = 20              # Finished jobs used to estimate durations
+DEFAULT_JOB_SECONDS = 60.0    # Estimate used before any job has finished
+FAIRNESS_WINDOW = timedelta(hours=1)  # Recent service that counts against a group
+
+
+def scoring_backlog():
+    """Number of submissions waiting for or being scored."""
+    return (
+        db.session.query(func.count(AnonymModel.id))
+        .filter(AnonymModel.status.in_((QUEUED_STATUS, PROCESSING_STATUS)))
+        .scalar()
+    )
+
+
+def recent_job_seconds():
+    """Mean scoring time of the last finished jobs."""
+    rows = (
+        db.session.query(AnonymModel.started_at, AnonymModel.finished_at)
+        .filter(AnonymModel.started_at.isnot(None), AnonymModel.finished_at.isnot(None))
+        .order_by(AnonymModel.finished_at.desc())
+        .limit(RECENT_JOBS)
+        .all()
+    )
+    durations = [(finished - started).total_seconds() for started, finished in rows]
+    return sum(durations) / len(durations) if durations else DEFAULT_JOB_SECONDS
+
+
+def estimate_wait(jobs_ahead):
+    """Seconds until a job with `jobs_ahead` jobs in front of it is finished."""
+    concurrency = max(1, current_app.config.get("SCORING_CONCURRENCY", 4))
+    return math.ceil((jobs_ahead // concurrency + 1) * recent_job_seconds())
+
+
+def admission_retry_after():
+    """Seconds a client should wait before uploading again, or None if the queue has room."""
+    backlog = scoring_backlog()
+    limit = current_app.config.get("SCORING_QUEUE_LIMIT", 32)
+    if backlog < limit:
+        return None
+    return max(1, estimate_wait(backlog - limit))
+
+
+def _group_weight(group_id):
+    weights = current_app.config.get("SCORING_GROUP_WEIGHTS") or {}
+    return max(weights.get(group_id, 1), 1e-9)
+
+
+def queue_position(anonym):
+    """
+    Estimated 1-based position of a queued submission (None once it has started).
+
+    Groups are served in turn, so the jobs ahead are the group's own earlier
+    jobs plus, from every other group, about as many jobs per turn as its weight.
+    """
+    if anonym.status != QUEUED_STATUS:
+        return None
+    queued = dict(
+        db.session.query(AnonymModel.group_id, func.count(AnonymModel.id))
+        .filter(AnonymModel.status == QUEUED_STATUS)
+        .group_by(AnonymModel.group_id)
+        .all()
+    )
+    own_ahead = (
+        db.session.query(func.count(AnonymModel.id))
+        .filter(
+            AnonymModel.status == QUEUED_STATUS,
+            AnonymModel.group_id == anonym.group_id,
+            AnonymModel.id < anonym.id,
+        )
+        .scalar()
+    )
+    turns = (own_ahead + 1) / _group_weight(anonym.group_id)
+    others_ahead = sum(
+        min(count, math.ceil(turns * _group_weight(group_id)))
+        for group_id, count in queued.items()
+        if group_id != anonym.group_id
+    )
+    return own_ahead + others_ahead + 1
+
+
+def queue_eta(anonym, position):
+    """Estimated seconds until a queued submission has its scores."""
+    if position is None:
+        return None
+    running = db.session.query(func.count(AnonymModel.id)).filter_by(status=PROCESSING_STATUS).scalar()
+    return estimate_wait(running + position - 1)
+
+
+def scoring_job(anonym):
+    """Arguments of the scoring run of a submission."""
+    origin_file = f"{anonym.original_file}.csv"
+    snapshot = DatasetCache().active_snapshot()
+    if snapshot and snapshot["csv_path"] != origin_file:
+        snapshot = None  # The active dataset changed since upload; parse the pinned file
+    return {
+        "anonym_id": anonym.id,
+        "input_file": f"{anonym.file_link}.csv",
+        "origin_file": origin_file,
+        "footprint_file": anonym.footprint_file,
+        "snapshot": snapshot,
+        "metrics": MetricRegistry().current(),  # Admin changes from now on apply to later jobs only
+    }
+
+
+def claim_next_job(origin_file=None):
+    """
+    Picks the next queued submission fairly across groups and marks it processing.
+
+    Among the groups under their in-flight cap, the one with the fewest jobs
+    running, then the fewest started during FAIRNESS_WINDOW (both per unit of
+    weight), goes next; ties go to the oldest waiting job. A burst from one
+    group therefore interleaves with everyone else instead of running ahead.
+    :param origin_file: only consider submissions scored against this original
+    :return: the job arguments, or None when nothing may start now.
+    """
+    in_flight = dict(
+        db.session.query(AnonymModel.group_id, func.count(AnonymModel.id))
+        .filter(AnonymModel.status == PROCESSING_STATUS)
+        .group_by(AnonymModel.group_id)
+        .all()
+    )
+    if sum(in_flight.values()) >= current_app.config.get("SCORING_CONCURRENCY", 4):
+        return None
+
+    group_cap = current_app.config.get("SCORING_GROUP_IN_FLIGHT", 2)
+    queued = db.session.query(AnonymModel.group_id, func.min(AnonymModel.id)).filter(AnonymModel.status == QUEUED_STATUS)
+    if origin_file is not None:
+        queued = queued.filter(AnonymModel.original_file == origin_file[:-4])
+    heads = queued.group_by(AnonymModel.group_id).all()
+    recent = dict(
+        db.session.query(AnonymModel.group_id, func.count(AnonymModel.id))
+        .filter(AnonymModel.started_at >= get_vietnam_time() - FAIRNESS_WINDOW)
+        .group_by(AnonymModel.group_id)
+        .all()
+    )
+    candidates = sorted(
+        (
+            in_flight.get(group_id, 0) / _group_weight(group_id),
+            recent.get(group_id, 0) / _group_weight(group_id),
+            head_id,
+        )
+        for group_id, head_id in heads
+        if in_flight.get(group_id, 0) < group_cap
+    )
+
+    for _, _, head_id in candidates:
+        # Conditional update: another process may claim the same job first
+        claimed = (
+            db.session.query(AnonymModel)
+            .filter(AnonymModel.id == head_id, AnonymModel.status == QUEUED_STATUS)
+            .update(
+                {
+                    "status": PROCESSING_STATUS,
+                    "started_at": get_vietnam_time(),
+                    "lease_expires_at": _lease_deadline(),
+                    "attempts": AnonymModel.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.session.commit()
+        if claimed:
+            return scoring_job(db.session.get(AnonymModel, head_id))
+    return None
+
+
+def share_original(jobs):
+    """
+    Gives the jobs of a batch (same original file) one decoded copy of their
+    original: jobs without the active snapshot get a cache version built once
+    for the whole batch, which every member then memory-maps.
+    """
+    if len(jobs) < 2 or jobs[0]["snapshot"] is not None:
+        return jobs
+    origin_file = jobs[0]["origin_file"]
+    raw_file = next((file for file in RawFileModel.query.all() if DatasetCache.csv_path(file) == origin_file), None)
+    try:
+        snapshot = DatasetCache().build(raw_file.id if raw_file else "original", origin_file)
+    except Exception as e:
+        current_app.logger.warning(f"Batch cache build failed, members parse the original: {str(e)}")
+        return jobs
+    return [dict(job, snapshot=snapshot) for job in jobs]
+
+
+def _lease_deadline(seconds=None):
+    if seconds is None:
+        seconds = current_app.config.get("SCORING_LEASE_SECONDS", 300)
+    return get_vietnam_time() + timedelta(seconds=seconds)
+
+
+def renew_lease(anonym_id, seconds=None):
+    """
+    Extends the lease of a job that is still processing to `seconds` from now
+    (SCORING_LEASE_SECONDS by default). A longer lease already granted is kept.
+    """
+    deadline = _lease_deadline(seconds)
+    db.session.query(AnonymModel).filter(
+        AnonymModel.id == anonym_id,
+        AnonymModel.status == PROCESSING_STATUS,
+        AnonymModel.lease_expires_at.is_(None) | (AnonymModel.lease_expires_at < deadline),
+    ).update({"lease_expires_at": deadline}, synchronize_session=False)
+    db.session.commit()
+
+
+def recover_expired_jobs():
+    """
+    Puts back in the queue every processing job whose lease has expired (its
+    worker died or restarted), or fails it once it has used all its attempts.
+    Rows without a lease predate leases and are recovered too.
+    :return: number of recovered jobs
+    """
+    now = get_vietnam_time()
+    expired = (
+        db.session.query(AnonymModel)
+        .filter(
+            AnonymModel.status == PROCESSING_STATUS,
+            (AnonymModel.lease_expires_at < now) | AnonymModel.lease_expires_at.is_(None),
+        )
+        .all()
+    )
+    recovered = 0
+    for anonym in expired:
+        if anonym.attempts >= anonym.max_attempts:
+            anonym.mark_failed(JOB_ATTEMPTS_EXHAUSTED.format(anonym.attempts))
+            current_app.logger.error(f"Anonymization {anonym.id} abandoned after {anonym.attempts} attempts")
+        else:
+            anonym.status = QUEUED_STATUS
+            anonym.lease_expires_at = None
+            current_app.logger.warning(f"Anonymization {anonym.id} lease expired, re-queued")
+        recovered += 1
+    db.session.commit()
+    return recovered
+
+
+class JobLease:
+    """Heartbeat thread renewing a job's lease while the `with` block runs."""
+
+    def __init__(self, app, anonym_id):
+        self.app = app
+        self.anonym_id = anonym_id
+        self.interval = app.config.get("SCORING_LEASE_SECONDS", 300) / 3
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _beat(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    renew_lease(self.anonym_id)
+                except Exception as e:
+                    self.app.logger.warning(f"Lease renewal failed for {self.anonym_id}: {str(e)}")
+                finally:
+                    db.session.remove()
+
+
+class ScoringScheduler:
+    """
+    Starts queued submissions while there is capacity.
+
+    The queue itself is the `anonymisations` table, so every web process and
+    Celery worker sees the same backlog; `dispatch()` is called whenever a job
+    is queued or finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()  # `start()` may call back into run_in_thread()
+        self._executor = None
+        self._sweeper = None
+
+    def start_sweeper(self, app, dispatch):
+        """
+        Starts (once per process) the thread that recovers expired leases right
+        away and then every SCORING_SWEEP_SECONDS, calling `dispatch()` after each pass.
+        """
+        with self._lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(target=self._sweep, args=(app, dispatch), daemon=True)
+            self._sweeper.start()
+
+    def _sweep(self, app, dispatch):
+        interval = app.config.get("SCORING_SWEEP_SECONDS", 60)
+        while True:
+            with app.app_context():
+                try:
+                    recover_expired_jobs()
+                    dispatch()
+                    if app.config.get("STAGE_CHECKPOINTS", False):
+                        CheckpointStore.prune_if_due(app.config)
+                except Exception as e:
+                    app.logger.error(f"Scoring sweeper failed: {str(e)}")
+                finally:
+                    db.session.remove()
+            time.sleep(interval)
+
+    def dispatch(self, start, batch_size=1):
+        """
+        Claims jobs until the limits are reached, handing them to `start(batch)`.
+        With `batch_size` > 1, up to that many jobs sharing the first job's
+        original file are coalesced into one batch.
+        """
+        with self._lock:
+            while True:
+                job = claim_next_job()
+                if job is None:
+                    break
+                batch = [job]
+                while len(batch) < batch_size:
+                    member = claim_next_job(origin_file=job["origin_file"])
+                    if member is None:
+                        break
+                    batch.append(member)
+                start(batch)
+
+    def run_in_thread(self, app, run, **job):
+        """Runs `run(app, **job)` on the in-process pool of the "thread" backend."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, app.config.get("SCORING_CONCURRENCY", 4)))
+        self._executor.submit(self._run, app, run, job)
+
+    def _run(self, app, run, job):
+        try:
+            run(app, **job)
+        except Exception as e:
+            app.logger.exception(f"Scoring job failed: {str(e)}")
+
+
+scheduler = ScoringScheduler()
@@ -2,10 +2,20 @@ from flask import current_app
 from src.extensions import db
 from src.core.services.file_manager import FileManager
 from src.core.services.anonym_manager import AnonymManager
+from src.core.services.dataset_cache import DatasetCache
+from src.core.services.content_store import ContentStore
+from src.core.services.telemetry import StageProbe, file_bytes
+from src.core.services.anonym_threads import Shuffle
 from src.core.utils import generate_secure_filename
-from src.modules.anonymisation.models import AnonymModel
+from src.modules.anonymisation.models import AnonymModel, AggregationModel, MetricScoreModel, get_vietnam_time
+from src.core.services.metric_registry import MetricRegistry, AGGREGATIONS, scoring_digest
+from src.modules.anonymisation.tasks import dispatch_queued
+from src.modules.anonymisation.scheduler import scheduler, share_original, JobLease, QUEUED_STATUS
 import os
+import secrets
 from concurrent.futures import ThreadPoolExecutor
+from statistics import mean
+from sqlalchemy import select, update
 from src.constants.core_msg import *
 from http import HTTPStatus
 from flask_jwt_extended import get_jwt
@@ -13,8 +23,6 @@ from flask_jwt_extended import get_jwt
 class AnonymService:
     """Handles anonymization processing and business logic."""
 
-    executor = ThreadPoolExecutor(max_workers=4)
-
     @staticmethod
     def process_anonymization(file):
         """Processes an uploaded anonymized file asynchronously."""
@@ -26,16 +34,22 @@ class AnonymService:
             return {"message": "User must be part of a group to submit anonymization."}, HTTPStatus.FORBIDDEN
         file_manager = FileManager(upload_dir="anonym_file", allowed_extensions={"zip"})
         filename = f"{generate_secure_filename()}.zip"
-        file_path = file_manager.save_file(file, filename=filename)
-        extracted_file_path = file_manager.unzip_file(file_path)
+        with StageProbe("upload") as upload:
+            file_path = file_manager.save_file(file, filename=filename)
+        upload.bytes_read = file_bytes(file_path)
+        with StageProbe("unzip", bytes_read=upload.bytes_read) as unzip:
+            extracted_file_path = file_manager.unzip_file(file_path)
+        content_hash = ContentStore().put(extracted_file_path)
 
         # Generate related file paths
         f_file_manager = FileManager(upload_dir="footprint", allowed_extensions={"json"})
         footprint_file = f"{f_file_manager.upload_dir}/{generate_secure_filename()}.json"
         s_file_manager = FileManager(upload_dir="shuffled_file", allowed_extensions={"json"})
-        shuffled_file = f"{s_file_manager.upload_dir}/{generate_secure_filename()}.csv"
+        shuffled_file = f"{s_file_manager.upload_dir}/{generate_secure_filename()}.csv"  # Written on publish only
 
-        original_file = current_app.config.get("ORIGINAL_FILE_PATH")
+        # Pin the active cached original now so this job keeps it even if an admin switches files
+        snapshot = DatasetCache().active_snapshot()
+        original_file = snapshot["csv_path"] if snapshot else current_app.config.get("ORIGINAL_FILE_PATH")
 
         if not original_file:
             return {"message": ORIGIN_FILE_NOT_FOUND}, HTTPStatus.BAD_REQUEST
@@ -43,34 +57,149 @@ class AnonymService:
         anonym_model = AnonymModel(
             footprint_file=footprint_file,
             shuffled_file=shuffled_file[:-4],
+            shuffle_seed=secrets.randbits(63),
             original_file=original_file[:-4],
             file_link=extracted_file_path[:-4],
             name=os.path.splitext(file.filename)[0],  # Remove ".zip"
-            status="processing",
-            group_id=group_id
+            status=QUEUED_STATUS,
+            max_attempts=current_app.config.get("SCORING_MAX_ATTEMPTS", 3),
+            group_id=group_id,
+            content_hash=content_hash,
         )
+        anonym_model.add_stage_metrics([upload.sample(), unzip.sample()])
+        if AnonymService.reuse_scores(anonym_model, AnonymService.upload_config_digest(original_file, snapshot)):
+            db.session.add(anonym_model)
+            db.session.commit()
+            current_app.logger.info(f"Anonymization {anonym_model.id} reused the scores of an identical upload")
+            return {"message": "Submission scored.", "anonym_id": anonym_model.id}, HTTPStatus.CREATED
+
         db.session.add(anonym_model)
         db.session.commit()
 
-        current_app.logger.info(f"Submitting anonymization task for {anonym_model.id}")
-        app_obj = current_app._get_current_object()
-        AnonymService.executor.submit(AnonymService.run_anonymization, app_obj, anonym_model.id, extracted_file_path, original_file, shuffled_file, footprint_file)
+        current_app.logger.info(f"Queued anonymization task for {anonym_model.id}")
+        AnonymService.dispatch(current_app._get_current_object())
+
+        return {"message": "Submission queued.", "anonym_id": anonym_model.id}, HTTPStatus.CREATED
+
+    @staticmethod
+    def upload_config_digest(original_file, snapshot=None):
+        """
+        Digest a new upload would be scored with if it were claimed now (see
+        `scoring_digest`), used to look up identical earlier submissions. The
+        original is never hashed here: None when its digest is not recorded.
+        """
+        original_sha = snapshot["sha256"] if snapshot else DatasetCache.stored_sha256(original_file)
+        if original_sha is None:
+            return None
+        return scoring_digest(original_sha, MetricRegistry().current()["metrics"])
+
+    @staticmethod
+    def reaggregate_utility():
+        """
+        Recomputes the utility of every completed submission from its stored
+        metric scores with the selected aggregation: one read of the scores,
+        reduced with the same functions as Utility.result(), then a single
+        executemany UPDATE.
+        :return: number of updated submissions
+        """
+        method = db.session.execute(
+            select(AggregationModel.name).where(AggregationModel.is_selected == True)
+        ).scalar()
+        reduce = AGGREGATIONS.get(method, mean)  # Same default as Utility.result()
+
+        scores = {}
+        for anonym_id, score in db.session.execute(
+            select(MetricScoreModel.anonym_id, MetricScoreModel.score)
+            .join(AnonymModel)
+            .where(AnonymModel.status == "completed")
+            .order_by(MetricScoreModel.id)
+        ):
+            scores.setdefault(anonym_id, []).append(score)
+        if scores:
+            db.session.execute(
+                update(AnonymModel),
+                [{"id": anonym_id, "utility": reduce(values)} for anonym_id, values in scores.items()],
+            )
+        db.session.commit()
+        return len(scores)
+
+    @staticmethod
+    def reuse_scores(anonym_model, config_digest):
+        """
+        Completes a new submission with the scores of an earlier identical one
+        (same content hash, scored with the config of `config_digest`), linking
+        its footprint.
+        :return: True when the scores were reused, False if it must be scored.
+        """
+        if config_digest is None:
+            return False
+        previous = (
+            AnonymModel.query
+            .filter_by(content_hash=anonym_model.content_hash, config_digest=config_digest, status="completed")
+            .order_by(AnonymModel.id.desc())
+            .first()
+        )
+        if not previous or not previous.footprint_file or not os.path.exists(previous.footprint_file):
+            return False
+
+        ContentStore.link(previous.footprint_file, anonym_model.footprint_file)
+        anonym_model.config_digest = config_digest
+        anonym_model.started_at = get_vietnam_time()
+        anonym_model.mark_completed(
+            previous.utility, previous.naive_attack, [score.as_result() for score in previous.metric_scores]
+        )
+        return True
+
+    @staticmethod
+    def dispatch(app):
+        """Starts queued submissions, fairly across groups, up to the configured limits."""
+        if app.config.get("SCORING_BACKEND", "thread") == "celery":
+            dispatch_queued()
+        else:
+            scheduler.dispatch(
+                lambda batch: scheduler.run_in_thread(app, AnonymService.run_batch, jobs=batch),
+                app.config.get("SCORING_BATCH_SIZE", 1),
+            )
+
+    @staticmethod
+    def start_sweeper(app):
+        """Recovers jobs whose worker died, in the background of this process."""
+        scheduler.start_sweeper(app, lambda: AnonymService.dispatch(app))
 
-        return {"message": "Processing started.", "anonym_id": anonym_model.id}, HTTPStatus.CREATED
+    @staticmethod
+    def run_batch(app, jobs):
+        """
+        Scores a batch of submissions side by side. The members share one
+        decoded original; each still runs its own pipeline in its own thread.
+        """
+        if len(jobs) == 1:
+            return AnonymService.run_anonymization(app, **jobs[0])
+
+        with app.app_context():
+            jobs = share_original(jobs)
+        with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+            futures = [executor.submit(AnonymService.run_anonymization, app, **job) for job in jobs]
+        for future in futures:
+            if future.exception() is not None:
+                app.logger.error(f"Scoring job failed: {str(future.exception())}")
 
     @staticmethod
-    def run_anonymization(app, anonym_id, input_file, origin_file, shuffled_file, footprint_file):
+    def run_anonymization(app, anonym_id, input_file, origin_file, footprint_file, snapshot=None, metrics=None):
         """Background anonymization task."""
         with app.app_context():
+            anonym = None
             try:
-                anonym = AnonymManager(app, input_file, origin_file, shuffled_file, footprint_file)
-                utility_score, naive_attack_score = anonym.process()
+                anonym = AnonymManager(
+                    app, input_file, origin_file, footprint_file, original_snapshot=snapshot, metrics=metrics
+                )
+                with JobLease(app, anonym_id):
+                    utility_score, naive_attack_score, metric_scores = anonym.process()
 
                 anonym_model = db.session.query(AnonymModel).get(anonym_id)
                 if anonym_model:
-                    anonym_model.status = "completed"
-                    anonym_model.utility = utility_score
-                    anonym_model.naive_attack = naive_attack_score
+                    anonym_model.mark_completed(utility_score, naive_attack_score, metric_scores)
+                    anonym_model.config_digest = anonym.config_digest()
+                    anonym_model.add_stage_metrics(anonym.telemetry)
                     db.session.commit()
                     current_app.logger.info(f"Anonymization completed for ID {anonym_id}")
             
@@ -78,10 +207,50 @@ class AnonymService:
                 db.session.rollback()
                 anonym_model = db.session.query(AnonymModel).get(anonym_id)
                 if anonym_model:
-                    anonym_model.status = f"failed with Error: {str(e)}"
+                    anonym_model.mark_failed(str(e))
+                    anonym_model.add_stage_metrics(anonym.telemetry if anonym else [])
                     db.session.commit()
                     current_app.logger.error(f"Anonymization failed for ID {anonym_id}: {str(e)}")
                     raise Exception(str(e))
+            finally:
+                AnonymService.dispatch(app)  # A slot is free: start the next queued submission
+
+    @staticmethod
+    def materialize_shuffled(anonym):
+        """
+        Writes the shuffled copy of a submission if it is not on disk yet.
+
+        The permutation is fully determined by the stored seed, so the file can be
+        dropped on unpublish and regenerated byte for byte later. Rows without a
+        path or a seed (scored before seeds existed) get them stored first.
+        """
+        if anonym.shuffled_file and os.path.exists(f"{anonym.shuffled_file}.csv"):
+            return f"{anonym.shuffled_file}.csv"
+
+        if not anonym.shuffled_file:
+            s_file_manager = FileManager(upload_dir="shuffled_file", allowed_extensions={"json"})
+            anonym.shuffled_file = f"{s_file_manager.upload_dir}/{generate_secure_filename()}"
+        if anonym.shuffle_seed is None:
+            anonym.shuffle_seed = secrets.randbits(63)
+        db.session.commit()  # Later downloads regenerate the same permutation
+        shuffled_path = f"{anonym.shuffled_file}.csv"
+
+        if os.path.dirname(shuffled_path):
+            os.makedirs(os.path.dirname(shuffled_path), exist_ok=True)
+        shuffle = Shuffle(f"{anonym.file_link}.csv", f"{anonym.original_file}.csv", shuffled_path, seed=anonym.shuffle_seed)
+        result = shuffle.process()
+        if isinstance(result, tuple):
+            raise RuntimeError(result[0])
+        return shuffled_path
+
+    @staticmethod
+    def discard_shuffled(anonym):
+        """Removes the materialized shuffled copy, if any and if the stored seed can regenerate it."""
+        if not anonym.shuffled_file or anonym.shuffle_seed is None:
+            return
+        shuffled_path = f"{anonym.shuffled_file}.csv"
+        if os.path.exists(shuffled_path):
+            os.remove(shuffled_path)
 
 def validate_submission_limit(group_id: int) -> str:
     """Check if the team has exceeded submission or publish limits."""
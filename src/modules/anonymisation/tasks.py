@@ -0,0 +1,145 @@
+import shutil
+import tempfile
+from celery import shared_task, chain, chord, group
+from flask import current_app
+from src.extensions import db
+from src.constants.core_msg import STAGE_CANCELLED
+from src.core.services.anonym_manager import AnonymManager
+from src.core.services.file_manager import FileManager
+from src.core.services.metric_registry import scoring_digest
+from src.core.services.stage_graph import CancelToken
+from src.core.services.stage_pool import execute_stage
+from src.core.services.telemetry import write_sample, read_samples
+from src.modules.anonymisation.models import AnonymModel
+from src.modules.anonymisation.scheduler import scheduler, share_original, renew_lease, JobLease
+
+SCORING_QUEUE = "scoring"
+
+
+def record_outcome(anonym_id, scores=None, error=None, telemetry=(), config_digest=None):
+    """
+    Stores the final scores (or the failure) of a submission, with its stage
+    telemetry and the digest of the scoring config the scores were computed with.
+    """
+    anonym = db.session.get(AnonymModel, anonym_id)
+    if not anonym:
+        return
+    anonym.add_stage_metrics(telemetry)
+    if error is None:
+        anonym.mark_completed(*scores)
+        anonym.config_digest = config_digest
+        current_app.logger.info(f"Anonymization completed for ID {anonym_id}")
+    else:
+        anonym.mark_failed(error)
+        current_app.logger.error(f"Anonymization failed for ID {anonym_id}: {error}")
+    db.session.commit()
+
+
+def dispatch_queued():
+    """Starts the next queued submissions on the scoring queue (Celery backend)."""
+    def start(batch):
+        if len(batch) == 1:
+            score_submission_task.delay(**batch[0])
+        else:
+            score_batch_task.delay(batch)
+
+    scheduler.dispatch(start, current_app.config.get("SCORING_BATCH_SIZE", 1))
+
+
+@shared_task(bind=True, queue=SCORING_QUEUE, acks_late=True, reject_on_worker_lost=True)
+def score_batch_task(self, jobs):
+    """
+    Prepares a batch of submissions sharing one original: the original is
+    decoded once, then each member is validated and fanned out as usual,
+    every stage mapping the same original columns.
+    """
+    for job in share_original(jobs):
+        score_submission_task(**job)
+
+
+@shared_task(bind=True, queue=SCORING_QUEUE, acks_late=True, reject_on_worker_lost=True)
+def score_submission_task(self, anonym_id, input_file, origin_file, footprint_file, snapshot=None, metrics=None):
+    """
+    Validates a submission once, exports its parsed columns and fans the
+    pipeline stages out as subtasks joined by `finalize_scoring_task`.
+    """
+    app = current_app._get_current_object()
+    job_dir = None
+    manager = None
+    try:
+        manager = AnonymManager(
+            app, input_file, origin_file, footprint_file, original_snapshot=snapshot, metrics=metrics
+        )
+        with JobLease(app, anonym_id):
+            manager.validate()
+            job_dir = tempfile.mkdtemp(dir=FileManager(upload_dir="stage_columns").upload_dir)
+            job = dict(manager.export_job(job_dir), anonym_id=anonym_id)
+            for sample in manager.telemetry:
+                write_sample(job_dir, sample)  # Recorded with the outcome
+    except Exception as e:
+        if job_dir:
+            shutil.rmtree(job_dir, ignore_errors=True)
+        record_outcome(anonym_id, error=str(e), telemetry=manager.telemetry if manager else ())
+        dispatch_queued()
+        return
+
+    # Same dependencies as PIPELINE_STAGES: naive_attack follows footprint, utility runs alongside
+    if "footprint" in manager.completed_stages():
+        attack = score_stage_task.si([["footprint", 0]], "naive_attack", job)  # Resumed job
+    else:
+        attack = chain(score_stage_task.si([], "footprint", job), score_stage_task.s("naive_attack", job))
+    stages = group(attack, score_stage_task.si([], "utility", job))
+    # Nothing heartbeats while the stages wait in the queue: hold the job until the join runs
+    renew_lease(anonym_id, app.config.get("SCORING_CHORD_LEASE_SECONDS", 7200))
+    chord(stages)(finalize_scoring_task.s(anonym_id, job))
+
+
+@shared_task(bind=True, queue=SCORING_QUEUE, acks_late=True, reject_on_worker_lost=True)
+def score_stage_task(self, previous, stage, job):
+    """
+    Runs one stage of a submission.
+
+    `previous` holds the [stage, result] pairs of the stages this one follows in
+    its chain; the pairs are passed on so the join sees every result.
+    """
+    if any(isinstance(result, (list, tuple)) for _, result in previous):
+        return previous + [[stage, [STAGE_CANCELLED, -1]]]
+
+    try:
+        with JobLease(current_app._get_current_object(), job["anonym_id"]):
+            result = execute_stage(stage, job)
+    except Exception as e:
+        result = (str(e), -1)
+    finally:
+        db.session.remove()
+
+    if isinstance(result, tuple):
+        CancelToken(job["cancel_file"]).cancel()  # Sibling stages stop early
+    return previous + [[stage, result]]
+
+
+@shared_task(bind=True, queue=SCORING_QUEUE, acks_late=True, reject_on_worker_lost=True)
+def finalize_scoring_task(self, branches, anonym_id, job):
+    """Joins the stage results of a submission and stores its scores."""
+    results = {}
+    failures = []
+    for branch in branches:
+        for stage, result in branch:
+            if isinstance(result, list):  # Error tuples come back as JSON lists
+                result = tuple(result)
+            results[stage] = result
+            if isinstance(result, tuple):
+                failures.append((stage, result))
+
+    # Report the stage that failed, not the ones it cancelled
+    failures.sort(key=lambda failure: failure[1][0] == STAGE_CANCELLED)
+    telemetry = read_samples(job["job_dir"])
+    try:
+        scores = AnonymManager.scores(results, failures[0] if failures else None)
+        config_digest = scoring_digest(job["digests"]["origin"], job["metrics"]["metrics"])
+        record_outcome(anonym_id, scores=scores, telemetry=telemetry, config_digest=config_digest)
+    except Exception as e:
+        record_outcome(anonym_id, error=str(e), telemetry=telemetry)
+    finally:
+        shutil.rmtree(job["job_dir"], ignore_errors=True)
+    dispatch_queued()
@@ -7,6 +7,7 @@ from flask_jwt_extended import get_jwt, jwt_required, get_jwt_identity
 from src.modules.attack.services import AttackService
 from src.modules.auth.models import GroupUserModel, UserModel
 from src.modules.anonymisation.models import AnonymModel
+from src.modules.anonymisation.services import AnonymService
 from src.modules.attack.models import AttackModel
 from src.common.response_builder import ResponseBuilder
 import os
@@ -179,8 +180,10 @@ class DownloadAnonymFile(MethodView):
         anonym = db.session.get(AnonymModel, anonym_id)
         if not anonym or not anonym.is_published:
             abort(HTTPStatus.NOT_FOUND, message="File not found or not published.")
-        file_path = anonym.shuffled_file + ".csv"
-        if not file_path or not os.path.exists(file_path):
+        try:
+            # Regenerated from the stored seed if the copy was never written or was cleaned up
+            file_path = AnonymService.materialize_shuffled(anonym)
+        except Exception:
             abort(HTTPStatus.NOT_FOUND, message="File not found on disk")
         filename = f"{anonym.name}_anonymous.csv"
         return send_file(file_path, as_attachment=True, download_name=filename)
@@ -2,14 +2,23 @@ import pytest
 from src import create_app
 from src.extensions import db
 from src.config.testing import TestingConfig
+from src.constants.admin import ADMIN_ROLE
+from src.modules.anonymisation.scheduler import scheduler, QUEUED_STATUS
+from src.modules.anonymisation.models import AnonymModel, MetricScoreModel, StageMetricModel
+from src.modules.auth.models import GroupUserModel
+from flask_jwt_extended import create_access_token
 import os
 import shutil
 import tempfile
+import threading
+import uuid
 
 @pytest.fixture(scope="session")
 def app():
     """Create a new Flask app instance for testing."""
     app = create_app(TestingConfig())
+    # Tests queue rows themselves: keep the lease sweeper from claiming them
+    scheduler._sweeper = threading.Thread()
     test_upload_dir = os.path.join(tempfile.gettempdir(), "uploads")
     
     shutil.rmtree(test_upload_dir, ignore_errors=True)
@@ -23,4 +32,45 @@ def app():
 @pytest.fixture(scope="class")
 def client(app):
     """Return a test client for making HTTP requests."""
-    return app.test_client()
\ No newline at end of file
+    return app.test_client()
+
+@pytest.fixture
+def admin_headers(app):
+    """Authorization header of an admin."""
+    token = create_access_token(identity="1", additional_claims={"roles": [ADMIN_ROLE]})
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def group_headers(app):
+    """Builds the authorization header of a member of a group."""
+    def build(group_id):
+        token = create_access_token(identity="1", additional_claims={"group": group_id})
+        return {"Authorization": f"Bearer {token}"}
+    return build
+
+@pytest.fixture
+def make_submission(app):
+    """Builds submission rows (queued by default) of numbered groups; all are deleted after the test."""
+    def build(group_id, status=QUEUED_STATUS, **fields):
+        if not db.session.get(GroupUserModel, group_id):
+            db.session.add(GroupUserModel(id=group_id, name=f"group-{group_id}"))
+        token = uuid.uuid4().hex
+        fields = {
+            "name": f"submission-{token[:8]}",
+            "file_link": os.path.join(tempfile.gettempdir(), "uploads", token),
+            "footprint_file": os.path.join(tempfile.gettempdir(), "uploads", f"{token}.json"),
+            "original_file": os.path.join(tempfile.gettempdir(), "uploads", "original"),
+            **fields,
+        }
+        anonym = AnonymModel(group_id=group_id, status=status, **fields)
+        db.session.add(anonym)
+        db.session.commit()
+        return anonym
+
+    yield build
+    db.session.rollback()
+    StageMetricModel.query.delete()
+    MetricScoreModel.query.delete()
+    AnonymModel.query.delete()
+    GroupUserModel.query.delete()
+    db.session.commit()
@@ -0,0 +1,60 @@
+"""
+Test cases for the scoring config digest:
+    1. A job completed by the thread backend records the digest of its pinned metrics
+    2. Uploads look the original's digest up instead of hashing the file
+    3. The recorded digest is ignored once the original changed
+"""
+import zipfile
+import pytest
+from src.extensions import db
+from src.core.utils import file_sha256
+from src.core.services.dataset_cache import DatasetCache
+from src.core.services.metric_registry import MetricRegistry, scoring_digest
+from src.modules.anonymisation.models import AnonymModel
+from src.modules.anonymisation.services import AnonymService
+from src.modules.anonymisation.scheduler import PROCESSING_STATUS
+
+FILES_DIR = "tests/files"
+METRICS = {"version": 0, "metrics": [["utility_hour", "{}"], ["utility_date", "{}"]], "aggregation": "mean"}
+
+def extract(zip_path, directory):
+    with zipfile.ZipFile(zip_path) as archive:
+        name = archive.namelist()[0]
+        archive.extract(name, directory)
+    return str(directory / name)
+
+class TestConfigDigest:
+    """Test class for the digests of completed jobs and uploads."""
+
+    def test_completion_records_pinned_metrics(self, app, make_submission, tmp_path):
+        origin_file = extract(f"{FILES_DIR}/survey_results_1.zip", tmp_path)
+        input_file = extract(f"{FILES_DIR}/ano_1.zip", tmp_path)
+        anonym = make_submission(
+            1, status=PROCESSING_STATUS, file_link=input_file[:-4], footprint_file=str(tmp_path / "footprint.json")
+        )
+
+        AnonymService.run_anonymization(app, anonym.id, input_file, origin_file, anonym.footprint_file, metrics=METRICS)
+
+        db.session.expire_all()
+        anonym = db.session.get(AnonymModel, anonym.id)
+        assert anonym.status == "completed"
+        assert anonym.config_digest == scoring_digest(file_sha256(origin_file), METRICS["metrics"])
+        assert DatasetCache.stored_sha256(origin_file) == file_sha256(origin_file)
+
+    def test_upload_uses_stored_digest(self, app, tmp_path, monkeypatch):
+        origin_file = tmp_path / "original.csv"
+        origin_file.write_text("1\t2025-01-06 10:00:00\t48.85\t2.35\n")
+        monkeypatch.setattr("src.core.services.dataset_cache.file_sha256", pytest.fail)  # Never hashed in the request
+
+        assert AnonymService.upload_config_digest(str(origin_file)) is None
+        DatasetCache.store_sha256(str(origin_file), "0" * 64)
+        assert AnonymService.upload_config_digest(str(origin_file)) == scoring_digest("0" * 64, MetricRegistry().current()["metrics"])
+
+    def test_stored_digest_follows_file(self, tmp_path):
+        origin_file = tmp_path / "original.csv"
+        origin_file.write_text("a\n")
+        DatasetCache.store_sha256(str(origin_file), "0" * 64)
+        assert DatasetCache.stored_sha256(str(origin_file)) == "0" * 64
+
+        origin_file.write_text("changed\n")
+        assert DatasetCache.stored_sha256(str(origin_file)) is None
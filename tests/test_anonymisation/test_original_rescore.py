@@ -0,0 +1,64 @@
+"""
+Test cases for re-scoring submissions against a new original:
+    1. The new original is parsed once for the shape checks and every submission
+    2. Submissions failing the shape check are skipped and keep their scores
+"""
+import shutil
+import zipfile
+import pytest
+from src.extensions import db
+from src.core.services import evaluation_context
+from src.core.services.metric_registry import MetricRegistry
+from src.modules.anonymisation.models import AnonymModel
+from src.modules.anonymisation.rescore import OriginalRescore
+
+FILES_DIR = "tests/files"
+METRICS = {"version": 0, "metrics": [["utility_hour", "{}"]], "aggregation": "mean"}
+
+def extract(zip_path, directory):
+    with zipfile.ZipFile(zip_path) as archive:
+        name = archive.namelist()[0]
+        archive.extract(name, directory)
+    return str(directory / name)
+
+class TestOriginalRescore:
+    """Test class for OriginalRescore."""
+
+    @pytest.fixture
+    def parsed(self, monkeypatch):
+        """Files parsed into DatasetColumns during the test."""
+        files = []
+        init = evaluation_context.DatasetColumns.__init__
+
+        def counting_init(columns, file_path):
+            files.append(file_path)
+            init(columns, file_path)
+
+        monkeypatch.setattr(evaluation_context.DatasetColumns, "__init__", counting_init)
+        monkeypatch.setattr(MetricRegistry, "current", lambda registry: METRICS)
+        return files
+
+    def test_original_parsed_once(self, app, make_submission, parsed, tmp_path):
+        origin_file = extract(f"{FILES_DIR}/survey_results_1.zip", tmp_path)
+        input_file = extract(f"{FILES_DIR}/ano_1.zip", tmp_path)
+        submissions = []
+        for i in range(3):
+            shutil.copy(input_file, tmp_path / f"input_{i}.csv")
+            submissions.append(make_submission(
+                1, status="completed", file_link=str(tmp_path / f"input_{i}"), footprint_file=str(tmp_path / f"{i}.json")
+            ))
+        short_file = tmp_path / "short.csv"
+        short_file.write_text("".join(open(input_file).readlines()[:10]))
+        short = make_submission(1, status="completed", file_link=str(short_file)[:-4], utility=0.5)
+
+        summary = OriginalRescore(app, origin_file).run()
+
+        assert summary["rescored"] == 3 and not summary["failed"]
+        assert list(summary["skipped"]) == [short.id]
+        assert parsed.count(origin_file) == 1
+        for anonym in submissions:
+            db.session.refresh(anonym)
+            assert anonym.original_file == origin_file[:-4]
+            assert [score.metric for score in anonym.metric_scores] == ["utility_hour"]
+        db.session.refresh(short)
+        assert short.utility == 0.5
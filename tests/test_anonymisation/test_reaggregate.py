@@ -0,0 +1,66 @@
+"""
+Test cases for reaggregate_utility():
+    1. Each aggregation gives exactly the utility Utility.result() computes from the same scores
+    2. Submissions that are not completed are left alone
+"""
+import pytest
+from src.extensions import db
+from src.core.services.anonym_threads import Utility
+from src.modules.anonymisation.models import AggregationModel
+from src.modules.anonymisation.services import AnonymService
+
+# Plain sum / count rounds these differently from statistics.mean
+SCORES = [0.762280082457942, 0.0021060533511106927, 0.4453871940548014]
+
+class TestReaggregateUtility:
+    """Test class for reaggregate_utility()."""
+
+    @pytest.fixture
+    def select_aggregation(self, app):
+        """Selects one aggregation; the previous selection is restored afterwards."""
+        previous = {aggregation.name: aggregation.is_selected for aggregation in AggregationModel.query.all()}
+
+        def select(name):
+            for aggregation in AggregationModel.query.all():
+                aggregation.is_selected = aggregation.name == name
+            if not db.session.query(AggregationModel).filter_by(name=name).first():
+                db.session.add(AggregationModel(name=name, is_selected=True))
+            db.session.commit()
+
+        yield select
+        for aggregation in AggregationModel.query.all():
+            if aggregation.name in previous:
+                aggregation.is_selected = previous[aggregation.name]
+            else:
+                db.session.delete(aggregation)
+        db.session.commit()
+
+    def scored(self, make_submission, status="completed"):
+        anonym = make_submission(1, status=status, utility=0.0)
+        anonym.metric_scores = []
+        anonym.mark_completed(0.0, 0.0, [
+            {"metric": f"metric_{i}", "parameters_hash": "", "score": score, "duration": 0.0}
+            for i, score in enumerate(SCORES)
+        ])
+        anonym.status = status
+        db.session.commit()
+        return anonym
+
+    @pytest.mark.parametrize("method", ["mean", "median", "max", "min"])
+    def test_matches_utility_result(self, make_submission, select_aggregation, method):
+        select_aggregation(method)
+        anonym = self.scored(make_submission)
+
+        assert AnonymService.reaggregate_utility() == 1
+        utility = Utility(None, None, context=object(), metrics={"version": 0, "metrics": [], "aggregation": method})
+        utility.scores = SCORES
+        db.session.refresh(anonym)
+        assert anonym.utility == utility.result()
+
+    def test_skips_unfinished(self, make_submission, select_aggregation):
+        select_aggregation("max")
+        anonym = self.scored(make_submission, status="processing")
+
+        assert AnonymService.reaggregate_utility() == 0
+        db.session.refresh(anonym)
+        assert anonym.utility == 0.0
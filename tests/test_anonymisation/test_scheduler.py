@@ -0,0 +1,152 @@
+"""
+Test cases for the scoring scheduler:
+    1. A burst from one group interleaves with another group's submission
+    2. Per-group and global in-flight caps hold claims back
+    3. Recent service counts against a group
+    4. Expired leases are re-queued, or failed once out of attempts
+    5. Valid leases are left alone and never shortened by a renewal
+"""
+import pytest
+from datetime import timedelta
+from src.extensions import db
+from src.constants.core_msg import JOB_ATTEMPTS_EXHAUSTED
+from src.modules.anonymisation.models import AnonymModel, get_vietnam_time
+from src.modules.anonymisation.scheduler import (
+    claim_next_job, recover_expired_jobs, renew_lease, queue_position,
+    QUEUED_STATUS, PROCESSING_STATUS,
+)
+
+def claims(count):
+    """Group of each claimed job, None once nothing may start."""
+    result = []
+    for _ in range(count):
+        job = claim_next_job()
+        result.append(db.session.get(AnonymModel, job["anonym_id"]).group_id if job else None)
+    return result
+
+# --------------------------
+# TEST CASES FOR FAIRNESS
+# --------------------------
+
+class TestFairClaims:
+    """Test class for claim_next_job()."""
+
+    @pytest.fixture(autouse=True)
+    def limits(self, app, monkeypatch):
+        monkeypatch.setitem(app.config, "SCORING_CONCURRENCY", 10)
+        monkeypatch.setitem(app.config, "SCORING_GROUP_IN_FLIGHT", 2)
+        monkeypatch.setitem(app.config, "SCORING_GROUP_WEIGHTS", {})
+
+    def test_burst_interleaves_with_other_group(self, make_submission):
+        for _ in range(4):
+            make_submission(1)
+        make_submission(2)
+
+        assert claims(4) == [1, 2, 1, None]  # Group 1 stops at its in-flight cap
+
+    def test_claim_marks_processing(self, app, make_submission):
+        anonym = make_submission(1)
+        job = claim_next_job()
+
+        db.session.refresh(anonym)
+        assert job["anonym_id"] == anonym.id
+        assert anonym.status == PROCESSING_STATUS
+        assert anonym.attempts == 1
+        assert anonym.lease_expires_at is not None
+
+    def test_global_cap(self, app, monkeypatch, make_submission):
+        monkeypatch.setitem(app.config, "SCORING_CONCURRENCY", 1)
+        make_submission(1)
+        make_submission(2)
+
+        assert claims(2) == [1, None]
+
+    def test_recent_service_counts(self, make_submission):
+        for _ in range(3):
+            make_submission(1, status="completed", started_at=get_vietnam_time())
+        make_submission(1)
+        make_submission(2)
+
+        assert claims(2) == [2, 1]  # Group 2 waited less but was served less
+
+    def test_weights(self, app, monkeypatch, make_submission):
+        monkeypatch.setitem(app.config, "SCORING_GROUP_WEIGHTS", {1: 2})
+        make_submission(2, status=PROCESSING_STATUS, started_at=get_vietnam_time())
+        make_submission(1, status=PROCESSING_STATUS, started_at=get_vietnam_time())
+        make_submission(2)
+        make_submission(1)
+
+        assert claims(1) == [1]  # One job in flight weighs half as much for group 1
+
+    def test_queue_position_follows_turns(self, make_submission):
+        burst = [make_submission(1) for _ in range(3)]
+        other = make_submission(2)
+
+        assert [queue_position(anonym) for anonym in burst] == [2, 3, 4]
+        assert queue_position(other) == 2
+
+# --------------------------
+# TEST CASES FOR LEASES
+# --------------------------
+
+class TestLeaseRecovery:
+    """Test class for leases and recover_expired_jobs()."""
+
+    def processing(self, make_submission, lease_seconds, attempts=1, max_attempts=3):
+        return make_submission(
+            1,
+            status=PROCESSING_STATUS,
+            started_at=get_vietnam_time(),
+            lease_expires_at=get_vietnam_time() + timedelta(seconds=lease_seconds),
+            attempts=attempts,
+            max_attempts=max_attempts,
+        )
+
+    def test_expired_lease_is_requeued(self, make_submission):
+        anonym = self.processing(make_submission, -60)
+
+        assert recover_expired_jobs() == 1
+        db.session.refresh(anonym)
+        assert anonym.status == QUEUED_STATUS
+        assert anonym.lease_expires_at is None
+
+    def test_exhausted_attempts_fail(self, make_submission):
+        anonym = self.processing(make_submission, -60, attempts=3, max_attempts=3)
+
+        assert recover_expired_jobs() == 1
+        db.session.refresh(anonym)
+        assert anonym.status == f"failed with Error: {JOB_ATTEMPTS_EXHAUSTED.format(3)}"
+        assert anonym.finished_at is not None
+
+    def test_missing_lease_is_recovered(self, make_submission):
+        anonym = make_submission(1, status=PROCESSING_STATUS, attempts=1)
+
+        assert recover_expired_jobs() == 1
+        db.session.refresh(anonym)
+        assert anonym.status == QUEUED_STATUS
+
+    def test_valid_lease_is_kept(self, make_submission):
+        anonym = self.processing(make_submission, 300)
+        make_submission(1, status="completed")
+
+        assert recover_expired_jobs() == 0
+        db.session.refresh(anonym)
+        assert anonym.status == PROCESSING_STATUS
+
+    def test_renewal_extends_lease(self, make_submission):
+        anonym = self.processing(make_submission, 10)
+        before = anonym.lease_expires_at
+
+        renew_lease(anonym.id, 600)
+        db.session.refresh(anonym)
+        assert anonym.lease_expires_at > before
+
+    def test_renewal_keeps_longer_lease(self, make_submission):
+        anonym = self.processing(make_submission, 10)
+        renew_lease(anonym.id, 7200)
+        db.session.refresh(anonym)
+        granted = anonym.lease_expires_at
+
+        renew_lease(anonym.id, 60)
+        db.session.refresh(anonym)
+        assert anonym.lease_expires_at == granted
@@ -0,0 +1,114 @@
+"""
+Test cases for the Celery scoring tasks, run eagerly (no broker):
+    1. A valid submission fans out its stages and is completed with its scores and config digest
+    2. A failing stage fails the submission, releases its lease and cleans its job directory
+"""
+import os
+import json
+import uuid
+import zipfile
+import tempfile
+import pytest
+from datetime import timedelta
+from src.extensions import db
+from src.core.utils import file_sha256
+from src.core.services.metric_registry import scoring_digest
+from src.modules.anonymisation.models import AnonymModel, get_vietnam_time
+from src.modules.anonymisation.tasks import score_submission_task
+
+FILES_DIR = "tests/files"
+METRICS = {
+    "version": 0,
+    "metrics": [["utility_distance", json.dumps({"dx": 0.1})], ["utility_hour", "{}"]],
+    "aggregation": "mean",
+}
+
+def extract(zip_path, directory):
+    with zipfile.ZipFile(zip_path) as archive:
+        name = archive.namelist()[0]
+        archive.extract(name, directory)
+    return str(directory / name)
+
+class TestScoringTasks:
+    """Test class for score_submission_task and the stages it fans out."""
+
+    @pytest.fixture(autouse=True)
+    def eager(self, app):
+        celery = app.extensions["celery"]
+        previous = celery.conf.task_always_eager, celery.conf.task_eager_propagates
+        celery.conf.task_always_eager = celery.conf.task_eager_propagates = True
+        yield
+        celery.conf.task_always_eager, celery.conf.task_eager_propagates = previous
+
+    @pytest.fixture
+    def files(self, tmp_path):
+        return extract(f"{FILES_DIR}/survey_results_1.zip", tmp_path), extract(f"{FILES_DIR}/ano_1.zip", tmp_path)
+
+    @pytest.fixture
+    def submission(self, app, tmp_path):
+        """Claimed submission (processing, leased) scoring `input_file`."""
+        created = []
+
+        def build(input_file):
+            anonym = AnonymModel(
+                name="submission",
+                file_link=input_file[:-4],
+                original_file=str(tmp_path / "original"),
+                footprint_file=str(tmp_path / f"{uuid.uuid4().hex}.json"),
+                status="processing",
+                started_at=get_vietnam_time(),
+                lease_expires_at=get_vietnam_time() + timedelta(minutes=5),
+                attempts=1,
+            )
+            db.session.add(anonym)
+            db.session.commit()
+            created.append(anonym.id)
+            return anonym
+
+        yield build
+        for anonym_id in created:
+            db.session.delete(db.session.get(AnonymModel, anonym_id))
+        db.session.commit()
+
+    def score(self, anonym, origin_file):
+        score_submission_task.delay(
+            anonym.id, f"{anonym.file_link}.csv", origin_file, anonym.footprint_file, None, METRICS
+        )
+        db.session.expire_all()
+        return db.session.get(AnonymModel, anonym.id)
+
+    def stage_dirs(self):
+        directory = os.path.join(tempfile.gettempdir(), "uploads", "stage_columns")
+        return set(os.listdir(directory)) if os.path.isdir(directory) else set()
+
+    def test_completed(self, files, submission):
+        origin_file, input_file = files
+        before = self.stage_dirs()
+        anonym = self.score(submission(input_file), origin_file)
+
+        assert anonym.status == "completed"
+        assert 0 < anonym.utility <= 1
+        assert 0 <= anonym.naive_attack <= 1
+        assert sorted(score.metric for score in anonym.metric_scores) == ["utility_distance", "utility_hour"]
+        assert {sample.stage for sample in anonym.stage_metrics} >= {"checking_shape", "footprint", "utility", "naive_attack"}
+        assert anonym.lease_expires_at is None
+        assert anonym.config_digest == scoring_digest(file_sha256(origin_file), METRICS["metrics"])  # Pinned metrics
+        assert os.path.exists(anonym.footprint_file)
+        assert self.stage_dirs() == before
+
+    def test_failed_stage(self, files, submission, tmp_path):
+        origin_file, input_file = files
+        lines = open(input_file).read().split("\n")
+        fields = lines[10].split("\t")
+        fields[1] = "2025-01-01"  # No hour: the utility stage rejects the row
+        lines[10] = "\t".join(fields)
+        broken_file = tmp_path / "broken.csv"
+        broken_file.write_text("\n".join(lines))
+        before = self.stage_dirs()
+
+        anonym = self.score(submission(str(broken_file)), origin_file)
+
+        assert anonym.status.startswith("failed with Error")
+        assert anonym.lease_expires_at is None
+        assert anonym.finished_at is not None
+        assert self.stage_dirs() == before
@@ -0,0 +1,73 @@
+"""
+Test cases for the lazily materialized shuffled copy of a submission:
+    1. Discarded copies are regenerated byte for byte from the stored seed
+    2. Rows without a seed or a path get them stored, then stay reproducible
+    3. A copy whose seed is unknown is never discarded
+"""
+import os
+import uuid
+import pytest
+from src.extensions import db
+from src.modules.anonymisation.models import AnonymModel
+from src.modules.anonymisation.services import AnonymService
+
+ROWS = "".join(f"{i}\t2025-01-06 10:00:00\t48.{i:04d}\t2.35\n" for i in range(200))
+
+class TestShuffledFile:
+    """Test class for materialize_shuffled() and discard_shuffled()."""
+
+    @pytest.fixture
+    def submission(self, app, tmp_path):
+        """Completed submission; yields a builder taking the seed and shuffled path."""
+        (tmp_path / "input.csv").write_text(ROWS)
+        created = []
+
+        def build(shuffle_seed, shuffled_file):
+            anonym = AnonymModel(
+                name="submission",
+                file_link=str(tmp_path / "input"),
+                original_file=str(tmp_path / "original"),
+                shuffled_file=shuffled_file,
+                shuffle_seed=shuffle_seed,
+                status="completed",
+            )
+            db.session.add(anonym)
+            db.session.commit()
+            created.append(anonym)
+            return anonym
+
+        yield build
+        for anonym in created:
+            db.session.delete(anonym)
+        db.session.commit()
+
+    def test_regenerated_from_seed(self, submission, tmp_path):
+        anonym = submission(1234, str(tmp_path / "shuffled"))
+        path = AnonymService.materialize_shuffled(anonym)
+        content = open(path, "rb").read()
+        assert sorted(content.decode().splitlines(True)) == sorted(ROWS.splitlines(True))
+
+        AnonymService.discard_shuffled(anonym)
+        assert not os.path.exists(path)
+        assert open(AnonymService.materialize_shuffled(anonym), "rb").read() == content
+
+    def test_legacy_row(self, submission):
+        anonym = submission(None, None)
+        path = AnonymService.materialize_shuffled(anonym)
+
+        db.session.refresh(anonym)
+        assert anonym.shuffle_seed is not None
+        assert path == f"{anonym.shuffled_file}.csv"
+        content = open(path, "rb").read()
+        AnonymService.discard_shuffled(anonym)
+        assert open(AnonymService.materialize_shuffled(anonym), "rb").read() == content
+        os.remove(path)
+
+    def test_unknown_seed_kept(self, submission, tmp_path):
+        shuffled_file = str(tmp_path / uuid.uuid4().hex)
+        open(f"{shuffled_file}.csv", "w").write(ROWS)  # Written by the scoring pipeline before seeds
+        anonym = submission(None, shuffled_file)
+
+        AnonymService.discard_shuffled(anonym)
+        assert os.path.exists(f"{shuffled_file}.csv")
+        assert AnonymService.materialize_shuffled(anonym) == f"{shuffled_file}.csv"
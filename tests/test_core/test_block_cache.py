@@ -0,0 +1,78 @@
+"""
+Test cases for the block cache of row metrics:
+    1. The same submission scores (almost) the same with and without the block cache
+    2. With the block cache, reused blocks give exactly the scores of a cold run
+    3. The summation mode is part of the scoring config digest
+"""
+import json
+import random
+import shutil
+import pytest
+from src.core.services.anonym_threads import Utility
+from src.core.services.checkpoints import CheckpointStore
+from src.core.services.metric_registry import scoring_digest
+from src.core.metrics.utility_distance import DistanceUtility
+
+METRICS = {
+    "version": 0,
+    "metrics": [["utility_distance", json.dumps({"dx": 0.1})], ["utility_hour", "{}"]],
+    "aggregation": "mean",
+}
+ROWS = 20000  # Three blocks of BLOCK_ROWS, the last one partial
+
+def write_files(directory):
+    rng = random.Random(11)
+    original, anonymized = [], []
+    for i in range(ROWS):
+        lat, lon, hour = 48.8 + rng.random() * 0.2, 2.2 + rng.random() * 0.3, rng.randrange(24)
+        original.append(f"{i % 50}\t2025-01-06 {hour:02d}:00:00\t{lat}\t{lon}")
+        shifted = (hour + rng.randint(-3, 3)) % 24
+        anonymized.append(f"{i % 50:04x}\t2025-01-06 {shifted:02d}:00:00\t{lat + rng.uniform(-0.05, 0.05)}\t{lon + rng.uniform(-0.05, 0.05)}")
+    (directory / "original.csv").write_text("\n".join(original) + "\n")
+    (directory / "anonymized.csv").write_text("\n".join(anonymized) + "\n")
+    anonymized[ROWS // 2] = anonymized[ROWS // 2].replace("2025-01-06", "2025-01-07")  # One edited block
+    (directory / "edited.csv").write_text("\n".join(anonymized) + "\n")
+    return str(directory / "original.csv"), str(directory / "anonymized.csv"), str(directory / "edited.csv")
+
+class TestBlockCache:
+    """Test class for BlockCache through Utility."""
+
+    @pytest.fixture
+    def checkpoints(self, app, monkeypatch):
+        """Turns the checkpoints on; returns a function emptying the store."""
+        monkeypatch.setitem(app.config, "STAGE_CHECKPOINTS", True)
+        clear = lambda: shutil.rmtree(CheckpointStore().directory, ignore_errors=True)
+        clear()
+        yield clear
+        clear()
+
+    def scores(self, original_file, anonymized_file):
+        result = Utility(anonymized_file, original_file, metrics=METRICS).process()
+        return [score["score"] for score in result["metrics"]]
+
+    def test_with_and_without_block_cache(self, app, tmp_path, monkeypatch, checkpoints):
+        original_file, anonymized_file, _ = write_files(tmp_path)
+        cached = self.scores(original_file, anonymized_file)
+        monkeypatch.setitem(app.config, "STAGE_CHECKPOINTS", False)
+        uncached = self.scores(original_file, anonymized_file)
+
+        assert cached == pytest.approx(uncached, rel=1e-12, abs=0)
+
+    def test_reused_blocks_match_cold_run(self, app, tmp_path, monkeypatch, checkpoints):
+        original_file, anonymized_file, edited_file = write_files(tmp_path)
+        cold = self.scores(original_file, edited_file)
+        checkpoints()
+        self.scores(original_file, anonymized_file)  # Leaves the blocks the edit did not touch
+
+        scored = []
+        score_rows = DistanceUtility.score_rows
+        monkeypatch.setattr(DistanceUtility, "score_rows", lambda metric, rows: scored.append(rows) or score_rows(metric, rows))
+        assert self.scores(original_file, edited_file) == cold
+        assert len(scored) == 1  # Only the edited block
+
+    def test_summation_in_digest(self, app, monkeypatch):
+        monkeypatch.setitem(app.config, "STAGE_CHECKPOINTS", True)
+        blocks = scoring_digest("0" * 64, METRICS["metrics"])
+        monkeypatch.setitem(app.config, "STAGE_CHECKPOINTS", False)
+
+        assert scoring_digest("0" * 64, METRICS["metrics"]) != blocks
@@ -0,0 +1,49 @@
+"""
+Test cases for the columnar parsing of datasets:
+    1. Reading the file in chunks gives the same columns as reading it whole
+    2. Ids keep their first-appearance codes across chunks
+"""
+import numpy as np
+import pytest
+from src.core.services import evaluation_context
+from src.core.services.evaluation_context import DatasetColumns, TimestampColumns
+
+LINES = [
+    "u1\t2025-01-06 10:00:00\t48.85\t2.35",
+    "DEL\t\t\t",
+    "u2\t2025-01-07 11:30:00.000\t48.86\t2.36",
+    "\t2025-02-30 10:00:00\t48.87\t",
+    "",
+    "u1\t2025-01-08\tx\t2.37",
+    "u3\t2025-01-09 9:00:00\t48.88\t2.38",
+] * 5
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "dataset.csv"
+    path.write_text("\n".join(LINES) + "\n")
+    return str(path)
+
+def columns(dataset, monkeypatch, chunk_rows):
+    monkeypatch.setattr(evaluation_context, "DECODE_CHUNK_ROWS", chunk_rows)
+    return DatasetColumns(dataset)
+
+class TestDatasetColumns:
+    """Test class for DatasetColumns."""
+
+    def test_chunks_match_whole_file(self, dataset, monkeypatch):
+        whole = columns(dataset, monkeypatch, 1_000_000)
+        chunked = columns(dataset, monkeypatch, 3)
+
+        assert chunked.size == whole.size == len(LINES)
+        for name in DatasetColumns.ARRAYS:
+            np.testing.assert_array_equal(getattr(chunked, name), getattr(whole, name))
+        for name in TimestampColumns.ARRAYS:
+            np.testing.assert_array_equal(getattr(chunked.timestamps, name), getattr(whole.timestamps, name))
+        assert list(chunked.ids) == list(whole.ids)
+
+    def test_id_codes(self, dataset, monkeypatch):
+        chunked = columns(dataset, monkeypatch, 2)
+
+        assert list(chunked.id_values) == ["u1", "DEL", "u2", "", "u3"]
+        assert list(chunked.ids) == [line.split("\t")[0] for line in LINES]
@@ -0,0 +1,61 @@
+"""
+Test cases for the metric plugin protocol:
+    1. A plugin missing part of the protocol fails when instantiated
+    2. Evaluations with different parameters run side by side
+    3. Scripts without a plugin class go through the legacy adapter
+"""
+import types
+import pytest
+from src.core.metrics import utility_distance
+from src.core.services.evaluation_context import EvaluationContext, row_chunks
+from src.core.services.metric_plugin import MetricPlugin, RowMetric, ScriptMetric, load_plugin
+
+ORIGINAL = "1\t2025-01-06 10:00:00\t48.85\t2.35\n2\t2025-01-07 11:00:00\t48.86\t2.36\n3\t2025-01-08 12:00:00\t48.87\t2.37\n"
+ANONYMIZED = "a\t2025-01-06 10:00:00\t48.86\t2.35\nDEL\t\t\t\nb\t2025-01-08 12:00:00\t48.87\t2.45\n"
+
+@pytest.fixture
+def context(tmp_path):
+    original_file, anonymized_file = tmp_path / "original.csv", tmp_path / "anonymized.csv"
+    original_file.write_text(ORIGINAL)
+    anonymized_file.write_text(ANONYMIZED)
+    return EvaluationContext(str(original_file), str(anonymized_file))
+
+class TestMetricPlugin:
+    """Test class for MetricPlugin and its adapters."""
+
+    def test_incomplete_plugin(self):
+        class NoFinalize(MetricPlugin):
+            def update(self, rows):
+                pass
+
+        class NoScoreRows(RowMetric):
+            pass
+
+        with pytest.raises(TypeError):
+            NoFinalize()
+        with pytest.raises(TypeError):
+            NoScoreRows()
+
+    def test_interleaved_evaluations(self, context):
+        coarse = load_plugin(utility_distance, {"dx": 1})
+        fine = load_plugin(utility_distance, {"dx": 0.05})
+        for plugin in (coarse, fine):
+            plugin.start(context)
+        for rows in row_chunks(context.size, 1):
+            coarse.update(rows)
+            fine.update(rows)
+
+        assert coarse.finalize() == utility_distance.main(context.origin_file, context.input_file, {"dx": 1})
+        assert fine.finalize() == utility_distance.main(context.origin_file, context.input_file, {"dx": 0.05})
+        assert coarse.finalize() != fine.finalize()
+
+    def test_legacy_script(self, context):
+        calls = []
+        def main(original_file, anonymized_file, parameters):
+            calls.append((original_file, anonymized_file, parameters))
+            return 0.5
+        plugin = load_plugin(types.SimpleNamespace(main=main), {"k": 1})
+
+        assert isinstance(plugin, ScriptMetric)
+        assert plugin.run(context) == 0.5
+        assert calls == [(context.origin_file, context.input_file, {"k": 1})]
@@ -0,0 +1,214 @@
+"""
+Test cases for the utility metrics against their original row-by-row implementations:
+    1. Each metric's `main()` returns bit-for-bit the legacy score
+    2. Invalid rows fail on the same line as the legacy scripts
+    3. The single streaming pass of `Utility` gives every metric its legacy score
+"""
+import csv
+import json
+import random
+import zipfile
+import datetime
+import pytest
+from collections import defaultdict
+from statistics import mean
+from src.constants.core_msg import SEPARATOR, INVALID_ORIGINAL_FILE
+from src.core.metrics import utility_distance, utility_hour, utility_date, utility_meet
+from src.core.services.anonym_threads import Utility
+
+FILES_DIR = "tests/files"
+
+# --------------------------
+# LEGACY IMPLEMENTATIONS (as shipped before the vectorized metrics)
+# --------------------------
+
+def legacy_distance(original_file, anonymized_file, parameters):
+    dx = parameters.get("dx", 0.1)
+    line_utility = 0
+    filesize = 0
+    with open(original_file) as nona, open(anonymized_file) as anon:
+        for line_ano, line_non_ano in zip(csv.reader(anon, delimiter=SEPARATOR), csv.reader(nona, delimiter=SEPARATOR)):
+            filesize += 1
+            if line_ano[0] != "DEL":
+                diff = abs(float(line_non_ano[3]) - float(line_ano[3])) + abs(float(line_non_ano[2]) - float(line_ano[2]))
+                score = diff * (-1 / dx) + 1
+                line_utility += score if score >= 0 else 0
+            else:
+                line_utility += 0
+    return line_utility / filesize
+
+def legacy_hour(original_file, anonymized_file, parameters):
+    hour_penalty = [1, 0.9, 0.8, 0.6, 0.4, 0.2, 0, 0.1, 0.2, 0.3, 0.4, 0.5,
+                    0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0, 0.2, 0.4, 0.6, 0.8, 0.9]
+    total_score = 0
+    file_size = 0
+    with open(original_file) as nona, open(anonymized_file) as anon:
+        for row_original, row_anonymized in zip(csv.reader(nona, delimiter=SEPARATOR), csv.reader(anon, delimiter=SEPARATOR)):
+            score = 1
+            file_size += 1
+            if row_anonymized[0] == "DEL":
+                continue
+            if len(row_anonymized[1]) > 13 and len(row_anonymized[0]) > 0:
+                hour_anon = int(row_anonymized[1][11:13])
+                hour_original = int(row_original[1][11:13])
+                if 0 <= hour_anon < 24 and 0 <= hour_original < 24:
+                    time_diff = abs(hour_anon - hour_original)
+                    if time_diff:
+                        score -= hour_penalty[time_diff]
+                else:
+                    return (-1, file_size)
+            else:
+                return (-1, file_size)
+            total_score += max(0, score)
+    return total_score / file_size if file_size > 0 else 0
+
+def legacy_date(original_file, anonymized_file, parameters):
+    total = 0
+    filesize = 0
+    with open(original_file) as nona, open(anonymized_file) as anon:
+        for row1, row2 in zip(csv.reader(nona, delimiter=SEPARATOR), csv.reader(anon, delimiter=SEPARATOR)):
+            score = 1
+            filesize += 1
+            if row2[0] == "DEL":
+                continue
+            if len(row2[1]) >= 10 and len(row2[0]):
+                year_na, month_na, day_na = row1[1][0:10].split("-")
+                year_an, month_an, day_an = row2[1][0:10].split("-")
+                try:
+                    dateanon = datetime.date(int(year_an), int(month_an), int(day_an)).isocalendar()
+                    datenona = datetime.date(int(year_na), int(month_na), int(day_na)).isocalendar()
+                except Exception:
+                    return (INVALID_ORIGINAL_FILE, filesize)
+                if dateanon[1] == datenona[1]:
+                    dayanon = dateanon[2]
+                    daynona = datenona[2]
+                    if datenona[2] != dateanon[2]:
+                        score -= min([abs(dayanon - daynona), abs(max((dayanon, daynona)) - min((dayanon, daynona)) + 7)]) / 3
+                else:
+                    return (INVALID_ORIGINAL_FILE, filesize)
+            else:
+                return (INVALID_ORIGINAL_FILE, filesize)
+            total += max(0, score)
+    return total / filesize
+
+def legacy_meet(original_file, anonymized_file, parameters):
+    size = parameters.get("size", 3)
+    pt = parameters.get("pt", 0.2)
+    original_cells = defaultdict(int)
+    anonymized_cells = defaultdict(int)
+    with open(original_file, newline="") as nona, open(anonymized_file, newline="") as anon:
+        for line_ori, line_ano in zip(csv.reader(nona, delimiter=SEPARATOR), csv.reader(anon, delimiter=SEPARATOR)):
+            original_cells[(round(float(line_ori[2]), size), round(float(line_ori[3]), size))] += 1
+            if line_ano[0] != "DEL":
+                anonymized_cells[(round(float(line_ano[2]), size), round(float(line_ano[3]), size))] += 1
+
+    num_cells_to_check = int(len(original_cells) * pt)
+    sorted_original_cells = sorted(original_cells.items(), key=lambda t: t[1], reverse=True)
+    sorted_anonymized_cells = sorted(anonymized_cells.items(), key=lambda t: t[1], reverse=True)
+    top_anonymized_cells = dict(sorted_anonymized_cells[:min(len(anonymized_cells), num_cells_to_check)])
+    score = sum(1 for cell, _ in sorted_original_cells[:num_cells_to_check] if cell in top_anonymized_cells)
+    return score / num_cells_to_check
+
+METRICS = {
+    "utility_distance": (utility_distance, legacy_distance, [{"dx": 0.1}, {"dx": 0.01}, {"dx": 1}]),
+    "utility_hour": (utility_hour, legacy_hour, [{}]),
+    "utility_date": (utility_date, legacy_date, [{}]),
+    "utility_meet": (utility_meet, legacy_meet, [{"size": 2, "pt": 0.1}, {"size": 3, "pt": 0.3}, {"size": 1, "pt": 1}]),
+}
+
+# --------------------------
+# DATASETS
+# --------------------------
+
+def _timestamp(moment, milliseconds=False):
+    return moment.strftime("%Y-%m-%d %H:%M:%S") + (".000" if milliseconds else "")
+
+def write_dataset(directory, rows=3000, seed=7):
+    """Synthetic original and anonymized files: shifted hours and weekdays, jittered positions, deleted rows."""
+    rng = random.Random(seed)
+    start = datetime.datetime(2024, 12, 23)
+    original, anonymized = [], []
+    for _ in range(rows):
+        user = rng.randrange(40)
+        moment = start + datetime.timedelta(seconds=rng.randrange(0, 35 * 86400))
+        lat, lon = 48.8 + rng.random() * 0.2, 2.2 + rng.random() * 0.3
+        original.append(f"{user}\t{_timestamp(moment)}\t{lat}\t{lon}")
+        if rng.random() < 0.1:
+            anonymized.append("DEL\t\t\t")
+            continue
+        shifted = moment + datetime.timedelta(days=rng.randint(1, 7) - moment.isoweekday(), hours=rng.randint(-5, 5))
+        if shifted.isocalendar()[:2] != moment.isocalendar()[:2]:
+            shifted = moment
+        anonymized.append(f"{user:04x}\t{_timestamp(shifted, True)}\t{lat + rng.uniform(-0.05, 0.05)}\t{lon + rng.uniform(-0.05, 0.05)}")
+
+    original_file, anonymized_file = directory / "original.csv", directory / "anonymized.csv"
+    original_file.write_text("\n".join(original) + "\n")
+    anonymized_file.write_text("\n".join(anonymized) + "\n")
+    return str(original_file), str(anonymized_file)
+
+def extract(zip_path, directory):
+    with zipfile.ZipFile(zip_path) as archive:
+        name = archive.namelist()[0]
+        archive.extract(name, directory)
+    return str(directory / name)
+
+@pytest.fixture(scope="module", params=["synthetic", "sample"])
+def dataset(request, tmp_path_factory):
+    """(original file, anonymized file) pairs: a generated one and the sample files of the repository."""
+    directory = tmp_path_factory.mktemp(request.param)
+    if request.param == "synthetic":
+        return write_dataset(directory)
+    return (
+        extract(f"{FILES_DIR}/survey_results_1.zip", directory),
+        extract(f"{FILES_DIR}/ano_1.zip", directory),
+    )
+
+def _rewrite_row(anonymized_file, directory, column, value):
+    """Copy of `anonymized_file` with one kept row's `column` replaced; returns (path, 1-based line)."""
+    lines = open(anonymized_file).read().split("\n")
+    index = next(i for i in range(len(lines) // 2, len(lines)) if not lines[i].startswith("DEL"))
+    fields = lines[index].split("\t")
+    fields[column] = value
+    lines[index] = "\t".join(fields)
+    path = directory / "edited.csv"
+    path.write_text("\n".join(lines))
+    return str(path), index + 1
+
+# --------------------------
+# TEST CASES
+# --------------------------
+
+class TestMetricsBaseline:
+    """Vectorized metrics must reproduce the legacy scores exactly."""
+
+    @pytest.mark.parametrize("name", sorted(METRICS))
+    def test_main_matches_legacy(self, app, dataset, name):
+        module, legacy, parameter_sets = METRICS[name]
+        original_file, anonymized_file = dataset
+        for parameters in parameter_sets:
+            assert module.main(original_file, anonymized_file, parameters) == legacy(original_file, anonymized_file, parameters)
+
+    def test_invalid_hour_fails_like_legacy(self, app, tmp_path):
+        original_file, anonymized_file = write_dataset(tmp_path, rows=500)
+        edited, _ = _rewrite_row(anonymized_file, tmp_path, 1, "2025-01-01")
+        assert utility_hour.main(original_file, edited, {}) == legacy_hour(original_file, edited, {})
+
+    def test_invalid_date_fails_like_legacy(self, app, tmp_path):
+        original_file, anonymized_file = write_dataset(tmp_path, rows=500)
+        edited, line = _rewrite_row(anonymized_file, tmp_path, 1, "2025-02-30 10:00:00")
+        assert utility_date.main(original_file, edited, {}) == legacy_date(original_file, edited, {}) == (INVALID_ORIGINAL_FILE, line)
+
+    def test_streaming_pass_matches_legacy(self, app, dataset):
+        original_file, anonymized_file = dataset
+        selection = [(name, parameter_sets[0]) for name, (_, _, parameter_sets) in sorted(METRICS.items())]
+        snapshot = {
+            "version": 1,
+            "metrics": [[name, json.dumps(parameters)] for name, parameters in selection],
+            "aggregation": "mean",
+        }
+        utility = Utility(anonymized_file, original_file, metrics=snapshot)
+        result = utility.process()
+
+        expected = {name: METRICS[name][1](original_file, anonymized_file, parameters) for name, parameters in selection}
+        assert {score["metric"]: score["score"] for score in result["metrics"]} == expected
+        assert result["score"] == mean(expected.values())  # Legacy default aggregation
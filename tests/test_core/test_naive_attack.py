@@ -0,0 +1,105 @@
+"""
+Test cases for the naive attack matching against a brute-force search:
+    1. `nearest_l1` picks the same candidate as a sequential scan, ties included
+    2. `match_gps_data` gives the legacy solution on files with tied coordinate sums
+"""
+import csv
+import random
+import datetime
+import numpy as np
+import pytest
+from collections import defaultdict
+from src.constants.core_msg import SEPARATOR
+from src.core.services.anonym_threads.NaiveAttack import NaiveAttack, nearest_l1, SCAN_BLOCK
+
+# --------------------------
+# BRUTE FORCE (as shipped before the sorted sweep)
+# --------------------------
+
+def brute_force(queries, candidates):
+    """First candidate with the strictly smallest L1 distance, for every query."""
+    matches = []
+    for qx, qy in queries:
+        best, best_index = float("inf"), -1
+        for index, (cx, cy) in enumerate(candidates):
+            difference = abs(qx - cx) + abs(qy - cy)
+            if difference < best:
+                best, best_index = difference, index
+        matches.append(best_index)
+    return matches
+
+def legacy_sum_gps(path):
+    sums = defaultdict(lambda: [0.0, 0.0])
+    with open(path, newline="") as csvfile:
+        for row in csv.reader(csvfile, delimiter=SEPARATOR):
+            if row[0] != "DEL":
+                y, m, d = row[1][:10].split("-")
+                calendar = datetime.date(int(y), int(m), int(d)).isocalendar()
+                key = f"{row[0]}.{calendar[0]}-{calendar[1]}"
+                sums[key][0] += float(row[-2])
+                sums[key][1] += float(row[-1])
+    return sums
+
+def legacy_match(original_file, anonymized_file):
+    original, anonymized = legacy_sum_gps(original_file), legacy_sum_gps(anonymized_file)
+    sol = defaultdict(dict)
+    for key, gps in original.items():
+        best, best_match = float("inf"), ""
+        for key2, gps2 in anonymized.items():
+            difference = abs(gps[0] - gps2[0]) + abs(gps[1] - gps2[1])
+            if difference < best:
+                best, best_match = difference, key2
+        sol[key.split(".")[0]][key.split(".")[1]] = [best_match.split(".")[0]]
+    return sol
+
+# --------------------------
+# TEST CASES
+# --------------------------
+
+class TestNearestL1:
+    """Test class for the sorted L1 sweep."""
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_matches_brute_force_with_ties(self, seed):
+        rng = np.random.default_rng(seed)
+        # Small integer grids: many candidates share a coordinate, a sum or a distance
+        candidates = rng.integers(0, 6, size=(int(rng.integers(1, 4 * SCAN_BLOCK)), 2)).astype(float)
+        queries = rng.integers(-1, 7, size=(200, 2)).astype(float)
+        queries[:20] += 0.5  # Equidistant from neighbouring grid points
+
+        assert nearest_l1(queries, candidates).tolist() == brute_force(queries, candidates)
+
+    def test_duplicates_go_to_first(self):
+        candidates = np.array([[1.0, 1.0]] * (3 * SCAN_BLOCK) + [[0.0, 2.0], [2.0, 0.0]])
+        queries = np.array([[1.0, 1.0], [0.0, 1.0], [1.0, 0.0], [5.0, 5.0]])
+
+        assert nearest_l1(queries, candidates).tolist() == [0, 0, 0, 0]
+
+    def test_empty(self):
+        assert nearest_l1(np.zeros((2, 2)), np.zeros((0, 2))).tolist() == [-1, -1]
+
+class TestMatchGpsData:
+    """Test class for NaiveAttack.match_gps_data()."""
+
+    def write(self, path, rows):
+        path.write_text("".join("\t".join(map(str, row)) + "\n" for row in rows))
+        return str(path)
+
+    def test_matches_legacy_with_tied_sums(self, app, tmp_path):
+        rng = random.Random(3)
+        start = datetime.date(2025, 1, 6)
+        original, anonymized = [], []
+        for _ in range(2000):
+            user = rng.randrange(60)
+            day = start + datetime.timedelta(days=rng.randrange(28))
+            lat, lon = rng.choice((0.25, 0.5, 1.0)), rng.choice((0.25, 0.5))  # Exact binary sums, many equal
+            original.append((user, f"{day} 10:00:00", lat, lon))
+            if rng.random() < 0.05:
+                anonymized.append(("DEL", "", "", ""))
+            else:
+                anonymized.append((f"p{rng.randrange(60)}", f"{day} 12:00:00", lat, lon))
+        original_file = self.write(tmp_path / "original.csv", original)
+        anonymized_file = self.write(tmp_path / "anonymized.csv", anonymized)
+
+        solution = NaiveAttack(original_file, anonymized_file, None).match_gps_data()
+        assert solution == legacy_match(original_file, anonymized_file)
@@ -0,0 +1,78 @@
+"""
+Test cases for the seeded external shuffle of submissions:
+    1. Same seed, same output, byte for byte
+    2. The output is a permutation of the input lines
+    3. Different seeds give different orders
+    4. Several buckets still give a permutation
+    5. A last line without a newline is kept
+    6. A failed shuffle leaves no temp file and no open descriptor
+"""
+import os
+import pytest
+from src.core.services.anonym_threads import Shuffle
+
+# --------------------------
+# HELPERS
+# --------------------------
+
+def shuffle_file(tmp_path, content, seed, name="shuffled.csv", bucket_size=None):
+    input_file = tmp_path / "input.csv"
+    if not input_file.exists():
+        input_file.write_bytes(content)
+    output_file = tmp_path / name
+    shuffle = Shuffle(str(input_file), None, str(output_file), seed=seed)
+    if bucket_size:
+        shuffle.bucket_size = bucket_size
+        shuffle.block_size = bucket_size  # Several scatter steps, with lines cut across blocks
+    assert shuffle.process() == 0
+    return output_file.read_bytes()
+
+@pytest.fixture
+def content():
+    """Tab-separated rows in the submission format."""
+    rows = [f"{i % 37}\t2025-01-{1 + i % 28:02d} {i % 24:02d}:00:00\t48.{i:06d}\t2.{i * 7:06d}" for i in range(5000)]
+    return ("\n".join(rows) + "\n").encode()
+
+# --------------------------
+# TEST CASES
+# --------------------------
+
+class TestShuffle:
+    """Test class for the Shuffle stage."""
+
+    def test_same_seed_reproduces_output(self, tmp_path, content):
+        first = shuffle_file(tmp_path, content, seed=42, name="first.csv")
+        second = shuffle_file(tmp_path, content, seed=42, name="second.csv")
+        assert first == second
+
+    def test_output_is_permutation(self, tmp_path, content):
+        output = shuffle_file(tmp_path, content, seed=7)
+        assert output != content
+        assert sorted(output.splitlines()) == sorted(content.splitlines())
+
+    def test_different_seeds_differ(self, tmp_path, content):
+        first = shuffle_file(tmp_path, content, seed=1, name="first.csv")
+        second = shuffle_file(tmp_path, content, seed=2, name="second.csv")
+        assert first != second
+        assert sorted(first.splitlines()) == sorted(second.splitlines())
+
+    def test_multiple_buckets(self, tmp_path, content):
+        output = shuffle_file(tmp_path, content, seed=3, bucket_size=16 * 1024)
+        assert len(content) // (16 * 1024) > 1
+        assert sorted(output.splitlines()) == sorted(content.splitlines())
+        assert output == shuffle_file(tmp_path, content, seed=3, name="again.csv", bucket_size=16 * 1024)
+
+    def test_missing_trailing_newline(self, tmp_path):
+        content = b"a\t1\nb\t2\nc\t3"
+        output = shuffle_file(tmp_path, content, seed=5)
+        assert sorted(output.splitlines()) == [b"a\t1", b"b\t2", b"c\t3"]
+        assert output.endswith(b"\n")
+
+    def test_failure_cleans_up(self, tmp_path):
+        output_file = tmp_path / "shuffled.csv"
+        shuffle = Shuffle(str(tmp_path / "missing.csv"), None, str(output_file), seed=1)
+        open_fds = len(os.listdir("/proc/self/fd"))
+
+        assert isinstance(shuffle.process(), tuple)
+        assert len(os.listdir("/proc/self/fd")) == open_fds
+        assert os.listdir(tmp_path) == []
@@ -0,0 +1,35 @@
+"""
+Test cases for stage telemetry:
+    1. Wall time, CPU time, rows and bytes of a stage
+    2. Peak RSS is measured per stage, not over the process lifetime
+"""
+import time
+import numpy as np
+import pytest
+from src.core.services.telemetry import StageProbe, current_rss_mb
+
+pytestmark = pytest.mark.skipif(current_rss_mb() is None, reason="needs /proc")
+
+class TestStageProbe:
+    """Test class for StageProbe."""
+
+    def test_sample(self):
+        with StageProbe("utility", rows=10, bytes_read=2048) as probe:
+            time.sleep(0.01)
+        sample = probe.sample()
+
+        assert sample["stage"] == "utility"
+        assert sample["wall_seconds"] >= 0.01
+        assert sample["cpu_seconds"] >= 0
+        assert sample["rows_processed"] == 10
+        assert sample["bytes_read"] == 2048
+
+    def test_peak_rss_per_stage(self):
+        with StageProbe("large") as large:
+            block = np.ones(256 * 1024 * 1024 // 8)  # 256 MB, touched
+            time.sleep(0.2)
+            del block
+        with StageProbe("small") as small:
+            time.sleep(0.2)
+
+        assert large.peak_rss_mb - small.peak_rss_mb > 200  # The second stage does not inherit the first one's peak
@@ -0,0 +1,69 @@
+"""
+Test cases for the Stage Metrics API:
+    1. Test Percentiles per Stage over the Window
+    2. Test Old Samples Are Left Out
+    3. Test Invalid Window
+    4. Test Non-Admin Access
+"""
+import pytest
+from datetime import timedelta
+from http import HTTPStatus
+from src.extensions import db
+from src.modules.anonymisation.models import StageMetricModel, get_vietnam_time
+
+STAGE_METRICS_ENDPOINT = "/api/admin/stage-metrics"
+
+@pytest.mark.usefixtures("client")
+class TestStageMetricsAPI:
+    """Test class for the Stage Metrics API in Flask."""
+
+    @pytest.fixture
+    def samples(self, make_submission):
+        """Ten `utility` samples of 1..10 seconds, one `footprint` sample and one outside the window."""
+        anonym = make_submission(1, status="completed")
+        anonym.add_stage_metrics(
+            {"stage": "utility", "wall_seconds": float(seconds), "cpu_seconds": seconds / 2, "rows_processed": 100}
+            for seconds in range(1, 11)
+        )
+        anonym.add_stage_metrics([{"stage": "footprint", "wall_seconds": 4.0, "bytes_read": 2048}])
+        db.session.add(StageMetricModel(
+            anonym_id=anonym.id, stage="footprint", wall_seconds=99.0, created_at=get_vietnam_time() - timedelta(hours=30)
+        ))
+        db.session.commit()
+
+    # --------------------------
+    # TEST CASES
+    # --------------------------
+
+    def test_summary(self, client, admin_headers, samples):
+        response = client.get(f"{STAGE_METRICS_ENDPOINT}?hours=1", headers=admin_headers)
+        assert response.status_code == HTTPStatus.OK
+
+        data = response.get_json()["data"]
+        assert data["hours"] == 1
+        stages = {entry["stage"]: entry for entry in data["stages"]}
+        assert sorted(stages) == ["footprint", "utility"]
+
+        utility = stages["utility"]
+        assert utility["count"] == 10
+        assert utility["wall_seconds"] == {"p50": 5.0, "p95": 10.0, "p99": 10.0}
+        assert utility["cpu_seconds"]["p50"] == 2.5
+        assert utility["peak_rss_mb"] == {"p50": None, "p95": None, "p99": None}
+
+    def test_old_samples_left_out(self, client, admin_headers, samples):
+        stages = {entry["stage"]: entry for entry in client.get(STAGE_METRICS_ENDPOINT, headers=admin_headers).get_json()["data"]["stages"]}
+        assert stages["footprint"]["count"] == 1  # Default window is 24 hours
+        assert stages["footprint"]["wall_seconds"]["p99"] == 4.0
+
+        response = client.get(f"{STAGE_METRICS_ENDPOINT}?hours=48", headers=admin_headers)
+        stages = {entry["stage"]: entry for entry in response.get_json()["data"]["stages"]}
+        assert stages["footprint"]["count"] == 2
+
+    @pytest.mark.parametrize("hours", ["-1", "0"])
+    def test_invalid_window(self, client, admin_headers, hours):
+        response = client.get(f"{STAGE_METRICS_ENDPOINT}?hours={hours}", headers=admin_headers)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+    def test_non_admin(self, client, group_headers):
+        response = client.get(STAGE_METRICS_ENDPOINT, headers=group_headers(1))
+        assert response.status_code == HTTPStatus.FORBIDDEN
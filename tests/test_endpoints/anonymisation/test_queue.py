@@ -0,0 +1,97 @@
+"""
+Test cases for the scoring queue seen through the Anonymisation API:
+    1. Test Upload Rejected with 429 and Retry-After when the Queue is Full
+    2. Test Retry-After Follows Recent Job Durations
+    3. Test Queue Position and ETA of Queued Submissions
+    4. Test No Queue Position Once Scoring Started
+"""
+import io
+import zipfile
+import pytest
+from datetime import timedelta
+from http import HTTPStatus
+from src.modules.anonymisation.models import AnonymModel, get_vietnam_time
+from src.modules.anonymisation.scheduler import PROCESSING_STATUS
+
+UPLOAD_ENDPOINT = "/api/anonym/upload"
+RESULT_ENDPOINT = "/api/anonym/result/{}"
+
+@pytest.mark.usefixtures("client")
+class TestScoringQueueAPI:
+    """Test class for admission control and queue reporting."""
+
+    @pytest.fixture(autouse=True)
+    def limits(self, app, monkeypatch):
+        monkeypatch.setitem(app.config, "SCORING_QUEUE_LIMIT", 1)
+        monkeypatch.setitem(app.config, "SCORING_CONCURRENCY", 1)
+        monkeypatch.setitem(app.config, "SCORING_GROUP_WEIGHTS", {})
+
+    @pytest.fixture
+    def zip_file(self):
+        """Create a mock ZIP file containing a single CSV file."""
+        zip_stream = io.BytesIO()
+        with zipfile.ZipFile(zip_stream, "w") as zipf:
+            zipf.writestr("data.csv", "1\t2025-01-01 10:00:00\t48.85\t2.35\n")
+        zip_stream.seek(0)
+        return zip_stream
+
+    # --------------------------
+    # TEST CASES FOR ADMISSION
+    # --------------------------
+
+    def test_queue_full(self, client, group_headers, make_submission, zip_file):
+        make_submission(1)
+        response = client.post(
+            UPLOAD_ENDPOINT,
+            data={"file": (zip_file, "submission.zip")},
+            headers=group_headers(1),
+            content_type="multipart/form-data",
+        )
+
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        retry_after = int(response.headers["Retry-After"])
+        assert retry_after >= 1
+        assert str(retry_after) in response.get_json()["message"]
+        assert AnonymModel.query.count() == 1  # Nothing was queued
+
+    def test_retry_after_follows_durations(self, client, group_headers, make_submission, zip_file):
+        started = get_vietnam_time() - timedelta(minutes=10)
+        make_submission(1, status="completed", started_at=started, finished_at=started + timedelta(seconds=30))
+        make_submission(1)
+        make_submission(2)
+        response = client.post(
+            UPLOAD_ENDPOINT,
+            data={"file": (zip_file, "submission.zip")},
+            headers=group_headers(1),
+            content_type="multipart/form-data",
+        )
+
+        assert response.status_code == HTTPStatus.TOO_MANY_REQUESTS
+        assert response.headers["Retry-After"] == "60"  # One job over the limit, one slot, 30 s per job
+
+    # --------------------------
+    # TEST CASES FOR QUEUE POSITION
+    # --------------------------
+
+    def test_queue_position(self, client, group_headers, make_submission):
+        burst = [make_submission(1) for _ in range(3)]
+        other = make_submission(2)
+
+        positions = []
+        for anonym in burst + [other]:
+            response = client.get(RESULT_ENDPOINT.format(anonym.id), headers=group_headers(1))
+            assert response.status_code == HTTPStatus.OK
+            data = response.get_json()["data"]
+            assert data["status"] == "queued"
+            assert data["eta_seconds"] >= 1
+            positions.append(data["queue_position"])
+
+        assert positions == [2, 3, 4, 2]  # The other group's first job goes in group 1's second turn
+
+    def test_no_position_once_started(self, client, group_headers, make_submission):
+        anonym = make_submission(1, status=PROCESSING_STATUS, started_at=get_vietnam_time())
+        data = client.get(RESULT_ENDPOINT.format(anonym.id), headers=group_headers(1)).get_json()["data"]
+
+        assert data["status"] == PROCESSING_STATUS
+        assert data["queue_position"] is None
+        assert data["eta_seconds"] is None